@@ -0,0 +1,134 @@
+"""
+基准指数缓存
+Benchmark Series - 进程内共享的指数收盘价序列（如沪深300）
+
+指数序列只在首次使用时从 A股数据库 读取一次，保存为按日期排序的数组；
+区间涨幅按天数序号二分查找计算（YYYYMMDD / YYYY-MM-DD 两种日期写法结果一致）。数据文件发生变化（大小或修改时间）时自动重新载入。
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from nav_store import to_day, to_days
+
+
+class BenchmarkSeries:
+    """指数收盘价序列（按日期升序）"""
+
+    def __init__(self, symbol: str, dates: np.ndarray, closes: np.ndarray):
+        self.symbol = symbol
+        self.dates = dates      # 日期字符串数组（YYYY-MM-DD）
+        self.days = to_days(dates).astype(np.int64)   # 天数序号（距 1970-01-01）
+        self.closes = closes    # 收盘价（float64）
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @staticmethod
+    def _day(value) -> int:
+        """日期字符串（YYYYMMDD / YYYY-MM-DD）或天数序号 → 天数序号"""
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return to_day(value)
+
+    @staticmethod
+    def _days(values) -> np.ndarray:
+        """批量版 _day()"""
+        values = np.asarray(values)
+        if values.dtype.kind in 'iu':
+            return values.astype(np.int64)
+        return to_days(values).astype(np.int64)
+
+    def growth(self, start_date, end_date) -> Optional[float]:
+        """
+        区间累计涨幅（百分比）
+
+        取区间 [start_date, end_date] 内的第一个和最后一个收盘价，
+        区间内少于2个交易日返回 None
+
+        参数:
+            start_date / end_date: 日期字符串（YYYYMMDD 或 YYYY-MM-DD），或天数序号
+        """
+        lo = np.searchsorted(self.days, self._day(start_date), side='left')
+        hi = np.searchsorted(self.days, self._day(end_date), side='right')
+
+        if hi - lo < 2:
+            return None
+
+        first_close = self.closes[lo]
+        return float((self.closes[hi - 1] - first_close) / first_close * 100)
+
+    def growth_many(self, start_dates, end_dates) -> np.ndarray:
+        """
+        批量区间累计涨幅（百分比），规则同 growth()
+
+        返回:
+            与输入等长的数组，区间内少于2个交易日为 NaN
+        """
+        lo = np.searchsorted(self.days, self._days(start_dates), side='left')
+        hi = np.searchsorted(self.days, self._days(end_dates), side='right')
+
+        valid = (hi - lo) >= 2
+        first_close = self.closes[np.where(valid, lo, 0)]
+        last_close = self.closes[np.where(valid, hi - 1, 0)]
+        return np.where(valid, (last_close - first_close) / first_close * 100, np.nan)
+
+    def to_dict(self) -> Dict[str, float]:
+        """{date: close}"""
+        return dict(zip(self.dates.tolist(), self.closes.tolist()))
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_benchmark_series(symbol: str = '000300', market: str = 'CN',
+                         db_path: Optional[Union[str, Path]] = None) -> Optional[BenchmarkSeries]:
+    """
+    获取指数序列（进程内缓存，数据文件变化时失效）
+
+    参数:
+        symbol: 指数代码，默认沪深300
+        market: 市场代码
+        db_path: A股数据库路径，默认 DATA_DIR/astock.db.gz
+
+    返回:
+        BenchmarkSeries，数据库不存在或无数据时返回 None
+    """
+    if db_path is None:
+        from config import DATA_DIR
+        db_path = DATA_DIR / 'astock.db.gz'
+
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return None
+
+    st = db_path.stat()
+    signature = (st.st_size, st.st_mtime_ns)
+    key = (str(db_path.resolve()), symbol, market)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        from lj_read import StockDataReaderV2
+
+        reader = StockDataReaderV2(str(db_path))
+        df = reader.get_stock_data(symbol, market=market)
+
+        if df.empty:
+            series = None
+        else:
+            df = df.sort_values('date')
+            series = BenchmarkSeries(
+                symbol,
+                df['date'].to_numpy(dtype=str),
+                df['close'].to_numpy(dtype=np.float64)
+            )
+
+        _cache[key] = (signature, series)
+        return series
@@ -0,0 +1,112 @@
+"""
+数据库解压缓存
+Extracted database cache - .db.gz 解压结果持久缓存，跨启动复用
+
+缓存文件命名：<文件名>-<源路径哈希>-<大小>-<修改时间>-<内容哈希>.db
+1. 大小和修改时间一致：直接复用（不读取压缩文件）
+2. 内容哈希一致（文件被复制/touch 过）：改名后复用
+3. 否则解压到临时文件，原子改名到位，并清理同一来源的旧版本
+"""
+
+import os
+import gzip
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+# 默认缓存目录（系统临时目录下，跨启动保留）
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "aifm_db_cache"
+
+# 未完成的临时文件超过该时间视为残留，可清理
+STALE_TMP_SECONDS = 3600
+
+_lock = threading.Lock()
+
+
+def _file_digest(path: Path) -> str:
+    """计算文件内容哈希（SHA-256 前16位）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _source_prefix(gz_path: Path) -> str:
+    """同一来源文件的缓存前缀：<去掉.gz的文件名去掉扩展名>-<源路径哈希>"""
+    stem = Path(gz_path.name[:-3] if gz_path.name.endswith('.gz') else gz_path.name).stem
+    path_hash = hashlib.sha1(str(gz_path).encode('utf-8')).hexdigest()[:8]
+    return f"{stem}-{path_hash}"
+
+
+def _collect_garbage(cache_dir: Path, prefix: str, keep: Path):
+    """清理同一来源的旧版本和残留临时文件（正在使用的文件删除失败时忽略）"""
+    now = time.time()
+    for path in cache_dir.glob(f"{prefix}-*"):
+        if path == keep:
+            continue
+        try:
+            if path.suffix == '.tmp' and now - path.stat().st_mtime < STALE_TMP_SECONDS:
+                continue
+            path.unlink()
+        except OSError:
+            pass
+
+
+def extract_cached(gz_path: Union[str, Path], cache_dir: Optional[Union[str, Path]] = None) -> Path:
+    """
+    获取 .gz 数据库的解压文件（必要时解压）
+
+    参数:
+        gz_path: 压缩数据库路径
+        cache_dir: 缓存目录，默认 DEFAULT_CACHE_DIR
+
+    返回:
+        解压后的数据库文件路径
+    """
+    gz_path = Path(gz_path).resolve()
+    cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    st = gz_path.stat()
+    prefix = _source_prefix(gz_path)
+    stat_key = f"{prefix}-{st.st_size}-{st.st_mtime_ns}"
+
+    with _lock:
+        # 1. 大小和修改时间一致，直接复用
+        for hit in cache_dir.glob(f"{stat_key}-*.db"):
+            return hit
+
+        # 2. 内容一致（仅修改时间变化），改名后复用
+        digest = _file_digest(gz_path)
+        target = cache_dir / f"{stat_key}-{digest}.db"
+
+        for hit in cache_dir.glob(f"{prefix}-*-{digest}.db"):
+            try:
+                os.replace(hit, target)
+            except OSError:
+                # 文件被占用（Windows），继续使用原文件
+                return hit
+            _collect_garbage(cache_dir, prefix, keep=target)
+            return target
+
+        # 3. 解压到临时文件，原子改名到位
+        tmp = cache_dir / f"{stat_key}-{digest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(gz_path, 'rb') as f_in:
+                with open(tmp, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+
+        _collect_garbage(cache_dir, prefix, keep=target)
+        return target
@@ -0,0 +1,149 @@
+"""
+数据库连接池
+Connection Pool - 多线程共享的只读 SQLite 连接池
+
+1. 连接以 URI mode=ro 打开（check_same_thread=False），空闲连接放在队列中，
+   各线程（如 Web 服务每个请求一个线程）取用后归还，不再每个请求重新打开
+2. 每个连接设置 mmap_size / cache_size / temp_store=MEMORY，并启用预编译语句缓存
+3. 连接的 close() 即归还连接池，调用方沿用 "conn = ...; ...; conn.close()" 的写法即可；
+   重复 close() 或其他线程的 close() 会被忽略，真正关闭由 ConnectionPool.close_all() 完成；
+   连接池只弱引用已取出的连接，调用方因异常未归还的连接随垃圾回收关闭
+4. 队列最多保留 max_idle 个空闲连接：取用时队列为空则新开连接，归还时队列已满则关闭
+5. 写操作（建索引、预计算缓存表）不要使用本连接池
+"""
+
+import queue
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+from typing import Union
+
+# 默认连接参数
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024      # 256MB 内存映射
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024         # 64MB 页缓存
+DEFAULT_CACHED_STATEMENTS = 256            # 预编译语句缓存条数
+DEFAULT_MAX_IDLE = 8                       # 最多保留的空闲连接数
+
+
+class PooledConnection(sqlite3.Connection):
+    """连接池管理的连接（close() 归还连接池）"""
+
+    _pool = None
+    _owner = None    # 取用该连接的线程 ident（空闲时为 None）
+
+    def close(self):
+        # 只有取用该连接的线程能归还，重复 close() 忽略
+        if self._owner == threading.get_ident():
+            self._owner = None
+            self._pool._release(self)
+
+    def _close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """多线程共享的只读连接池"""
+
+    def __init__(self, db_path: Union[str, Path],
+                 mmap_size: int = DEFAULT_MMAP_SIZE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+                 max_idle: int = DEFAULT_MAX_IDLE):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（必须已存在）
+            mmap_size: PRAGMA mmap_size（字节）
+            cache_size_kib: PRAGMA cache_size（KiB）
+            cached_statements: 每个连接的预编译语句缓存条数
+            max_idle: 最多保留的空闲连接数
+        """
+        self.db_path = Path(db_path)
+        self.uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+
+        self._idle = queue.Queue(maxsize=max_idle)
+        self._lock = threading.Lock()
+        # 连接池打开且尚未关闭的全部连接（弱引用：未归还的连接随垃圾回收关闭）
+        self._connections = weakref.WeakSet()
+
+    def _open(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.uri,
+            uri=True,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements,
+            check_same_thread=False  # 连接在线程间共享
+        )
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn._pool = self
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self) -> PooledConnection:
+        """取用一个连接（用完调用 close() 归还）"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        conn._owner = threading.get_ident()
+        return conn
+
+    def _release(self, conn: PooledConnection):
+        """归还连接（已被 close_all() 关闭或队列已满时关闭）"""
+        with self._lock:
+            alive = conn in self._connections
+        if alive:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        self._discard(conn)
+
+    def _discard(self, conn: PooledConnection):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn._close()
+        except sqlite3.Error:
+            pass
+
+    def close_idle(self):
+        """
+        关闭空闲连接，并让使用中的连接在归还时关闭（连接池被替换时调用）
+
+        与 close_all() 不同，不会关闭其他线程正在使用的连接
+        """
+        with self._lock:
+            self._connections = weakref.WeakSet()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn._close()
+            except sqlite3.Error:
+                pass
+
+    def close_all(self):
+        """关闭所有连接（之后再调用 connection() 会重新打开）"""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            try:
+                conn._close()
+            except sqlite3.Error:
+                pass
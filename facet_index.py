@@ -0,0 +1,178 @@
+"""
+基金筛选分面索引
+Facet Index - fund_basic 各筛选维度的位图索引（filter_funds / 筛选下拉框）
+
+一次读取全部基金（已按 filter_funds 的排序排好），为每个维度的每个取值建立位图：
+    基金公司 management / 基金类型 fund_type / 投资类型 invest_type / 状态 status /
+    风险等级（由基金类型推导：low / medium / high）
+位图用 Python 整数表示（第 i 位 = 第 i 只基金），筛选为若干位图按位与，
+结果按位图顺序取行即为已排序的结果；各下拉选项的可选数量为一次按位与 + 计数。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 筛选参数 → fund_basic 列
+FACETS = {
+    'company': 'management',
+    'fund_type': 'fund_type',
+    'invest_type': 'invest_type',
+    'status': 'status',
+}
+
+# 风险等级（基于基金类型进行简单分类，同一类型可能属于多个等级）
+RISK_LEVELS = {
+    'low': '货币|债券',          # 低风险：货币型、债券型
+    'medium': '混合',            # 中风险：混合型
+    'high': '股票|指数|ETF',     # 高风险：股票型、指数型
+}
+
+
+def _popcount(bits: int) -> int:
+    """位图中 1 的个数"""
+    try:
+        return bits.bit_count()
+    except AttributeError:  # Python < 3.10
+        return bin(bits).count('1')
+
+
+def bits_from_mask(mask: np.ndarray) -> int:
+    """布尔数组 → 位图"""
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+
+def mask_from_bits(bits: int, size: int) -> np.ndarray:
+    """位图 → 布尔数组"""
+    if bits == 0:
+        return np.zeros(size, dtype=bool)
+    raw = np.frombuffer(bits.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:size].astype(bool)
+
+
+def rows_from_bits(bits: int, size: int) -> np.ndarray:
+    """位图 → 行号数组（升序）"""
+    return np.flatnonzero(mask_from_bits(bits, size))
+
+
+class FacetIndex:
+    """基金筛选分面索引（只读）"""
+
+    def __init__(self, frame: pd.DataFrame, bitsets: Dict[str, Dict[str, int]]):
+        """
+        参数:
+            frame: 已排序的基金 DataFrame（filter_funds 的返回列）
+            bitsets: {筛选参数: {取值: 位图}}，风险等级为 'risk_level'
+        """
+        self.frame = frame
+        self._bitsets = bitsets
+        self._positions = {code: i for i, code in enumerate(frame['ts_code'])}
+        self.all_bits = (1 << len(frame)) - 1
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # ============================================================
+    # 构建
+    # ============================================================
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> 'FacetIndex':
+        """
+        从基金 DataFrame 构建（按 cache_date、list_date 降序排列，空值在后）
+
+        参数:
+            frame: DataFrame[ts_code, name, fund_type, management, invest_type,
+                             found_date, list_date, status, cache_date, ...]
+        """
+        frame = frame.sort_values(
+            ['cache_date', 'list_date', 'ts_code'],
+            ascending=[False, False, True],
+            na_position='last',
+            kind='mergesort'
+        ).reset_index(drop=True)
+
+        bitsets = {}
+        for facet, column in FACETS.items():
+            groups = frame.groupby(column, sort=False).indices
+            bitsets[facet] = {}
+            for value, positions in groups.items():
+                mask = np.zeros(len(frame), dtype=bool)
+                mask[positions] = True
+                bitsets[facet][value] = bits_from_mask(mask)
+
+        bitsets['risk_level'] = {
+            level: bits_from_mask(frame['fund_type'].str.contains(pattern, na=False).to_numpy())
+            for level, pattern in RISK_LEVELS.items()
+        }
+
+        return cls(frame, bitsets)
+
+    # ============================================================
+    # 查询
+    # ============================================================
+
+    def codes_bits(self, ts_codes: Iterable[str]) -> int:
+        """基金代码集合 → 位图（不在索引中的代码忽略）"""
+        mask = np.zeros(len(self.frame), dtype=bool)
+        positions = [self._positions[code] for code in ts_codes if code in self._positions]
+        mask[positions] = True
+        return bits_from_mask(mask)
+
+    def _facet_bits(self, facet: str, value: Any) -> Optional[int]:
+        """单个筛选条件的位图（未设置或风险等级取值无效时返回 None，表示不筛选）"""
+        if not value:
+            return None
+        if facet == 'risk_level' and value not in RISK_LEVELS:
+            return None
+        return self._bitsets[facet].get(value, 0)
+
+    def mask(self, filters: Dict[str, Any], search_bits: Optional[int] = None,
+             exclude: Optional[str] = None) -> int:
+        """
+        筛选条件的位图
+
+        参数:
+            filters: {company, fund_type, invest_type, status, risk_level}（空值忽略）
+            search_bits: 关键词搜索结果的位图（None 表示无关键词）
+            exclude: 不参与计算的筛选参数（计算该维度的可选数量时使用）
+        """
+        bits = self.all_bits if search_bits is None else search_bits
+        for facet in list(FACETS) + ['risk_level']:
+            if facet == exclude:
+                continue
+            facet_bits = self._facet_bits(facet, filters.get(facet))
+            if facet_bits is not None:
+                bits &= facet_bits
+        return bits
+
+    def filter(self, filters: Dict[str, Any], search_bits: Optional[int] = None) -> pd.DataFrame:
+        """符合条件的基金（保持索引排序）"""
+        rows = rows_from_bits(self.mask(filters, search_bits), len(self.frame))
+        return self.frame.iloc[rows].reset_index(drop=True)
+
+    def facet_counts(self, filters: Dict[str, Any], search_bits: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        各下拉选项的基金数量
+
+        每个维度按"其余条件都生效、只改该维度取值"计数，即选择该取值后的结果数量。
+
+        返回:
+            {筛选参数: {取值: 数量}}，只包含数量大于 0 的取值
+        """
+        counts = {}
+        for facet, values in self._bitsets.items():
+            base = self.mask(filters, search_bits, exclude=facet)
+            counts[facet] = {}
+            for value, bits in values.items():
+                if value is None or value == '':
+                    continue
+                count = _popcount(base & bits)
+                if count:
+                    counts[facet][value] = count
+        return counts
+
+    def values(self, facet: str) -> List[str]:
+        """维度的全部取值（非空，升序）"""
+        return sorted(value for value in self._bitsets[facet] if value is not None and value != '')
@@ -12,71 +12,274 @@ Fund Analyzer - Practical fund analysis for retail investors
 """
 
 import sqlite3
-import gzip
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from config import DB_PATH, COMPRESSED_DB_PATH
-import tempfile
-import shutil
-import atexit
+from nav_store import NavStore, to_day, to_days, day_to_str
+from db_cache import extract_cached
+from db_pool import ConnectionPool
+from peer_rank import PeerRankIndex, DEFAULT_PERIODS as PEER_PERIODS, RISK_METRICS as PEER_RISK_METRICS
+from report_context import ReportContext
+from holdings_index import HoldingsIndex, industry_exposure
+from facet_index import FacetIndex, bits_from_mask
+from screen_index import ScreenIndex
+from screen_expr import ScreenExpression, TRAILING_FIELDS, canonical_field
+import fund_search
+import pinyin_index
+import scoring
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
 
 class FundAnalyzer:
     """基金分析器 - 提供多维度的基金分析"""
     
-    def __init__(self, db_path: Path = None):
-        """初始化分析器"""
+    # 报告并行计算的线程数上限
+    REPORT_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+    
+    def __init__(self, db_path: Path = None, use_nav_store: bool = False):
+        """
+        初始化分析器
+        
+        参数:
+            db_path: 数据库路径（.db 或 .db.gz）
+            use_nav_store: 是否启用净值列存（首次使用时将 fund_nav 载入内存，
+                           之后各项净值分析直接切片数组，不再查询数据库）
+        """
         self.db_path = db_path or DB_PATH
         
+        # 净值列存（延迟加载，fund_nav 变化时重新载入）
+        self.use_nav_store = use_nav_store
+        self._nav_store = None
+        self._nav_store_signature = None
+        self._nav_store_lock = threading.Lock()
+        
+        # 各表数据版本（数据库文件变化时重新读取）
+        self._table_versions = None
+        self._table_versions_file = None
+        self._table_versions_lock = threading.Lock()
+        
+        # 同类排名索引（延迟构建，数据变化时重建）
+        self._peer_index = None
+        self._peer_index_signature = None
+        self._peer_index_lock = threading.Lock()
+        
+        # 持仓反向索引（延迟构建，数据变化时重建）
+        self._holdings_index = None
+        self._holdings_index_signature = None
+        self._holdings_index_lock = threading.Lock()
+        
+        # 筛选分面索引（延迟构建，数据变化时重建）
+        self._facet_index = None
+        self._facet_index_signature = None
+        self._facet_index_lock = threading.Lock()
+        
+        # 筛选排序索引（延迟构建，数据变化时重建）
+        self._screen_index = None
+        self._screen_index_signature = None
+        self._screen_index_lock = threading.Lock()
+        
+        # 报告并行计算线程池（延迟创建）
+        self._report_executor = None
+        self._report_executor_lock = threading.Lock()
+        
         # 判断是否为压缩文件（根据文件扩展名）
         self.is_compressed = str(self.db_path).endswith('.gz')
         
-        # 如果是压缩文件，一次性解压到临时文件
-        self._temp_db_path = None
+        # 如果是压缩文件，使用解压缓存（同一压缩文件跨启动只解压一次；压缩文件更新后重新解压）
+        self._extracted_db_path = None
+        self._source_signature = None
+        self._source_lock = threading.Lock()
         if self.is_compressed:
+            self._source_signature = self._stat_signature(self.db_path)
             self._extract_database()
         
         # 创建性能索引（提升查询速度）
         self._create_indexes()
+        
+        # 只读连接池（各线程共享，取用后归还）
+        self._pool = ConnectionPool(self._sqlite_path())
     
     def _extract_database(self):
-        """解压数据库到临时文件（只执行一次）"""
-        if self._temp_db_path is None:
-            # 创建临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
-            self._temp_db_path = temp_file.name
-            temp_file.close()
-            
-            # 解压数据库
-            with gzip.open(self.db_path, 'rb') as f_in:
-                with open(self._temp_db_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            # 注册清理函数
-            atexit.register(self._cleanup)
-    
-    def _cleanup(self):
-        """清理临时文件"""
-        if self._temp_db_path and Path(self._temp_db_path).exists():
-            try:
-                Path(self._temp_db_path).unlink()
-            except:
-                pass
+        """获取解压后的数据库（命中缓存时不再解压）"""
+        if self._extracted_db_path is None:
+            self._extracted_db_path = str(extract_cached(self.db_path))
     
-    def _connect(self):
-        """连接数据库（支持.gz压缩格式）"""
+    @staticmethod
+    def _stat_signature(path) -> tuple:
+        """文件大小/修改时间"""
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    
+    def _check_source(self):
+        """压缩数据库文件更新后重新解压，并切换到新文件的连接池"""
+        if not self.is_compressed:
+            return
+        
+        signature = self._stat_signature(self.db_path)
+        if signature == self._source_signature:
+            return
+        
+        with self._source_lock:
+            if signature == self._source_signature:
+                return
+            path = str(extract_cached(self.db_path))
+            if path != self._extracted_db_path:
+                self._extracted_db_path = path
+                self._create_indexes()
+                # 关闭旧连接池的空闲连接；使用中的连接归还时发现已不属于连接池即关闭
+                old_pool = self._pool
+                self._pool = ConnectionPool(path)
+                old_pool.close_idle()
+            self._source_signature = signature
+    
+    def _sqlite_path(self) -> str:
+        """实际打开的 SQLite 文件路径（压缩格式为解压缓存文件）"""
         if self.is_compressed:
-            return sqlite3.connect(self._temp_db_path)
-        else:
-            return sqlite3.connect(str(self.db_path))
+            return self._extracted_db_path
+        return str(self.db_path)
+    
+    def _connect(self):
+        """
+        从连接池取用只读连接（支持.gz压缩格式）
+        
+        调用方用完后 conn.close() 即归还连接池，不会真正关闭
+        """
+        self._check_source()
+        return self._pool.connection()
+    
+    def _connect_writable(self):
+        """打开可写连接（建索引等写操作使用，用完需关闭）"""
+        return sqlite3.connect(self._sqlite_path())
+    
+    def close(self):
+        """关闭报告线程池和连接池的所有数据库连接"""
+        if self._report_executor is not None:
+            self._report_executor.shutdown(wait=True)
+            self._report_executor = None
+        self._pool.close_all()
+    
+    @property
+    def nav_store(self) -> Optional[NavStore]:
+        """净值列存（未启用时为 None；fund_nav 变化后重新载入）"""
+        if not self.use_nav_store:
+            return None
+        
+        signature = self._data_signature('fund_nav')
+        if self._nav_store is None or self._nav_store_signature != signature:
+            with self._nav_store_lock:
+                if self._nav_store is None or self._nav_store_signature != signature:
+                    conn = self._connect()
+                    try:
+                        self._nav_store = NavStore.load(conn)
+                    finally:
+                        conn.close()
+                    self._nav_store_signature = signature
+        
+        return self._nav_store
+    
+    # 数据版本跟踪的表 → 额外取最大值的列（None 表示只看行数和最大 rowid）
+    # 风险指标表每次全量重写（rowid 从头分配），另取最新净值日期
+    VERSIONED_TABLES = {
+        'fund_basic': None,
+        'fund_nav': None,
+        'fund_portfolio': None,
+        'fund_returns_cache': None,
+        'fund_scores': None,
+        'fund_risk_metrics': 'last_nav_date',
+    }
+    
+    def _read_table_versions(self) -> Dict[str, Optional[tuple]]:
+        """各表的数据版本 (行数, 最大 rowid[, 列最大值])，表不存在为 None"""
+        conn = self._connect()
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            versions = {}
+            for table, column in self.VERSIONED_TABLES.items():
+                if table not in tables:
+                    versions[table] = None
+                    continue
+                # 分开查询：COUNT(*) 走最小的索引，MAX(rowid) 直接取 B 树末端
+                version = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone() + \
+                    conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()
+                if column:
+                    version += conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()
+                versions[table] = version
+            return versions
+        finally:
+            conn.close()
+    
+    def _data_signature(self, *tables: str) -> tuple:
+        """
+        数据版本标识：数据库文件 + 指定各表的数据版本
+        
+        数据库文件变化（更新数据、预计算缓存写入）时才重新读取各表版本，
+        只有用到的表内容变化时标识才改变（缓存表写入不会使净值列存和各索引重建）
+        """
+        self._check_source()
+        path = self._sqlite_path()
+        file_signature = (path,) + self._stat_signature(path)
+        
+        if self._table_versions_file != file_signature:
+            with self._table_versions_lock:
+                if self._table_versions_file != file_signature:
+                    self._table_versions = self._read_table_versions()
+                    self._table_versions_file = file_signature
+        
+        versions = self._table_versions
+        return (path,) + tuple(versions[table] for table in tables)
+    
+    @property
+    def peer_index(self) -> PeerRankIndex:
+        """同类排名索引（所有在市基金，按 fund_type 分组；数据变化后自动重建）"""
+        store = self.nav_store
+        signature = self._data_signature('fund_basic', 'fund_nav') + (id(store),)
+        
+        if self._peer_index is None or self._peer_index_signature != signature:
+            with self._peer_index_lock:
+                if self._peer_index is None or self._peer_index_signature != signature:
+                    conn = self._connect()
+                    funds = pd.read_sql_query("""
+                        SELECT ts_code, name, fund_type
+                        FROM fund_basic
+                        WHERE status = 'L'
+                        ORDER BY ts_code
+                    """, conn)
+                    
+                    if store is None:
+                        # 只载入排名所需的最近净值
+                        store = NavStore.load(conn, funds['ts_code'].tolist(), tail=max(PEER_PERIODS) + 30)
+                    conn.close()
+                    
+                    self._peer_index = PeerRankIndex.build(funds, store)
+                    self._peer_index_signature = signature
+        
+        return self._peer_index
+    
+    @property
+    def holdings_index(self) -> HoldingsIndex:
+        """持仓反向索引（每只基金最近一期持仓，按股票分组；数据变化后自动重建）"""
+        signature = self._data_signature('fund_basic', 'fund_portfolio')
+        
+        if self._holdings_index is None or self._holdings_index_signature != signature:
+            with self._holdings_index_lock:
+                if self._holdings_index is None or self._holdings_index_signature != signature:
+                    conn = self._connect()
+                    self._holdings_index = HoldingsIndex.load(conn)
+                    conn.close()
+                    self._holdings_index_signature = signature
+        
+        return self._holdings_index
     
     def _create_indexes(self):
         """创建数据库索引以提升查询性能"""
         try:
-            conn = self._connect()
+            conn = self._connect_writable()
             cursor = conn.cursor()
             
             # 基金净值表索引（最重要 - 加速收益计算）
@@ -97,7 +300,25 @@ class FundAnalyzer:
                 ON fund_basic(status)
             """)
             
+            # 基金经理、份额表索引（加速详情页报告）
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_fund_manager_ts_code 
+                ON fund_manager(ts_code)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_fund_manager_name 
+                ON fund_manager(name)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_fund_share_ts_code_date 
+                ON fund_share(ts_code, trade_date)
+            """)
+            
             conn.commit()
+            
+            # 基金名称/代码全文索引（搜索框）
+            fund_search.ensure_search_index(conn)
+            
             conn.close()
         except Exception as e:
             # 忽略错误（可能索引已存在）
@@ -173,6 +394,20 @@ class FundAnalyzer:
                 "message": f"检查缓存失败: {str(e)}"
             }
     
+    def refresh_returns_cache(self, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新年度收益预计算缓存（fund_returns_cache）
+        
+        参数:
+            full: True 全量重建；False 仅重算净值有更新的基金
+        
+        返回:
+            统计信息 {"mode", "funds", "records", "computed_date"}
+        """
+        from precompute import ReturnsCacheBuilder
+        
+        return ReturnsCacheBuilder(self._sqlite_path()).build(full=full)
+    
     def batch_get_cached_returns(
         self, 
         ts_codes: List[str], 
@@ -298,6 +533,27 @@ class FundAnalyzer:
         返回:
             {year: nav_value}
         """
+        store = self.nav_store
+        if store is not None:
+            series = store.series(ts_code)
+            if series is None:
+                return {}
+            
+            dates, navs, _ = series
+            months = dates.astype('datetime64[D]').astype('datetime64[M]')
+            december = (months.astype(np.int64) % 12) == 11
+            if not december.any():
+                return {}
+            
+            # 每年12月最后一条（按年份倒序）
+            years = months[december].astype('datetime64[Y]').astype(np.int64) + 1970
+            dec_navs = navs[december]
+            last_in_year = np.r_[years[1:] != years[:-1], True]
+            return {
+                str(year): float(nav)
+                for year, nav in zip(years[last_in_year][::-1], dec_navs[last_in_year][::-1])
+            }
+        
         conn = self._connect()
         
         try:
@@ -355,19 +611,21 @@ class FundAnalyzer:
         return df.iloc[0].to_dict()
     
     def search_funds(self, keyword: str, limit: int = 20) -> pd.DataFrame:
-        """搜索基金（按名称或代码）"""
-        conn = self._connect()
+        """
+        搜索基金（按名称或代码）
         
-        query = """
-        SELECT ts_code, name, fund_type, management, 
-               found_date, list_date, status
-        FROM fund_basic
-        WHERE ts_code LIKE ? OR name LIKE ?
-        LIMIT ?
+        关键词 >= 3 个字符时走 FTS5 全文索引，否则 LIKE；
+        建有拼音索引时字母输入同时按拼音首字母/全拼前缀匹配（如 "yfd" → 易方达）；
+        代码/名称完全匹配、前缀匹配的排在前面
         """
+        conn = self._connect()
         
-        pattern = f"%{keyword}%"
-        df = pd.read_sql_query(query, conn, params=(pattern, pattern, limit))
+        query, params = fund_search.search_query(
+            conn, keyword,
+            "fb.ts_code, fb.name, fb.fund_type, fb.management, fb.found_date, fb.list_date, fb.status",
+            limit
+        )
+        df = pd.read_sql_query(query, conn, params=params)
         conn.close()
         
         return df
@@ -376,6 +634,22 @@ class FundAnalyzer:
     # 2. 收益分析（最重要！）
     # ============================================================
     
+    @staticmethod
+    def _period_name(period: int) -> str:
+        """回溯天数对应的期间名称"""
+        names = {
+            7: "近一周",
+            30: "近一月",
+            90: "近三月",
+            180: "近半年",
+            365: "近一年",
+            365*2: "近两年",
+            365*3: "近三年",
+            365*5: "近五年",
+            365*10: "近十年"
+        }
+        return names.get(period, f"近{period}天")
+    
     def calculate_returns(self, ts_code: str, periods: List[int] = None) -> Dict[str, float]:
         """
         计算基金收益率
@@ -386,6 +660,13 @@ class FundAnalyzer:
         if periods is None:
             periods = [7, 30, 90, 180, 365, 365*2, 365*3, 365*5, 365*10]
         
+        max_period = max(periods) + 30  # 多取一些，确保有数据
+        
+        # 🔥 净值列存：直接切片数组 + 二分查找
+        store = self.nav_store
+        if store is not None:
+            return self._returns_from_series(store.series(ts_code, limit=max_period), periods)
+        
         conn = self._connect()
         
         # 获取净值数据（按日期倒序）
@@ -397,7 +678,6 @@ class FundAnalyzer:
         LIMIT ?
         """
         
-        max_period = max(periods) + 30  # 多取一些，确保有数据
         df = pd.read_sql_query(query, conn, params=(ts_code, max_period))
         conn.close()
         
@@ -419,52 +699,57 @@ class FundAnalyzer:
             if not past_df.empty:
                 past_nav = past_df.iloc[0]['unit_nav']
                 ret = (latest_nav - past_nav) / past_nav * 100
-                
-                # 格式化期间名称
-                if period == 7:
-                    period_name = "近一周"
-                elif period == 30:
-                    period_name = "近一月"
-                elif period == 90:
-                    period_name = "近三月"
-                elif period == 180:
-                    period_name = "近半年"
-                elif period == 365:
-                    period_name = "近一年"
-                elif period == 365*2:
-                    period_name = "近两年"
-                elif period == 365*3:
-                    period_name = "近三年"
-                elif period == 365*5:
-                    period_name = "近五年"
-                elif period == 365*10:
-                    period_name = "近十年"
-                else:
-                    period_name = f"近{period}天"
-                
-                returns[period_name] = round(ret, 2)
+                returns[self._period_name(period)] = round(ret, 2)
+            else:
+                returns[self._period_name(period)] = None
+        
+        return returns
+    
+    def batch_trailing_returns(self, ts_codes: List[str], periods: List[int] = None) -> pd.DataFrame:
+        """
+        批量计算多只基金、多个回溯期间的收益率
+        
+        口径同 calculate_period_return：以各基金最新净值日为基准回溯 N 天，
+        取该日期及之前最近的净值
+        
+        参数:
+            ts_codes: 基金代码列表
+            periods: 回溯天数列表，默认同 calculate_returns
+        
+        返回:
+            收益率矩阵 DataFrame（index=ts_code，columns=回溯天数，百分比保留两位小数，无数据为 NaN）
+        """
+        if periods is None:
+            periods = [7, 30, 90, 180, 365, 365*2, 365*3, 365*5, 365*10]
+        
+        store = self.nav_store
+        if store is None:
+            # 按行数取最近的净值（与 calculate_returns 相同的窗口）
+            conn = self._connect()
+            store = NavStore.load(conn, ts_codes, tail=max(periods) + 30)
+            conn.close()
+        
+        matrix = np.round(store.trailing_returns(ts_codes, periods), 2)
+        return pd.DataFrame(matrix, index=pd.Index(ts_codes, name='ts_code'), columns=periods)
+    
+    def _returns_from_series(self, series, periods: List[int]) -> Dict[str, float]:
+        """由净值序列 (dates, unit_nav, accum_nav) 计算各回溯期间收益率"""
+        if series is None or len(series[0]) < 2:
+            return {f"{p}天收益率": None for p in periods}
+        
+        dates, navs, _ = series
+        latest_day = dates[-1]
+        latest_nav = navs[-1]
+        
+        returns = {}
+        for period in periods:
+            # 目标日期及之前最近的净值
+            idx = np.searchsorted(dates, latest_day - period, side='right') - 1
+            if idx >= 0:
+                past_nav = navs[idx]
+                returns[self._period_name(period)] = round((latest_nav - past_nav) / past_nav * 100, 2)
             else:
-                if period == 7:
-                    period_name = "近一周"
-                elif period == 30:
-                    period_name = "近一月"
-                elif period == 90:
-                    period_name = "近三月"
-                elif period == 180:
-                    period_name = "近半年"
-                elif period == 365:
-                    period_name = "近一年"
-                elif period == 365*2:
-                    period_name = "近两年"
-                elif period == 365*3:
-                    period_name = "近三年"
-                elif period == 365*5:
-                    period_name = "近五年"
-                elif period == 365*10:
-                    period_name = "近十年"
-                else:
-                    period_name = f"近{period}天"
-                returns[period_name] = None
+                returns[self._period_name(period)] = None
         
         return returns
     
@@ -477,19 +762,31 @@ class FundAnalyzer:
         - max_drawdown: 最大回撤
         - sharpe_ratio: 夏普比率（假设无风险利率3%）
         """
-        conn = self._connect()
-        
-        query = """
-        SELECT nav_date, unit_nav
-        FROM fund_nav
-        WHERE ts_code = ? AND unit_nav IS NOT NULL
-        ORDER BY nav_date DESC
-        LIMIT ?
-        """
-        
-        df = pd.read_sql_query(query, conn, params=(ts_code, days + 30))
-        conn.close()
+        store = self.nav_store
+        if store is not None:
+            # 🔥 净值列存：最近 N 条净值（已按日期升序）
+            series = store.series(ts_code, limit=days + 30)
+            df = pd.DataFrame({'unit_nav': series[1] if series is not None else []})
+        else:
+            conn = self._connect()
+            
+            query = """
+            SELECT nav_date, unit_nav
+            FROM fund_nav
+            WHERE ts_code = ? AND unit_nav IS NOT NULL
+            ORDER BY nav_date DESC
+            LIMIT ?
+            """
+            
+            df = pd.read_sql_query(query, conn, params=(ts_code, days + 30))
+            conn.close()
+            
+            df = df.sort_values('nav_date')
         
+        return self._risk_from_frame(df)
+    
+    def _risk_from_frame(self, df: pd.DataFrame) -> Dict[str, float]:
+        """由按日期升序的净值（unit_nav 列）计算风险指标"""
         if df.empty or len(df) < 30:
             return {
                 "波动率": None,
@@ -497,7 +794,6 @@ class FundAnalyzer:
                 "夏普比率": None
             }
         
-        df = df.sort_values('nav_date')
         df['returns'] = df['unit_nav'].pct_change()
         
         # 波动率（年化）
@@ -519,6 +815,51 @@ class FundAnalyzer:
             "夏普比率": round(sharpe, 2) if sharpe else None
         }
     
+    def batch_calculate_risk_metrics(self, ts_codes: List[str], days: int = 365) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        批量计算风险指标（口径同 calculate_risk_metrics）
+        
+        参数:
+            ts_codes: 基金代码列表
+            days: 统计窗口（最近 days + 30 条净值）
+        
+        返回:
+            {ts_code: {"波动率", "最大回撤", "夏普比率"}}
+        """
+        store = self.nav_store
+        if store is None:
+            conn = self._connect()
+            store = NavStore.load(conn, ts_codes, tail=days + 30)
+            conn.close()
+        
+        df = store.risk_metrics(ts_codes, days=days)
+        
+        def fmt(value, allow_zero=True):
+            if value is None or np.isnan(value) or (not allow_zero and value == 0):
+                return None
+            return round(float(value), 2)
+        
+        results = {ts_code: {"波动率": None, "最大回撤": None, "夏普比率": None} for ts_code in ts_codes}
+        for ts_code, volatility, max_drawdown, sharpe in df[['ts_code', 'volatility', 'max_drawdown', 'sharpe_ratio']].itertuples(index=False, name=None):
+            results[ts_code] = {
+                "波动率": fmt(volatility),
+                "最大回撤": fmt(max_drawdown),
+                "夏普比率": fmt(sharpe, allow_zero=False)
+            }
+        
+        return results
+    
+    def refresh_risk_metrics(self, days: int = 365) -> Dict[str, Any]:
+        """
+        重建风险指标预计算表（fund_risk_metrics、fund_year_drawdown）
+        
+        返回:
+            统计信息 {"funds", "year_records", "computed_date"}
+        """
+        from precompute import RiskMetricsBuilder
+        
+        return RiskMetricsBuilder(self._sqlite_path()).build(days=days, store=self.nav_store)
+    
     # ============================================================
     # 3. 基金经理分析
     # ============================================================
@@ -553,23 +894,23 @@ class FundAnalyzer:
         df = pd.read_sql_query(query, conn, params=(manager_name,))
         conn.close()
         
+        return self._manager_experience_from_frame(df)
+    
+    def _manager_experience_from_frame(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """由基金经理的任职记录（begin_date, end_date）计算管理经验"""
         if df.empty:
             return None
         
-        # 计算管理年限
-        df['begin_date'] = pd.to_datetime(df['begin_date'])
-        df['end_date'] = pd.to_datetime(df['end_date'])
+        # 计算管理年限（在任的按今天计算）
+        begin = pd.to_datetime(df['begin_date'])
+        end = pd.to_datetime(df['end_date'])
         
-        total_days = 0
-        for _, row in df.iterrows():
-            end = row['end_date'] if pd.notna(row['end_date']) else datetime.now()
-            days = (end - row['begin_date']).days
-            total_days += days
+        total_days = (end.fillna(pd.Timestamp(datetime.now())) - begin).dt.days.sum(skipna=False)
         
         return {
             "管理基金数量": len(df),
-            "管理年限": round(total_days / 365, 1),
-            "在管基金": len(df[df['end_date'].isna()])
+            "管理年限": round(float(total_days) / 365, 1),
+            "在管基金": int(end.isna().sum())
         }
     
     # ============================================================
@@ -594,6 +935,181 @@ class FundAnalyzer:
         
         return df
     
+    def get_stock_holders(self, symbol: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取持有某只股票的基金（各基金最近一期持仓）
+        
+        参数:
+            symbol: 股票代码（'600036'、'600036.SH'、'0700.HK' 均可）
+            limit: 最多返回基金数，None 返回全部
+        
+        返回:
+            {"基金数量": 持有基金总数, "基金列表": [...]}，按持股占比、持股市值降序
+        """
+        index = self.holdings_index
+        return {
+            "基金数量": index.holder_count(symbol),
+            "基金列表": index.holders(symbol, limit=limit)
+        }
+    
+    def get_similar_funds(self, ts_code: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        获取持仓最相似的基金（基于各基金最近一期持仓，覆盖全部基金）
+        
+        参数:
+            ts_code: 基金代码
+            top_k: 返回数量，默认10
+        
+        返回:
+            [{ts_code, name, fund_type, similarity, overlap, common_count}]，按余弦相似度降序
+        """
+        return self.holdings_index.similar(ts_code, top_k=top_k)
+    
+    def _has_exposure_table(self, conn) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fund_industry_exposure'"
+        ).fetchone() is not None
+    
+    def get_industry_exposure(self, ts_code: str, end_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        持仓行业穿透（按 STOCK_NAME_DATA 的行业汇总持股占比）
+        
+        优先读取 fund_industry_exposure 表；表不存在时由 fund_portfolio 实时汇总
+        
+        参数:
+            ts_code: 基金代码
+            end_date: 报告期（YYYY-MM-DD），默认该基金最近一期
+        
+        返回:
+            {"报告期": end_date, "行业分布": [{"行业", "占比", "市值", "股票数"}]}，按占比降序；
+            无持仓数据时报告期为 None
+        """
+        conn = self._connect()
+        
+        if end_date is None:
+            row = conn.execute(
+                "SELECT MAX(end_date) FROM fund_portfolio WHERE ts_code = ?", (ts_code,)
+            ).fetchone()
+            end_date = row[0] if row else None
+        
+        if end_date is None:
+            conn.close()
+            return {"报告期": None, "行业分布": []}
+        
+        if self._has_exposure_table(conn):
+            df = pd.read_sql_query("""
+                SELECT industry, weight, mkv, holding_count
+                FROM fund_industry_exposure
+                WHERE ts_code = ? AND end_date = ?
+                ORDER BY weight DESC, industry
+            """, conn, params=(ts_code, end_date))
+            conn.close()
+        else:
+            holdings = pd.read_sql_query("""
+                SELECT ts_code, ann_date, end_date, symbol, mkv, stk_mkv_ratio
+                FROM fund_portfolio
+                WHERE ts_code = ? AND end_date = ?
+            """, conn, params=(ts_code, end_date))
+            conn.close()
+            df = industry_exposure(holdings)
+        
+        return {
+            "报告期": end_date,
+            "行业分布": [
+                {"行业": industry, "占比": weight, "市值": mkv, "股票数": int(holding_count)}
+                for industry, weight, mkv, holding_count
+                in df[['industry', 'weight', 'mkv', 'holding_count']].itertuples(index=False, name=None)
+            ]
+        }
+    
+    def screen_by_industry(self, industry: str, min_weight: float = 0,
+                           end_date: Optional[str] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        行业暴露筛选：某行业持股占比不低于 min_weight（%）的基金
+        
+        例如 screen_by_industry("半导体", 40) 找出半导体占净值 40% 以上的基金。
+        读取 fund_industry_exposure 表（按 industry, end_date, weight 索引，一次查询）；
+        表不存在时由各基金最近一期持仓实时汇总
+        
+        参数:
+            industry: 行业名称（与 STOCK_NAME_DATA 一致）
+            min_weight: 最低占比（%）
+            end_date: 报告期，默认各基金最近一期
+            limit: 最多返回条数
+        
+        返回:
+            DataFrame[ts_code, name, fund_type, end_date, weight, mkv, holding_count]，按占比降序
+        """
+        conn = self._connect()
+        
+        if self._has_exposure_table(conn):
+            if end_date is not None:
+                period_filter = "e.end_date = ?"
+                params = [industry, end_date, min_weight]
+            else:
+                period_filter = """e.end_date = (
+                    SELECT MAX(x.end_date) FROM fund_industry_exposure x WHERE x.ts_code = e.ts_code
+                )"""
+                params = [industry, min_weight]
+            
+            query = f"""
+            SELECT e.ts_code, b.name, b.fund_type, e.end_date, e.weight, e.mkv, e.holding_count
+            FROM fund_industry_exposure e
+            LEFT JOIN fund_basic b ON e.ts_code = b.ts_code
+            WHERE e.industry = ? AND {period_filter} AND e.weight >= ?
+            ORDER BY e.weight DESC, e.ts_code
+            """
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(int(limit))
+            
+            df = pd.read_sql_query(query, conn, params=params)
+            conn.close()
+            return df
+        
+        # 表不存在：实时汇总
+        if end_date is not None:
+            holdings = pd.read_sql_query("""
+                SELECT ts_code, ann_date, end_date, symbol, mkv, stk_mkv_ratio
+                FROM fund_portfolio
+                WHERE end_date = ?
+            """, conn, params=(end_date,))
+        else:
+            holdings = pd.read_sql_query("""
+                SELECT p.ts_code, p.ann_date, p.end_date, p.symbol, p.mkv, p.stk_mkv_ratio
+                FROM fund_portfolio p
+                JOIN (
+                    SELECT ts_code, MAX(end_date) AS end_date
+                    FROM fund_portfolio
+                    GROUP BY ts_code
+                ) latest ON p.ts_code = latest.ts_code AND p.end_date = latest.end_date
+            """, conn)
+        names = pd.read_sql_query("SELECT ts_code, name, fund_type FROM fund_basic", conn)
+        conn.close()
+        
+        df = industry_exposure(holdings)
+        df = df[(df['industry'] == industry) & (df['weight'] >= min_weight)]
+        df = df.merge(names, on='ts_code', how='left')
+        df = df.sort_values(['weight', 'ts_code'], ascending=[False, True])
+        if limit is not None:
+            df = df.head(int(limit))
+        
+        return df[['ts_code', 'name', 'fund_type', 'end_date', 'weight', 'mkv', 'holding_count']].reset_index(drop=True)
+    
+    def refresh_industry_exposure(self, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新行业穿透表（fund_industry_exposure）
+        
+        参数:
+            full: True 重算全部报告期；False 只重算有变化的报告期
+        
+        返回:
+            统计信息 {"mode", "periods", "records"}
+        """
+        from precompute import IndustryExposureBuilder
+        
+        return IndustryExposureBuilder(self._sqlite_path()).build(full=full)
+    
     def analyze_portfolio_concentration(self, ts_code: str) -> Dict[str, Any]:
         """分析持仓集中度"""
         conn = self._connect()
@@ -610,6 +1126,10 @@ class FundAnalyzer:
         df = pd.read_sql_query(query, conn, params=(ts_code,))
         conn.close()
         
+        return self._concentration_from_frame(df)
+    
+    def _concentration_from_frame(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """由按披露日期、占比降序排列的持仓计算集中度"""
         if df.empty:
             return None
         
@@ -666,6 +1186,11 @@ class FundAnalyzer:
         df = pd.read_sql_query(query, conn, params=(ts_code,))
         conn.close()
         
+        return self._scale_from_shares(df)
+    
+    @staticmethod
+    def _scale_from_shares(df: pd.DataFrame) -> Optional[float]:
+        """由按日期降序的份额记录取最新规模（亿份）"""
         if df.empty:
             return None
         
@@ -675,22 +1200,34 @@ class FundAnalyzer:
     # 6. 综合评分系统（重点！）
     # ============================================================
     
-    def calculate_fund_score(self, ts_code: str) -> Dict[str, Any]:
+    def calculate_fund_score(self, ts_code: str, as_of: Optional[str] = None) -> Dict[str, Any]:
         """
         计算基金综合评分（满分100分）
         
+        参数:
+            ts_code: 基金代码
+            as_of: 截至日期（YYYY-MM-DD），按当日可得的净值评分；None 表示截至最新
+        
         新版评分标准（v2.1）：
         1. 收益得分（80分）：最近5年收益累加，>100%得满分80分，按比例计算，负值0分
-                            不足5年按年扣减10%（每缺1年-10%）
-        2. 风险得分（20分）：最近5年回撤累加，=0得满分20分，>40%得0分，按比例换算
-                            不足5年按年扣减10%（每缺1年-10%）
+                            不足5年按年扣减（每缺1年-15%）
+        2. 风险得分（20分）：每年收益 >20%得4分，>0%得3分，>-10%得2分，其余0分，累加
+                            不足5年按年扣减（每缺1年-20%）
         
         星级评定：>80分=5星，>70分=4星，>60分=3星，>50分=2星，其余=1星
         
         注意：不再查询成立日期，直接查询最近5年数据，有多少算多少
+        评分规则见 scoring 模块（与 batch_calculate_scores 共用）
         """
-        from datetime import datetime
+        return self._score_fund(ts_code, as_of=as_of)
+    
+    def _score_fund(self, ts_code: str, as_of: Optional[str] = None, nav: Optional[NavStore] = None) -> Dict[str, Any]:
+        """
+        计算评分明细（calculate_fund_score 的实现）
         
+        参数:
+            nav: 已载入该基金净值的列存（报告上下文），None 时按常规路径读取年度收益
+        """
         score_detail = {
             "总分": 0,
             "收益得分": 0,
@@ -703,121 +1240,17 @@ class FundAnalyzer:
         
         try:
             # 🔥 不再查询成立日期，直接查询最近5年（包括今年）
-            current_year = datetime.now().year
-            years_to_check = [str(year) for year in range(current_year, current_year - 5, -1)]
-            
-            # 例如：2025年查询 ['2025', '2024', '2023', '2022', '2021']
+            years_to_check = scoring.score_years(int(as_of[:4]) if as_of else None)
             
-            # ============================================================
-            # 1. 收益得分（80分）
-            # ============================================================
-            # 获取最近5年每年的收益率
-            year_returns = self.batch_calculate_year_returns([ts_code], years_to_check)
-            
-            valid_returns = []
-            if ts_code in year_returns:
-                returns_data = year_returns[ts_code]
-                
-                for year in years_to_check:
-                    if year in returns_data and returns_data[year] is not None:
-                        valid_returns.append(returns_data[year])
-                        score_detail["收益详情"][year] = returns_data[year]
-            
-            # 计算实际数据年限（有多少年数据）
-            actual_years = len(valid_returns)
-            score_detail["数据年限"] = actual_years
-            
-            if actual_years > 0:
-                
-                # 计算5年收益累加
-                if valid_returns:
-                    total_return = sum(valid_returns)
-                    score_detail["收益详情"]["累计收益"] = round(total_return, 2)
-                    
-                    # 负值得0分
-                    if total_return <= 0:
-                        return_score = 0
-                    else:
-                        # >100%得80分，按比例计算
-                        return_score = min(80, (total_return / 100) * 80)
-                    
-                    # 不足5年扣减：每缺1年减10%
-                    missing_years = 5 - actual_years
-                    if missing_years > 0:
-                        penalty = missing_years * 0.15
-                        return_score = return_score * (1 - penalty)
-                    
-                    score_detail["收益得分"] = max(0, round(return_score, 1))
-            
-            # ============================================================
-            # 2. 风险得分（20分）- 基于年度收益稳定性
-            # ============================================================
-            # 🔥 新规则：根据每年的收益率评分
-            # 年收益 > 20%: 4分
-            # 年收益 > 0%:  3分
-            # 年收益 > -10%: 2分
-            # 年收益 <= -10%: 0分
-            # 最多5年，累加得出最终风险分
-            
-            risk_points = []
-            
-            for year, year_return in score_detail["收益详情"].items():
-                if year == "累计收益":
-                    continue
-                
-                if year_return is not None:
-                    # 根据收益率计算风险分
-                    if year_return > 20:
-                        points = 4
-                    elif year_return > 0:
-                        points = 3
-                    elif year_return > -10:
-                        points = 2
-                    else:  # <= -10
-                        points = 0
-                    
-                    risk_points.append(points)
-                    score_detail["风险详情"][year + "风险分"] = points
-            
-            if risk_points:
-                # 累加风险分
-                total_risk_points = sum(risk_points)
-                score_detail["风险详情"]["累计风险分"] = total_risk_points
-                
-                # 实际年数
-                actual_years = len(risk_points)
-                
-                # 风险得分：最多5年 × 4分 = 20分
-                risk_score = total_risk_points
-                
-                # 🔥 年限扣分：不足5年，每少1年减少20%
-                missing_years = 5 - actual_years
-                if missing_years > 0:
-                    penalty = missing_years * 0.20  # 每年20%
-                    risk_score = risk_score * (1 - penalty)
-                
-                score_detail["风险得分"] = max(0, round(risk_score, 1))
-            
-            # ============================================================
-            # 3. 计算总分和评级
-            # ============================================================
-            score_detail["总分"] = round(
-                score_detail["收益得分"] + score_detail["风险得分"], 
-                1
-            )
-            
-            # 星级评定（100分制）
-            total = score_detail["总分"]
-            if total > 80:
-                score_detail["评级"] = "五星 ★★★★★"
-            elif total > 70:
-                score_detail["评级"] = "四星 ★★★★"
-            elif total > 60:
-                score_detail["评级"] = "三星 ★★★"
-            elif total > 50:
-                score_detail["评级"] = "二星 ★★"
+            if nav is not None:
+                year_returns = nav.year_returns([ts_code], years_to_check, int(years_to_check[0]),
+                                                as_of=to_day(as_of) if as_of else None)
             else:
-                score_detail["评级"] = "一星 ★"
+                year_returns = self.batch_calculate_year_returns([ts_code], years_to_check, as_of=as_of)
+            returns = scoring.returns_matrix(year_returns, [ts_code], years_to_check)
+            
+            scores = scoring.score_matrix(returns)
+            score_detail = scoring.score_detail(scores, 0, returns, years_to_check)
             
         except Exception as e:
             score_detail["错误"] = str(e)
@@ -833,100 +1266,219 @@ class FundAnalyzer:
         year_returns: Dict[str, Dict[str, Optional[float]]] = None
     ) -> Dict[str, Optional[float]]:
         """
-        批量计算基金评分（优化版 - 与详情页保持一致）
+        批量计算基金评分（与详情页共用 scoring 评分引擎）
         
         参数:
             ts_codes: 基金代码列表
             year_returns: 预先获取的年度收益数据 {ts_code: {year: return}}
         
         返回:
-            {ts_code: score}
+            {ts_code: score}，无年度数据的基金为 None
         """
-        from datetime import datetime
-        
-        conn = self._connect()
-        results = {}
-        current_year = datetime.now().year
-        years_to_check = [str(year) for year in range(current_year, current_year - 5, -1)]
+        years_to_check = scoring.score_years()
         
         # 如果没有提供年度收益，批量获取
         if year_returns is None:
             year_returns = self.batch_get_cached_returns(ts_codes, years_to_check)
         
-        # 批量计算每个基金的评分
-        for ts_code in ts_codes:
-            try:
-                returns_data = year_returns.get(ts_code, {})
-                valid_returns = []
-                
-                for year in years_to_check:
-                    if year in returns_data and returns_data[year] is not None:
-                        valid_returns.append(returns_data[year])
-                
-                actual_years = len(valid_returns)
-                
-                if actual_years == 0:
-                    results[ts_code] = None
-                    continue
-                
-                # 1. 收益得分（80分）
-                total_return = sum(valid_returns)
-                return_score = 0 if total_return <= 0 else min(80, (total_return / 100) * 80)
-                missing_years = 5 - actual_years
-                if missing_years > 0:
-                    return_score *= (1 - missing_years * 0.15)
-                return_score = max(0, round(return_score, 1))
-                
-                # 2. 风险得分（20分） - 基于年度收益稳定性
-                # 🔥 新规则：根据每年的收益率评分
-                # 年收益 > 20%: 4分
-                # 年收益 > 0%:  3分
-                # 年收益 > -10%: 2分
-                # 年收益 <= -10%: 0分
-                
-                risk_points = []
-                
-                for year in years_to_check:
-                    if year in returns_data and returns_data[year] is not None:
-                        year_return = returns_data[year]
-                        
-                        # 根据收益率计算风险分
-                        if year_return > 20:
-                            points = 4
-                        elif year_return > 0:
-                            points = 3
-                        elif year_return > -10:
-                            points = 2
-                        else:  # <= -10
-                            points = 0
-                        
-                        risk_points.append(points)
-                
-                risk_score = 0
-                if risk_points:
-                    # 累加风险分（最多5年 × 4分 = 20分）
-                    risk_score = sum(risk_points)
-                    
-                    # 🔥 年限扣分：不足5年，每少1年减少20%
-                    actual_risk_years = len(risk_points)
-                    missing_risk_years = 5 - actual_risk_years
-                    if missing_risk_years > 0:
-                        risk_score *= (1 - missing_risk_years * 0.20)
-                    risk_score = max(0, round(risk_score, 1))
-                
-                # 3. 总分
-                total_score = round(return_score + risk_score, 1)
-                results[ts_code] = total_score
-                
-            except Exception as e:
-                print(f"批量评分失败 {ts_code}: {e}")
-                results[ts_code] = None
+        # 🔥 一次向量化计算全部基金
+        returns = scoring.returns_matrix(year_returns, ts_codes, years_to_check)
+        scores = scoring.score_matrix(returns)
+        
+        return {
+            ts_code: (float(total) if years > 0 else None)
+            for ts_code, total, years in zip(ts_codes, scores["total"], scores["years"])
+        }
+    
+    def get_stored_scores(self, ts_codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        从评分表 fund_scores 读取当年评分（表不存在或未评分的基金不返回）
+        
+        返回:
+            {ts_code: {"total_score", "rating", "stars", "red_star", "data_years", "detail"}}
+        """
+        import json
+        
+        if not ts_codes:
+            return {}
+        
+        conn = self._connect()
+        
+        try:
+            has_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fund_scores'"
+            ).fetchone() is not None
+            if not has_table:
+                return {}
+            
+            placeholders = ','.join(['?' for _ in ts_codes])
+            query = f"""
+                SELECT ts_code, total_score, rating, stars, red_star, data_years, detail
+                FROM fund_scores
+                WHERE score_year = ? AND ts_code IN ({placeholders})
+            """
+            rows = conn.execute(query, (datetime.now().year, *ts_codes)).fetchall()
+        finally:
+            conn.close()
+        
+        return {
+            ts_code: {
+                "total_score": total_score,
+                "rating": rating,
+                "stars": stars,
+                "red_star": bool(red_star),
+                "data_years": data_years,
+                "detail": json.loads(detail)
+            }
+            for ts_code, total_score, rating, stars, red_star, data_years, detail in rows
+        }
+    
+    def get_fund_score(self, ts_code: str) -> Dict[str, Any]:
+        """基金评分明细（优先读取评分表，未评分时实时计算）"""
+        stored = self.get_stored_scores([ts_code])
+        if ts_code in stored:
+            return stored[ts_code]["detail"]
+        return self.calculate_fund_score(ts_code)
+    
+    def batch_get_scores(
+        self,
+        ts_codes: List[str],
+        year_returns: Dict[str, Dict[str, Optional[float]]] = None
+    ) -> Dict[str, Optional[float]]:
+        """
+        批量获取评分（优先读取评分表，未评分的基金实时计算）
+        
+        参数:
+            ts_codes: 基金代码列表
+            year_returns: 预先获取的年度收益数据（仅用于实时计算部分）
+        
+        返回:
+            {ts_code: score}
+        """
+        stored = self.get_stored_scores(ts_codes)
+        results = {ts_code: stored[ts_code]["total_score"] for ts_code in ts_codes if ts_code in stored}
+        
+        missing = [ts_code for ts_code in ts_codes if ts_code not in stored]
+        if missing:
+            results.update(self.batch_calculate_scores(missing, year_returns))
         
-        conn.close()
         return results
     
+    def refresh_fund_scores(self, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新评分表（fund_scores）
+        
+        参数:
+            full: True 全量重建；False 仅重算净值有更新的基金
+        
+        返回:
+            统计信息 {"mode", "funds", "computed_date"}
+        """
+        from precompute import ScoresBuilder
+        
+        return ScoresBuilder(self._sqlite_path()).build(full=full, analyzer=self)
+    
+    def get_rating_history(self, ts_code: str, years: int = 10) -> List[Dict[str, Any]]:
+        """
+        评级历史（每月末的评分和星级）
+        
+        优先读取 fund_rating_history 表；表不存在时按净值实时计算该基金最近 years 年的月末评分
+        
+        返回:
+            [{"日期", "综合评分", "星级", "评级"}]，按日期升序
+        """
+        conn = self._connect()
+        
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='fund_rating_history'"
+        ).fetchone() is not None
+        
+        if has_table:
+            df = pd.read_sql_query("""
+                SELECT as_of_date, total_score, stars
+                FROM fund_rating_history
+                WHERE ts_code = ?
+                ORDER BY as_of_date
+            """, conn, params=(ts_code,))
+            conn.close()
+        else:
+            store = self.nav_store
+            if store is None:
+                store = NavStore.load(conn, [ts_code])
+            conn.close()
+            
+            series = store.series(ts_code)
+            if series is None:
+                return []
+            
+            last_date = day_to_str(series[0][-1])
+            start_date = f"{int(last_date[:4]) - years}-01-01"
+            df = scoring.rating_history(store, [ts_code], scoring.month_ends(start_date, last_date))
+        
+        return [
+            {
+                "日期": as_of_date,
+                "综合评分": float(total_score),
+                "星级": int(stars),
+                "评级": scoring.star_rating(total_score)
+            }
+            for as_of_date, total_score, stars in df[['as_of_date', 'total_score', 'stars']].itertuples(index=False, name=None)
+        ]
+    
+    def refresh_rating_history(self, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新评级历史表（fund_rating_history）
+        
+        参数:
+            full: True 全量回填；False 只补算新的月末
+        
+        返回:
+            统计信息 {"mode", "months", "records"}
+        """
+        from precompute import RatingHistoryBuilder
+        
+        return RatingHistoryBuilder(self._sqlite_path()).build(full=full, store=self.nav_store)
+    
+    def refresh_pinyin_index(self, full: bool = False) -> Dict[str, Any]:
+        """
+        刷新名称拼音前缀索引（search_pinyin，需要可选依赖 pypinyin）
+        
+        参数:
+            full: 强制重建；默认 fund_basic 未变化时跳过
+        
+        返回:
+            {"available": 是否安装 pypinyin, "keys": 写入的键数量（跳过时为0）}
+        """
+        if not pinyin_index.pinyin_available():
+            return {"available": False, "keys": 0}
+        
+        conn = self._connect_writable()
+        try:
+            keys = pinyin_index.ensure_pinyin_index(conn, rebuild=full)
+        finally:
+            conn.close()
+        
+        return {"available": True, "keys": keys}
+    
     def _calculate_year_max_drawdown(self, ts_code: str, year: str) -> Optional[float]:
         """计算指定年份的最大回撤"""
+        store = self.nav_store
+        if store is not None:
+            series = store.series(ts_code)
+            if series is None:
+                return None
+            
+            dates, navs, _ = series
+            lo = np.searchsorted(dates, to_day(f"{year}-01-01"), side='left')
+            hi = np.searchsorted(dates, to_day(f"{year}-12-31"), side='right')
+            navs = navs[lo:hi]
+            
+            if len(navs) < 2:
+                return None
+            
+            peak = np.maximum.accumulate(navs)
+            return float(min(0.0, ((navs - peak) / peak * 100).min()))
+        
         conn = self._connect()
         
         try:
@@ -1011,43 +1563,57 @@ class FundAnalyzer:
             
             # 条件3：基金净值累计增长 > 沪深300累计增长
             # 获取基金最早和最新净值
-            conn = self._connect()
-            
-            query = """
-                SELECT MIN(nav_date) as first_date, MAX(nav_date) as last_date
-                FROM fund_nav
-                WHERE ts_code = ? AND unit_nav IS NOT NULL
-            """
-            df = pd.read_sql_query(query, conn, params=(ts_code,))
-            
-            if df.empty or df['first_date'].iloc[0] is None:
+            store = self.nav_store
+            if store is not None:
+                series = store.series(ts_code)
+                if series is None or len(series[0]) < 2 or series[0][0] == series[0][-1]:
+                    return False
+                
+                dates, navs, _ = series
+                first_day = int(dates[0])
+                last_day = int(dates[-1])
+                first_nav = navs[0]
+                last_nav = navs[-1]
+            else:
+                conn = self._connect()
+                
+                query = """
+                    SELECT MIN(nav_date) as first_date, MAX(nav_date) as last_date
+                    FROM fund_nav
+                    WHERE ts_code = ? AND unit_nav IS NOT NULL
+                """
+                df = pd.read_sql_query(query, conn, params=(ts_code,))
+                
+                if df.empty or df['first_date'].iloc[0] is None:
+                    conn.close()
+                    return False
+                
+                first_date = df['first_date'].iloc[0]
+                last_date = df['last_date'].iloc[0]
+                first_day = to_day(first_date)
+                last_day = to_day(last_date)
+                
+                # 获取首尾净值
+                query_nav = """
+                    SELECT nav_date, unit_nav
+                    FROM fund_nav
+                    WHERE ts_code = ? AND nav_date IN (?, ?)
+                    ORDER BY nav_date
+                """
+                df_nav = pd.read_sql_query(query_nav, conn, params=(ts_code, first_date, last_date))
                 conn.close()
-                return False
-            
-            first_date = df['first_date'].iloc[0]
-            last_date = df['last_date'].iloc[0]
-            
-            # 获取首尾净值
-            query_nav = """
-                SELECT nav_date, unit_nav
-                FROM fund_nav
-                WHERE ts_code = ? AND nav_date IN (?, ?)
-                ORDER BY nav_date
-            """
-            df_nav = pd.read_sql_query(query_nav, conn, params=(ts_code, first_date, last_date))
-            conn.close()
-            
-            if len(df_nav) < 2:
-                return False
-            
-            first_nav = df_nav['unit_nav'].iloc[0]
-            last_nav = df_nav['unit_nav'].iloc[-1]
+                
+                if len(df_nav) < 2:
+                    return False
+                
+                first_nav = df_nav['unit_nav'].iloc[0]
+                last_nav = df_nav['unit_nav'].iloc[-1]
             
             # 基金累计涨幅
             fund_growth = (last_nav - first_nav) / first_nav * 100
             
-            # 获取同期沪深300涨幅
-            hs300_growth = self._get_hs300_growth(first_date, last_date)
+            # 获取同期沪深300涨幅（两个分支统一按天数序号查找）
+            hs300_growth = self._get_hs300_growth(first_day, last_day)
             
             if hs300_growth is None:
                 # 如果无法获取沪深300数据，保守不给金色评级
@@ -1060,45 +1626,131 @@ class FundAnalyzer:
             print(f"检查金色评级失败 {ts_code}: {e}")
             return False
     
-    def _get_hs300_growth(self, start_date: str, end_date: str) -> Optional[float]:
+    def batch_check_gold_rating(self, ratings: Dict[str, int]) -> Dict[str, bool]:
         """
-        获取沪深300指定期间的累计涨幅
+        批量检查金色评级（条件同 check_gold_rating）
+        
+        一次分组查询取得全部候选基金的成立日期和首尾净值，
+        再与沪深300序列做一次向量化比较
         
         参数:
-            start_date: 开始日期 (YYYYMMDD)
-            end_date: 结束日期 (YYYYMMDD)
+            ratings: {ts_code: 普通星级评分（1-5）}
         
         返回:
-            涨幅百分比，如果获取失败返回 None
+            {ts_code: 是否符合金色评级}
         """
+        from datetime import datetime
+        from benchmark import get_benchmark_series
+        
+        results = {ts_code: False for ts_code in ratings}
+        
+        # 条件1：评级必须 >= 4星
+        candidates = [ts_code for ts_code, rating in ratings.items() if ts_code and (rating or 0) >= 4]
+        if not candidates:
+            return results
+        
         try:
-            from lj_read import StockDataReaderV2
-            from config import DATA_DIR
+            series = get_benchmark_series('000300', market='CN')
+            if series is None:
+                # 如果无法获取沪深300数据，保守不给金色评级
+                return results
             
-            db_path = DATA_DIR / 'astock.db.gz'
-            if not db_path.exists():
-                return None
+            placeholders = ','.join(['?' for _ in candidates])
+            store = self.nav_store
+            conn = self._connect()
             
-            reader = StockDataReaderV2(str(db_path))
-            df = reader.get_stock_data('000300', market='CN')
+            if store is not None:
+                query = f"""
+                    SELECT ts_code, found_date
+                    FROM fund_basic
+                    WHERE ts_code IN ({placeholders})
+                """
+                df = pd.read_sql_query(query, conn, params=candidates)
+                conn.close()
+                
+                # 🔥 净值列存：首尾净值直接按区间下标读取
+                fund_idx = np.array([store.code_index.get(c, -1) for c in df['ts_code']], dtype=np.int64)
+                df = df[fund_idx >= 0].reset_index(drop=True)
+                fund_idx = fund_idx[fund_idx >= 0]
+                
+                first_pos = store.offsets[fund_idx]
+                last_pos = store.offsets[fund_idx + 1] - 1
+                df['first_day'] = store.dates[first_pos]
+                df['last_day'] = store.dates[last_pos]
+                df['first_nav'] = store.unit_nav[first_pos]
+                df['last_nav'] = store.unit_nav[last_pos]
+            else:
+                # 🔥 一次分组查询：成立日期 + 首尾净值
+                query = f"""
+                    WITH bounds AS (
+                        SELECT ts_code, MIN(nav_date) AS first_date, MAX(nav_date) AS last_date
+                        FROM fund_nav
+                        WHERE ts_code IN ({placeholders}) AND unit_nav IS NOT NULL
+                        GROUP BY ts_code
+                    )
+                    SELECT fb.ts_code, fb.found_date, b.first_date, b.last_date,
+                           f.unit_nav AS first_nav, l.unit_nav AS last_nav
+                    FROM fund_basic fb
+                    JOIN bounds b ON b.ts_code = fb.ts_code
+                    JOIN fund_nav f ON f.ts_code = b.ts_code AND f.nav_date = b.first_date
+                    JOIN fund_nav l ON l.ts_code = b.ts_code AND l.nav_date = b.last_date
+                """
+                df = pd.read_sql_query(query, conn, params=candidates)
+                conn.close()
+                
+                df = df.drop_duplicates(subset=['ts_code'], keep='first').reset_index(drop=True)
+                
+                # 两个分支统一为天数序号，再与沪深300比较
+                df['first_day'] = to_days(df['first_date'])
+                df['last_day'] = to_days(df['last_date'])
             
             if df.empty:
-                return None
+                return results
             
-            # 筛选日期范围
-            df_filtered = df[
-                (df['date'] >= start_date) & 
-                (df['date'] <= end_date)
-            ].sort_values('date')
+            # 条件2：成立日期 >= 4年
+            found_year = pd.to_numeric(df['found_date'].astype(str).str[:4], errors='coerce').to_numpy()
+            old_enough = (datetime.now().year - found_year) >= 4
             
-            if len(df_filtered) < 2:
-                return None
+            # 条件3：基金净值累计增长 > 沪深300累计增长
+            first_nav = df['first_nav'].to_numpy(dtype=np.float64)
+            last_nav = df['last_nav'].to_numpy(dtype=np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fund_growth = (last_nav - first_nav) / first_nav * 100
+            first_day = df['first_day'].to_numpy(dtype=np.int64)
+            last_day = df['last_day'].to_numpy(dtype=np.int64)
+            hs300_growth = series.growth_many(first_day, last_day)
+            
+            has_range = first_day < last_day
+            is_gold = old_enough & has_range & (fund_growth > hs300_growth)
+            
+            for ts_code, gold in zip(df['ts_code'], is_gold):
+                results[ts_code] = bool(gold)
+            
+        except Exception as e:
+            print(f"批量检查金色评级失败: {e}")
+        
+        return results
+    
+    def _get_hs300_growth(self, start_date, end_date) -> Optional[float]:
+        """
+        获取沪深300指定期间的累计涨幅
+        
+        参数:
+            start_date: 开始日期（YYYYMMDD / YYYY-MM-DD，或天数序号）
+            end_date: 结束日期（YYYYMMDD / YYYY-MM-DD，或天数序号）
+        
+        返回:
+            涨幅百分比，如果获取失败返回 None
+        """
+        try:
+            from benchmark import get_benchmark_series
             
-            first_close = df_filtered['close'].iloc[0]
-            last_close = df_filtered['close'].iloc[-1]
+            # 🔥 进程内共享的指数序列（只在数据文件变化时重新载入）
+            series = get_benchmark_series('000300', market='CN')
+            if series is None:
+                return None
             
-            growth = (last_close - first_close) / first_close * 100
-            return growth
+            return series.growth(start_date, end_date)
             
         except Exception as e:
             print(f"获取沪深300涨幅失败: {e}")
@@ -1109,9 +1761,7 @@ class FundAnalyzer:
     # ============================================================
     
     def compare_with_peers(self, ts_code: str, top_n: int = 10) -> pd.DataFrame:
-        """与同类基金对比（按类型）"""
-        conn = self._connect()
-        
+        """与同类基金对比（按类型，取全部在市同类基金的近一年收益前 N 名）"""
         # 获取基金类型
         fund_info = self.get_fund_info(ts_code)
         if not fund_info:
@@ -1119,34 +1769,37 @@ class FundAnalyzer:
         
         fund_type = fund_info.get('fund_type')
         
-        # 获取同类基金
-        query = """
-        SELECT ts_code, name
-        FROM fund_basic
-        WHERE fund_type = ? AND status = 'L'
-        LIMIT 50
+        # 🔥 同类排名索引：直接取前 N 名
+        results = [
+            {"代码": peer['ts_code'], "名称": peer['name'], "近一年收益": peer['value']}
+            for peer in self.peer_index.top(fund_type, 365, top_n)
+        ]
+        
+        return pd.DataFrame(results)
+    
+    def get_peer_rank(self, ts_code: str, metric=365) -> Optional[Dict[str, Any]]:
         """
+        基金在同类（相同 fund_type 的在市基金）中的排名
         
-        peers = pd.read_sql_query(query, conn, params=(fund_type,))
-        conn.close()
+        参数:
+            ts_code: 基金代码
+            metric: 回溯天数（如 365），或 'volatility' / 'max_drawdown' / 'sharpe_ratio'
         
-        # 计算每个基金的一年收益率
-        results = []
-        for _, row in peers.iterrows():
-            returns = self.calculate_returns(row['ts_code'], [365])
-            if returns.get("近一年"):
-                results.append({
-                    "代码": row['ts_code'],
-                    "名称": row['name'],
-                    "近一年收益": returns["近一年"]
-                })
-        
-        # 按收益率排序
-        df_results = pd.DataFrame(results)
-        if not df_results.empty:
-            df_results = df_results.sort_values("近一年收益", ascending=False).head(top_n)
-        
-        return df_results
+        返回:
+            {"基金类型", "指标", "数值", "排名", "同类数量", "百分位"}，无数据返回 None
+        """
+        result = self.peer_index.rank(ts_code, metric)
+        if result is None:
+            return None
+        
+        return {
+            "基金类型": result['fund_type'],
+            "指标": self._period_name(metric) if isinstance(metric, int) else metric,
+            "数值": result['value'],
+            "排名": result['rank'],
+            "同类数量": result['total'],
+            "百分位": result['percentile']
+        }
     
     # ============================================================
     # 8. 资金流向分析
@@ -1221,52 +1874,149 @@ class FundAnalyzer:
     # 9. 生成完整报告
     # ============================================================
     
-    def generate_report(self, ts_code: str) -> Dict[str, Any]:
-        """生成基金完整分析报告"""
+    def _report_sections(self, ctx: ReportContext) -> List[Tuple[str, Any]]:
+        """
+        报告的各个分析部分（彼此独立，只读取 ctx）
         
-        report = {
-            "基金代码": ts_code,
-            "生成时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        返回:
+            [(部分名称, 函数)]，函数返回要写入报告的键值
+        """
+        ts_code = ctx.ts_code
         
-        # 基本信息
-        info = self.get_fund_info(ts_code)
-        if info:
-            report["基本信息"] = {
+        def basic_info():
+            info = ctx.info
+            if not info:
+                return {}
+            return {"基本信息": {
                 "基金名称": info.get('name'),
                 "基金类型": info.get('fund_type'),
                 "管理公司": info.get('management'),
                 "成立日期": info.get('found_date'),
                 "基金状态": info.get('status')
-            }
+            }}
         
-        # 收益分析
-        report["收益分析"] = self.calculate_returns(ts_code)
+        def returns():
+            periods = [7, 30, 90, 180, 365, 365*2, 365*3, 365*5, 365*10]
+            return {"收益分析": self._returns_from_series(ctx.nav_series(limit=max(periods) + 30), periods)}
         
-        # 风险分析
-        report["风险分析"] = self.calculate_risk_metrics(ts_code)
+        def risk():
+            series = ctx.nav_series(limit=365 + 30)
+            return {"风险分析": self._risk_from_frame(pd.DataFrame({'unit_nav': series[1] if series is not None else []}))}
         
-        # 规模信息
-        scale = self.get_latest_scale(ts_code)
-        report["最新规模"] = f"{scale}亿份" if scale else "暂无数据"
+        def scale():
+            value = self._scale_from_shares(ctx.shares)
+            return {"最新规模": f"{value}亿份" if value else "暂无数据"}
         
-        # 基金经理
-        managers = self.get_fund_managers(ts_code)
-        if not managers.empty:
+        def manager():
+            managers = ctx.managers
+            if managers.empty:
+                return {}
             current_manager = managers.iloc[0]
-            exp = self.get_manager_experience(current_manager['name'])
-            report["基金经理"] = {
+            exp = self._manager_experience_from_frame(ctx.manager_tenures(current_manager['name']))
+            return {"基金经理": {
                 "姓名": current_manager['name'],
                 "任职时间": current_manager['begin_date'],
                 "管理经验": exp
-            }
+            }}
+        
+        def concentration():
+            return {"持仓集中度": self._concentration_from_frame(ctx.portfolio)}
+        
+        def score():
+            return {"综合评分": self._score_fund(ts_code, nav=ctx.nav)}
+        
+        return [
+            ("基本信息", basic_info),
+            ("收益分析", returns),
+            ("风险分析", risk),
+            ("最新规模", scale),
+            ("基金经理", manager),
+            ("持仓集中度", concentration),
+            ("综合评分", score),
+        ]
+    
+    @property
+    def report_executor(self) -> ThreadPoolExecutor:
+        """报告并行计算的线程池（首次使用时创建，线程数有上限）"""
+        if self._report_executor is None:
+            with self._report_executor_lock:
+                if self._report_executor is None:
+                    self._report_executor = ThreadPoolExecutor(
+                        max_workers=self.REPORT_WORKERS,
+                        thread_name_prefix="report"
+                    )
+        return self._report_executor
+    
+    def generate_report(self, ts_code: str, parallel: bool = False,
+                        section_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        生成基金完整分析报告
+        
+        报告所需数据（基本信息、净值、份额、基金经理、持仓）通过 ReportContext
+        每张表只读取一次；读取在用到该表的部分中进行，并行时受该部分的超时控制
+        
+        参数:
+            ts_code: 基金代码
+            parallel: 是否在线程池中并行计算各部分
+            section_timeout: 并行时每个部分的超时（秒，从提交时开始计时），
+                             None 表示不限时
+        
+        返回:
+            报告字典。并行时额外包含：
+                "分析耗时": {部分名称: 毫秒}（含该部分的数据读取；超时的部分为已等待的时间）
+                "未完成": {部分名称: 原因}（仅在有部分超时或出错时出现）
+            超时或出错的部分不写入报告，其余部分照常返回。
+            超时时尚未开始的部分被取消；已在运行的部分无法中断，
+            会在后台跑完（继续占用一个工作线程），结果丢弃
+        """
+        
+        report = {
+            "基金代码": ts_code,
+            "生成时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
         
-        # 持仓分析
-        concentration = self.analyze_portfolio_concentration(ts_code)
-        report["持仓集中度"] = concentration
+        started = time.perf_counter()
+        ctx = ReportContext(ts_code, self._connect, nav_store=self.nav_store)
+        sections = self._report_sections(ctx)
+        
+        if not parallel:
+            for _, section in sections:
+                report.update(section())
+            return report
+        
+        def timed(section):
+            section_start = time.perf_counter()
+            result = section()
+            return result, round((time.perf_counter() - section_start) * 1000, 1)
+        
+        submitted = time.perf_counter()
+        futures = [(name, self.report_executor.submit(timed, section)) for name, section in sections]
+        
+        timings = {}
+        unfinished = {}
+        for name, future in futures:
+            remaining = None
+            if section_timeout is not None:
+                remaining = max(0.0, section_timeout - (time.perf_counter() - submitted))
+            try:
+                result, elapsed_ms = future.result(timeout=remaining)
+                report.update(result)
+                timings[name] = elapsed_ms
+            except FuturesTimeout:
+                # 尚在排队的部分直接取消，不再占用线程池；
+                # 已开始的部分无法中断，在后台跑完后结果丢弃
+                future.cancel()
+                timings[name] = round((time.perf_counter() - submitted) * 1000, 1)
+                unfinished[name] = f"超时（>{section_timeout}秒）"
+            except Exception as e:
+                timings[name] = round((time.perf_counter() - submitted) * 1000, 1)
+                unfinished[name] = str(e)
+                print(f"[WARN] 报告部分计算失败 {ts_code} {name}: {e}")
         
-        # 综合评分
-        report["综合评分"] = self.calculate_fund_score(ts_code)
+        timings["总计"] = round((time.perf_counter() - started) * 1000, 1)
+        report["分析耗时"] = timings
+        if unfinished:
+            report["未完成"] = unfinished
         
         return report
     
@@ -1285,98 +2035,171 @@ class FundAnalyzer:
         返回:
             基金列表，包含代码、名称、年度收益、评分等
         """
+        start_date = f"{year}-01-01"
+        store = self.nav_store
         conn = self._connect()
         
-        # 获取所有在售基金
-        query = """
-        SELECT ts_code, name, fund_type, management
-        FROM fund_basic
-        WHERE status = 'L'
-        """
-        
-        funds_df = pd.read_sql_query(query, conn)
-        conn.close()
+        if store is not None:
+            # 获取所有在售基金
+            query = """
+            SELECT ts_code, name, fund_type, management
+            FROM fund_basic
+            WHERE status = 'L'
+            """
+            funds_df = pd.read_sql_query(query, conn)
+            conn.close()
+            
+            if funds_df.empty:
+                return []
+            
+            # 🔥 净值列存：一次分组二分查找得到年初和最新净值位置
+            fund_idx = np.array([store.code_index.get(c, -1) for c in funds_df['ts_code']], dtype=np.int64)
+            present = fund_idx >= 0
+            funds_df = funds_df[present].reset_index(drop=True)
+            fund_idx = fund_idx[present]
+            
+            seg_end = store.offsets[fund_idx + 1]
+            start_pos = store.locate(fund_idx, np.full(len(fund_idx), to_day(start_date)), side='left')
+            has_start = start_pos < seg_end
+            
+            funds_df = funds_df[has_start].reset_index(drop=True)
+            start_nav = store.unit_nav[start_pos[has_start]]
+            latest_pos = seg_end[has_start] - 1
+            latest_nav = store.unit_nav[latest_pos]
+            latest_dates = [day_to_str(d) for d in store.dates[latest_pos]]
+        else:
+            # 🔥 一次集合查询：所有在售基金的年初净值（该年1月1日或之后的第一个净值）和最新净值
+            query = """
+            WITH starts AS (
+                SELECT ts_code, MIN(nav_date) AS start_date
+                FROM fund_nav
+                WHERE nav_date >= ? AND unit_nav IS NOT NULL
+                GROUP BY ts_code
+            ),
+            latest AS (
+                SELECT ts_code, MAX(nav_date) AS latest_date
+                FROM fund_nav
+                WHERE unit_nav IS NOT NULL
+                GROUP BY ts_code
+            )
+            SELECT fb.ts_code, fb.name, fb.fund_type, fb.management,
+                   s.unit_nav AS start_nav, l.unit_nav AS latest_nav, lt.latest_date
+            FROM fund_basic fb
+            JOIN starts st ON st.ts_code = fb.ts_code
+            JOIN fund_nav s ON s.ts_code = st.ts_code AND s.nav_date = st.start_date
+            JOIN latest lt ON lt.ts_code = fb.ts_code
+            JOIN fund_nav l ON l.ts_code = lt.ts_code AND l.nav_date = lt.latest_date
+            WHERE fb.status = 'L'
+              AND s.unit_nav IS NOT NULL AND l.unit_nav IS NOT NULL
+            """
+            funds_df = pd.read_sql_query(query, conn, params=(start_date,))
+            conn.close()
+            
+            # 同一日期可能有重复净值记录
+            funds_df = funds_df.drop_duplicates(subset=['ts_code'], keep='last').reset_index(drop=True)
+            
+            start_nav = funds_df['start_nav'].to_numpy(dtype=np.float64)
+            latest_nav = funds_df['latest_nav'].to_numpy(dtype=np.float64)
+            latest_dates = funds_df['latest_date'].tolist()
         
         if funds_df.empty:
             return []
         
-        # 计算每只基金的年度收益
-        results = []
+        # 计算年度收益率
+        with np.errstate(divide='ignore', invalid='ignore'):
+            year_returns = (latest_nav - start_nav) / start_nav * 100
+        year_returns = np.where(np.isfinite(year_returns), year_returns, -np.inf)
         
-        for _, fund in funds_df.iterrows():
-            try:
-                ts_code = fund['ts_code']
-                
-                # 获取年初和最新净值
-                conn = self._connect()
-                
-                # 年初净值（当年1月1日或之后的第一个净值）
-                start_date = f"{year}-01-01"
-                query_start = """
-                SELECT unit_nav, nav_date
-                FROM fund_nav
-                WHERE ts_code = ? AND nav_date >= ? AND unit_nav IS NOT NULL
-                ORDER BY nav_date ASC
-                LIMIT 1
-                """
-                
-                start_nav_df = pd.read_sql_query(query_start, conn, params=(ts_code, start_date))
-                
-                # 最新净值
-                query_latest = """
-                SELECT unit_nav, nav_date
-                FROM fund_nav
-                WHERE ts_code = ? AND unit_nav IS NOT NULL
-                ORDER BY nav_date DESC
-                LIMIT 1
-                """
-                
-                latest_nav_df = pd.read_sql_query(query_latest, conn, params=(ts_code,))
-                conn.close()
-                
-                if start_nav_df.empty or latest_nav_df.empty:
-                    continue
-                
-                start_nav = start_nav_df['unit_nav'].iloc[0]
-                latest_nav = latest_nav_df['unit_nav'].iloc[0]
-                latest_date = latest_nav_df['nav_date'].iloc[0]
-                
-                # 计算年度收益率
-                year_return = (latest_nav - start_nav) / start_nav * 100
-                
-                # 获取评分
-                score = self.calculate_fund_score(ts_code)
-                
-                results.append({
-                    "排名": 0,  # 稍后填充
-                    "代码": ts_code,
-                    "名称": fund['name'],
-                    "类型": fund['fund_type'],
-                    "公司": fund['management'],
-                    f"{year}年收益率": round(year_return, 2),
-                    "最新净值": round(latest_nav, 4),
-                    "更新日期": latest_date,
-                    "综合评分": score.get('总分', 0),
-                    "评级": score.get('评级', '未评级')
-                })
-                
-            except Exception as e:
-                # 跳过有问题的基金
-                continue
+        # 🔥 部分选择前N名：先求第N名的收益率，只对不低于它的候选排序
+        # 按两位小数的收益率降序、相同收益按基金代码（结果稳定，并列的基金不会被随意截断）
+        n_valid = int(np.isfinite(year_returns).sum())
+        top_n = min(top_n, n_valid)
+        if top_n <= 0:
+            return []
+        
+        rounded = np.round(year_returns, 2)
+        cutoff = np.partition(rounded, -top_n)[-top_n]
+        candidates = np.flatnonzero(rounded >= cutoff)
+        codes = funds_df['ts_code'].to_numpy().astype(str)
+        top_idx = candidates[np.lexsort((codes[candidates], -rounded[candidates]))][:top_n]
         
-        # 按年度收益率排序
-        results_sorted = sorted(results, key=lambda x: x[f"{year}年收益率"], reverse=True)
+        # 只对前N名取评分（优先读取评分表）
+        stored = self.get_stored_scores([funds_df.iloc[i]['ts_code'] for i in top_idx])
         
-        # 添加排名
-        for idx, item in enumerate(results_sorted[:top_n], 1):
-            item["排名"] = idx
+        results = []
+        for rank, i in enumerate(top_idx, 1):
+            fund = funds_df.iloc[i]
+            if fund['ts_code'] in stored:
+                score = stored[fund['ts_code']]["detail"]
+            else:
+                score = self.calculate_fund_score(fund['ts_code'])
+            
+            results.append({
+                "排名": rank,
+                "代码": fund['ts_code'],
+                "名称": fund['name'],
+                "类型": fund['fund_type'],
+                "公司": fund['management'],
+                f"{year}年收益率": round(float(year_returns[i]), 2),
+                "最新净值": round(float(latest_nav[i]), 4),
+                "更新日期": latest_dates[i],
+                "综合评分": score.get('总分', 0),
+                "评级": score.get('评级', '未评级')
+            })
         
-        return results_sorted[:top_n]
+        return results
     
     # ============================================================
     # 10. 筛选功能
     # ============================================================
     
+    @property
+    def facet_index(self) -> FacetIndex:
+        """筛选分面索引（全部基金，按评分缓存日期排序；数据变化后自动重建）"""
+        signature = self._data_signature('fund_basic', 'fund_returns_cache', 'fund_risk_metrics')
+        
+        if self._facet_index is None or self._facet_index_signature != signature:
+            with self._facet_index_lock:
+                if self._facet_index is None or self._facet_index_signature != signature:
+                    conn = self._connect()
+                    
+                    def has_table(name):
+                        return conn.execute(
+                            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+                        ).fetchone() is not None
+                    
+                    # 关联缓存表获取最新评分日期
+                    if has_table('fund_returns_cache'):
+                        cache_column = "frc.computed_date as cache_date"
+                        cache_join = """LEFT JOIN (
+                            SELECT ts_code, MAX(computed_date) as computed_date
+                            FROM fund_returns_cache
+                            GROUP BY ts_code
+                        ) frc ON fb.ts_code = frc.ts_code"""
+                    else:
+                        cache_column = "NULL as cache_date"
+                        cache_join = ""
+                    
+                    # 风险指标预计算表存在时一并返回（供列表按风险排序）
+                    has_risk = has_table('fund_risk_metrics')
+                    risk_columns = ", frm.volatility, frm.max_drawdown, frm.sharpe_ratio" if has_risk else ""
+                    risk_join = "LEFT JOIN fund_risk_metrics frm ON fb.ts_code = frm.ts_code" if has_risk else ""
+                    
+                    frame = pd.read_sql_query(f"""
+                        SELECT fb.ts_code, fb.name, fb.fund_type, fb.management, fb.invest_type, 
+                               fb.found_date, fb.list_date, fb.status,
+                               {cache_column}{risk_columns}
+                        FROM fund_basic fb
+                        {cache_join}
+                        {risk_join}
+                    """, conn)
+                    conn.close()
+                    
+                    self._facet_index = FacetIndex.build(frame)
+                    self._facet_index_signature = signature
+        
+        return self._facet_index
+    
     def get_filter_options(self) -> Dict[str, List[str]]:
         """
         获取筛选选项
@@ -1384,50 +2207,73 @@ class FundAnalyzer:
         返回:
             包含公司、类型等选项的字典
         """
+        index = self.facet_index
+        
+        return {
+            "companies": index.values('company'),
+            "fund_types": index.values('fund_type'),
+            "invest_types": index.values('invest_type')
+        }
+    
+    def _search_bits(self, index: FacetIndex, keyword: str) -> Optional[int]:
+        """关键词搜索结果的位图（无关键词返回 None）"""
+        if not keyword:
+            return None
+        
         conn = self._connect()
+        search_sql, search_params = fund_search.search_condition(conn, keyword)
+        codes = [row[0] for row in conn.execute(
+            f"SELECT fb.ts_code FROM fund_basic fb WHERE {search_sql}", search_params
+        )]
+        conn.close()
         
-        # 获取基金公司列表
-        query_companies = """
-        SELECT DISTINCT management
-        FROM fund_basic
-        WHERE management IS NOT NULL AND management != ''
-        ORDER BY management
+        return index.codes_bits(codes)
+    
+    def _attach_screen_metrics(self, index: ScreenIndex, fields):
+        """为筛选排序索引附加需要净值计算的字段（回溯收益；无预计算表时的风险指标）"""
+        metrics = {}
+        for field in fields:
+            if index.has_field(field):
+                continue
+            if field in TRAILING_FIELDS:
+                metrics[field] = TRAILING_FIELDS[field]
+            elif field in PEER_RISK_METRICS:
+                metrics[field] = field
+        
+        if metrics:
+            peer = self.peer_index
+            index.add_metrics({field: peer.values(metric) for field, metric in metrics.items()})
+    
+    def _filter_bits(self, filters: Dict[str, str],
+                     screen: Optional[ScreenIndex] = None) -> Tuple[FacetIndex, Optional[int]]:
         """
-        companies_df = pd.read_sql_query(query_companies, conn)
-        companies = companies_df['management'].tolist()
+        筛选使用的分面索引，以及关键词、筛选表达式限定的位图（均未设置时为 None）
         
-        # 获取基金类型
-        query_types = """
-        SELECT DISTINCT fund_type
-        FROM fund_basic
-        WHERE fund_type IS NOT NULL AND fund_type != ''
-        ORDER BY fund_type
+        有筛选表达式时使用筛选排序索引的分面索引（表达式字段数组与其行对齐）
         """
-        types_df = pd.read_sql_query(query_types, conn)
-        fund_types = types_df['fund_type'].tolist()
+        expression = None
+        if filters.get('expr'):
+            expression = ScreenExpression(filters['expr'])
+            if screen is None:
+                screen = self.screen_index
         
-        # 获取投资类型
-        query_invest = """
-        SELECT DISTINCT invest_type
-        FROM fund_basic
-        WHERE invest_type IS NOT NULL AND invest_type != ''
-        ORDER BY invest_type
-        """
-        invest_df = pd.read_sql_query(query_invest, conn)
-        invest_types = invest_df['invest_type'].tolist()
+        index = screen.facets if screen is not None else self.facet_index
+        bits = self._search_bits(index, filters.get('search'))
         
-        conn.close()
+        if expression is not None:
+            self._attach_screen_metrics(screen, expression.fields)
+            expr_bits = bits_from_mask(expression.mask(screen.field, len(screen)))
+            bits = expr_bits if bits is None else bits & expr_bits
         
-        return {
-            "companies": companies,
-            "fund_types": fund_types,
-            "invest_types": invest_types
-        }
+        return index, bits
     
     def filter_funds(self, filters: Dict[str, str]) -> pd.DataFrame:
         """
         根据条件筛选基金
         
+        各筛选维度通过分面索引（位图按位与）完成，关键词走全文索引，
+        筛选表达式编译为对全部基金指标数组的向量运算
+        
         参数:
             filters: 筛选条件字典
                 - search: 代码或名称关键词
@@ -1436,77 +2282,108 @@ class FundAnalyzer:
                 - invest_type: 投资类型
                 - risk_level: 风险等级
                 - status: 基金状态
+                - expr: 筛选表达式（见 screen_expr，如 "ret_1y > 20 and score >= 70"）
         
         返回:
             符合条件的基金DataFrame（已按评分排序）
+        
+        筛选表达式无效时抛出 ValueError
         """
-        conn = self._connect()
+        index, bits = self._filter_bits(filters)
+        return index.filter(filters, bits)
+    
+    @property
+    def screen_index(self) -> ScreenIndex:
+        """筛选排序索引（分面索引 + 缓存年度收益 + 评分；数据变化后自动重建）"""
+        # 附加的回溯收益来自同类排名索引，净值变化时一并重建
+        signature = self._data_signature('fund_basic', 'fund_nav', 'fund_returns_cache',
+                                         'fund_risk_metrics', 'fund_scores')
+        
+        if self._screen_index is None or self._screen_index_signature != signature:
+            with self._screen_index_lock:
+                if self._screen_index is None or self._screen_index_signature != signature:
+                    facets = self.facet_index
+                    conn = self._connect()
+                    
+                    def has_table(name):
+                        return conn.execute(
+                            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+                        ).fetchone() is not None
+                    
+                    if has_table('fund_returns_cache'):
+                        returns = pd.read_sql_query(
+                            "SELECT ts_code, year, return_rate FROM fund_returns_cache", conn
+                        )
+                    else:
+                        returns = pd.DataFrame(columns=['ts_code', 'year', 'return_rate'])
+                    
+                    stored_scores = None
+                    if has_table('fund_scores'):
+                        stored = pd.read_sql_query(
+                            "SELECT ts_code, total_score FROM fund_scores WHERE score_year = ?",
+                            conn, params=(datetime.now().year,)
+                        )
+                        stored_scores = stored.set_index('ts_code')['total_score']
+                    conn.close()
+                    
+                    self._screen_index = ScreenIndex.build(facets, returns, stored_scores)
+                    self._screen_index_signature = signature
+        
+        return self._screen_index
+    
+    def screen_funds(self, filters: Dict[str, str], sort: Optional[str] = None,
+                     descending: bool = True, page: int = 1,
+                     page_size: int = 50) -> Tuple[pd.DataFrame, int]:
+        """
+        服务端筛选 + 排序 + 分页（列表页只取当前一页）
+        
+        参数:
+            filters: 筛选条件（同 filter_funds）
+            sort: 排序字段：return2025 等年度收益、score/rating、ret_1y 等回溯收益、
+                  volatility、max_drawdown、sharpe_ratio 或 fund_basic 列
+                  （ts_code、name、found_date 等；可用筛选表达式的字段别名）；
+                  None 为 filter_funds 的默认顺序
+            descending: 是否降序（缺失值始终在后）
+            page: 页码（从 1 开始）
+            page_size: 每页条数
         
-        # 构建查询条件
-        conditions = []
-        params = []
-        
-        # 状态筛选
-        if filters.get('status'):
-            conditions.append("fb.status = ?")
-            params.append(filters['status'])
-        
-        # 公司筛选
-        if filters.get('company'):
-            conditions.append("fb.management = ?")
-            params.append(filters['company'])
-        
-        # 基金类型
-        if filters.get('fund_type'):
-            conditions.append("fb.fund_type = ?")
-            params.append(filters['fund_type'])
-        
-        # 投资类型
-        if filters.get('invest_type'):
-            conditions.append("fb.invest_type = ?")
-            params.append(filters['invest_type'])
-        
-        # 搜索关键词（代码或名称）
-        if filters.get('search'):
-            conditions.append("(fb.ts_code LIKE ? OR fb.name LIKE ?)")
-            search_pattern = f"%{filters['search']}%"
-            params.extend([search_pattern, search_pattern])
-        
-        # 构建 SQL - 关联缓存表获取最新评分
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        query = f"""
-        SELECT fb.ts_code, fb.name, fb.fund_type, fb.management, fb.invest_type, 
-               fb.found_date, fb.list_date, fb.status,
-               MAX(frc.computed_date) as cache_date
-        FROM fund_basic fb
-        LEFT JOIN (
-            SELECT ts_code, MAX(computed_date) as computed_date
-            FROM fund_returns_cache
-            GROUP BY ts_code
-        ) frc ON fb.ts_code = frc.ts_code
-        WHERE {where_clause}
-        GROUP BY fb.ts_code
-        ORDER BY cache_date DESC NULLS LAST, fb.list_date DESC
+        返回:
+            (该页基金 DataFrame（含各年度收益 return{年度}、score、rating）, 符合条件的总数)
         """
+        index = self.screen_index
+        if sort:
+            sort = canonical_field(sort)
+            self._attach_screen_metrics(index, [sort])
         
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
+        facets, bits = self._filter_bits(filters, index)
+        return index.page(facets.mask(filters, bits), sort, descending, page, page_size)
+    
+    def get_filter_facets(self, filters: Dict[str, str]) -> Dict[str, Dict[str, int]]:
+        """
+        各筛选下拉选项在当前条件下的基金数量
         
-        # 风险等级筛选（基于基金类型进行简单分类）
-        if filters.get('risk_level'):
-            risk_level = filters['risk_level']
-            if risk_level == 'low':
-                # 低风险：货币型、债券型
-                df = df[df['fund_type'].str.contains('货币|债券', na=False)]
-            elif risk_level == 'medium':
-                # 中风险：混合型
-                df = df[df['fund_type'].str.contains('混合', na=False)]
-            elif risk_level == 'high':
-                # 高风险：股票型、指数型
-                df = df[df['fund_type'].str.contains('股票|指数|ETF', na=False)]
+        参数:
+            filters: 同 filter_funds
         
-        return df
+        返回:
+            {"company": {公司: 数量}, "fund_type": {...}, "invest_type": {...},
+             "status": {...}, "risk_level": {"low": n, "medium": n, "high": n}}
+            每个维度按"其余条件不变、只改该维度"计数
+        """
+        index, bits = self._filter_bits(filters)
+        return index.facet_counts(filters, bits)
+    
+    def filter_funds_with_facets(self, filters: Dict[str, str]) -> Tuple[pd.DataFrame, Dict[str, Dict[str, int]]]:
+        """
+        筛选结果和各下拉选项的基金数量（/api/filter_funds 使用）
+        
+        关键词搜索和筛选表达式只计算一次，结果与分别调用 filter_funds、get_filter_facets 相同
+        
+        返回:
+            (符合条件的基金 DataFrame, 各维度取值数量)
+        """
+        index, bits = self._filter_bits(filters)
+        return index.filter(filters, bits), index.facet_counts(filters, bits)
     
     def calculate_year_return(self, ts_code: str, year: str = "2025") -> Optional[float]:
         """
@@ -1519,6 +2396,32 @@ class FundAnalyzer:
         返回:
             收益率（百分比）或 None
         """
+        from datetime import datetime
+        current_year = datetime.now().year
+        
+        store = self.nav_store
+        if store is not None:
+            series = store.series(ts_code)
+            if series is None:
+                return None
+            
+            dates, navs, _ = series
+            
+            # 年初净值（该年1月1日或之后的第一个交易日）
+            start_idx = np.searchsorted(dates, to_day(f"{year}-01-01"), side='left')
+            
+            # 年末净值（当前年份取最新净值，历史年份取12月31日或之前的最后一个交易日）
+            if int(year) >= current_year:
+                end_idx = len(dates) - 1
+            else:
+                end_idx = np.searchsorted(dates, to_day(f"{year}-12-31"), side='right') - 1
+            
+            if start_idx >= len(dates) or end_idx < 0:
+                return None
+            
+            start_nav = navs[start_idx]
+            return round((navs[end_idx] - start_nav) / start_nav * 100, 2)
+        
         conn = self._connect()
         
         # 年初净值（该年1月1日或之后的第一个交易日）
@@ -1535,9 +2438,6 @@ class FundAnalyzer:
         
         # 年末净值（该年12月31日或之前的最后一个交易日）
         # 如果是当前年份，则取最新净值
-        from datetime import datetime
-        current_year = datetime.now().year
-        
         if int(year) >= current_year:
             # 当前年份或未来年份，取最新净值
             query_end = """
@@ -1573,95 +2473,51 @@ class FundAnalyzer:
         
         return round(year_return, 2)
     
-    def batch_calculate_year_returns(self, ts_codes: List[str], years: List[str] = ["2025", "2024", "2023"]) -> Dict[str, Dict[str, Optional[float]]]:
+    def batch_calculate_year_returns(self, ts_codes: List[str], years: List[str] = ["2025", "2024", "2023"],
+                                     as_of: Optional[str] = None) -> Dict[str, Dict[str, Optional[float]]]:
         """
         批量计算多个基金的多个年度收益率（大幅优化性能）
         
         参数:
             ts_codes: 基金代码列表
             years: 年份列表
+            as_of: 截至日期（YYYY-MM-DD），只使用该日及之前的净值，
+                   该日所在年份视为当前年份；None 表示截至最新
         
         返回:
             {ts_code: {year: return_rate}}
         """
         from datetime import datetime
-        current_year = datetime.now().year
+        current_year = int(as_of[:4]) if as_of else datetime.now().year
         
         if not ts_codes:
             return {}
         
-        conn = self._connect()
-        result = {ts_code: {year: None for year in years} for ts_code in ts_codes}
-        
-        # 批量读取所有需要的净值数据
-        ts_codes_placeholder = ','.join(['?' for _ in ts_codes])
-        
-        # 获取所有年初和年末的关键日期
-        date_ranges = []
-        for year in years:
-            date_ranges.append(f"{year}-01-01")
-            if int(year) < current_year:
-                date_ranges.append(f"{year}-12-31")
-        
-        # 一次性读取所有相关净值数据
-        query = f"""
-        SELECT ts_code, nav_date, unit_nav
-        FROM fund_nav
-        WHERE ts_code IN ({ts_codes_placeholder})
-          AND unit_nav IS NOT NULL
-          AND nav_date >= '2020-01-01'
-        ORDER BY ts_code, nav_date
-        """
-        
-        df = pd.read_sql_query(query, conn, params=tuple(ts_codes))
-        conn.close()
-        
-        if df.empty:
-            return result
-        
-        df['nav_date'] = pd.to_datetime(df['nav_date'])
-        
-        # 按基金代码分组计算
-        for ts_code in ts_codes:
-            fund_data = df[df['ts_code'] == ts_code]
+        # 🔥 净值列存：全市场一次分组二分查找
+        store = self.nav_store
+        if store is None:
+            if not years:
+                return {ts_code: {} for ts_code in ts_codes}
             
-            if fund_data.empty:
-                continue
+            # 只需读取最早年份1月1日之后的净值
+            ts_codes_placeholder = ','.join(['?' for _ in ts_codes])
+            query = f"""
+            SELECT ts_code, nav_date, unit_nav
+            FROM fund_nav
+            WHERE ts_code IN ({ts_codes_placeholder})
+              AND unit_nav IS NOT NULL
+              AND nav_date >= ?
+              AND nav_date <= ?
+            ORDER BY ts_code, nav_date
+            """
             
-            for year in years:
-                try:
-                    # 年初净值
-                    start_date = pd.Timestamp(f"{year}-01-01")
-                    start_data = fund_data[fund_data['nav_date'] >= start_date]
-                    
-                    if start_data.empty:
-                        continue
-                    
-                    start_nav = start_data.iloc[0]['unit_nav']
-                    
-                    # 年末净值
-                    if int(year) >= current_year:
-                        # 当前年份，取最新净值
-                        end_nav = fund_data.iloc[-1]['unit_nav']
-                    else:
-                        # 历史年份，取年底净值
-                        end_date = pd.Timestamp(f"{year}-12-31")
-                        end_data = fund_data[fund_data['nav_date'] <= end_date]
-                        
-                        if end_data.empty:
-                            continue
-                        
-                        end_nav = end_data.iloc[-1]['unit_nav']
-                    
-                    # 计算收益率
-                    year_return = (end_nav - start_nav) / start_nav * 100
-                    result[ts_code][year] = round(year_return, 2)
-                    
-                except Exception as e:
-                    print(f"计算 {ts_code} {year}年收益失败: {e}")
-                    continue
+            conn = self._connect()
+            df = pd.read_sql_query(query, conn, params=(*ts_codes, f"{min(years)}-01-01", as_of or '9999-12-31'))
+            conn.close()
+            
+            store = NavStore.from_frame(df)
         
-        return result
+        return store.year_returns(ts_codes, years, current_year, as_of=to_day(as_of) if as_of else None)
     
     def calculate_period_return(self, ts_code: str, days: int) -> Optional[float]:
         """
@@ -1674,6 +2530,20 @@ class FundAnalyzer:
         返回:
             收益率（百分比）或 None
         """
+        store = self.nav_store
+        if store is not None:
+            series = store.series(ts_code)
+            if series is None:
+                return None
+            
+            dates, navs, _ = series
+            idx = np.searchsorted(dates, dates[-1] - days, side='right') - 1
+            if idx < 0:
+                return None
+            
+            past_nav = navs[idx]
+            return round((navs[-1] - past_nav) / past_nav * 100, 2)
+        
         conn = self._connect()
         
         # 获取最新净值
@@ -0,0 +1,232 @@
+"""
+基金搜索索引
+Fund Search - fund_basic 名称/代码的 FTS5 全文索引（trigram 分词）
+
+trigram 分词把文本切成连续 3 字符片段，中文子串同样可以命中：
+- 关键词 >= 3 个字符：在 fund_basic_fts 上 MATCH（走索引，不再全表扫描）
+- 关键词 <  3 个字符：trigram 无法匹配，退回 fund_basic 的 LIKE '%kw%'
+- 当前 SQLite 不支持 FTS5、索引未建立或与 fund_basic 不一致时，同样退回 LIKE
+
+拼音索引（pinyin_index，search_pinyin 表）存在时，字母输入同时按名称拼音首字母/全拼前缀匹配，
+如 "yfd" 命中 易方达 的基金。
+
+结果排序：代码完全匹配 > 名称完全匹配 > 代码前缀 > 名称前缀或拼音前缀 > 其余，
+同级按名称长度（越短越接近关键词）
+
+索引按 ts_code 与 fund_basic 关联，并记录建立时 fund_basic（代码、名称）的内容指纹。
+索引在 FundAnalyzer 准备数据库时（_create_indexes）创建，fund_basic 内容变化后重建；
+只读连接（jjread 等）无法重建，指纹不一致时退回 LIKE。
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import List, Optional, Tuple
+
+import pinyin_index
+
+FTS_TABLE = "fund_basic_fts"
+
+# 建立索引时 fund_basic 的内容指纹
+STATE_TABLE = "fund_basic_fts_state"
+
+# trigram 分词的最短可匹配长度
+MIN_FTS_LENGTH = 3
+
+
+# 索引检查结果缓存：数据库文件 → ((文件, 大小, 修改时间), 索引是否可用)
+_index_status = {}
+
+
+def has_search_index(conn: sqlite3.Connection) -> bool:
+    """全文索引是否存在"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+
+def content_fingerprint(conn: sqlite3.Connection) -> str:
+    """fund_basic 代码、名称的内容指纹（按 rowid 顺序）"""
+    row = conn.execute("""
+        SELECT group_concat(ts_code || char(31) || COALESCE(name, ''), char(30))
+        FROM (SELECT ts_code, name FROM fund_basic ORDER BY rowid)
+    """).fetchone()
+    return hashlib.sha1((row[0] or '').encode('utf-8')).hexdigest()
+
+
+def _index_matches(conn: sqlite3.Connection) -> bool:
+    """全文索引存在且与当前 fund_basic 内容一致"""
+    try:
+        if not has_search_index(conn):
+            return False
+        row = conn.execute(f"SELECT fingerprint FROM {STATE_TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        # 旧版索引没有指纹表
+        return False
+    return row is not None and row[0] == content_fingerprint(conn)
+
+
+def ensure_search_index(conn: sqlite3.Connection) -> bool:
+    """
+    创建全文索引（不存在或与 fund_basic 内容不一致时重建）
+
+    参数:
+        conn: 可写的 SQLite 连接
+
+    返回:
+        是否新建/重建了索引（当前 SQLite 不支持 FTS5 时返回 False）
+    """
+    try:
+        if _index_matches(conn):
+            return False
+
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {FTS_TABLE}
+            USING fts5(ts_code, name, tokenize='trigram')
+        """)
+        conn.execute(f"""
+            INSERT INTO {FTS_TABLE}(ts_code, name)
+            SELECT ts_code, COALESCE(name, '') FROM fund_basic
+        """)
+
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (fingerprint TEXT NOT NULL)")
+        conn.execute(f"DELETE FROM {STATE_TABLE}")
+        conn.execute(f"INSERT INTO {STATE_TABLE} VALUES (?)", (content_fingerprint(conn),))
+        conn.commit()
+        return True
+    except sqlite3.OperationalError:
+        # 不支持 FTS5 / trigram（SQLite < 3.34）
+        conn.rollback()
+        return False
+
+
+def search_index_ready(conn: sqlite3.Connection) -> bool:
+    """
+    全文索引是否可用（存在且与 fund_basic 一致）
+
+    计算指纹需要读取整个 fund_basic，检查结果按数据库文件缓存，文件大小或修改时间变化后重新检查
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    try:
+        st = os.stat(path) if path else None
+    except OSError:
+        st = None
+    if st is None:
+        return _index_matches(conn)
+
+    signature = (path, st.st_size, st.st_mtime_ns)
+    cached = _index_status.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    ready = _index_matches(conn)
+    _index_status[path] = (signature, ready)
+    return ready
+
+
+def use_fts(conn: sqlite3.Connection, keyword: str) -> bool:
+    """该关键词是否可以走全文索引"""
+    return len(keyword) >= MIN_FTS_LENGTH and search_index_ready(conn)
+
+
+def match_expression(keyword: str) -> str:
+    """关键词转为 FTS5 短语查询（整体作为子串匹配，引号转义）"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def like_pattern(keyword: str) -> str:
+    """LIKE 子串匹配模式（转义 % _ \\）"""
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def search_condition(conn: sqlite3.Connection, keyword: str, alias: str = "fb") -> Tuple[str, List]:
+    """
+    关键词筛选条件（代码或名称包含关键词），用于拼接到 fund_basic 的 WHERE 中
+
+    参数:
+        conn: SQLite 连接
+        keyword: 关键词
+        alias: fund_basic 的别名
+
+    返回:
+        (条件 SQL, 参数)
+    """
+    if use_fts(conn, keyword):
+        condition = f"{alias}.ts_code IN (SELECT ts_code FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)"
+        params = [match_expression(keyword)]
+    else:
+        pattern = like_pattern(keyword)
+        condition = f"{alias}.ts_code LIKE ? ESCAPE '\\' OR {alias}.name LIKE ? ESCAPE '\\'"
+        params = [pattern, pattern]
+
+    pinyin = pinyin_index.pinyin_condition(conn, keyword, f"{alias}.ts_code")
+    if pinyin is not None:
+        condition = f"{condition} OR {pinyin[0]}"
+        params = params + pinyin[1]
+
+    return f"({condition})", params
+
+
+def relevance_order(keyword: str, alias: str = "fb",
+                    pinyin: Optional[Tuple[str, List]] = None) -> Tuple[str, List]:
+    """
+    相关度排序表达式（代码/名称完全匹配、前缀匹配优先），值越小越靠前
+
+    参数:
+        pinyin: pinyin_index.pinyin_condition() 的结果（拼音前缀匹配与名称前缀同级）
+
+    返回:
+        (ORDER BY 表达式, 参数)
+    """
+    prefix = like_pattern(keyword)[1:]   # 'kw%'
+    pinyin_case = f"OR {pinyin[0]}" if pinyin is not None else ""
+    return (
+        f"""CASE
+            WHEN {alias}.ts_code = ? OR substr({alias}.ts_code, 1, instr({alias}.ts_code || '.', '.') - 1) = ? THEN 0
+            WHEN {alias}.name = ? THEN 1
+            WHEN {alias}.ts_code LIKE ? ESCAPE '\\' THEN 2
+            WHEN {alias}.name LIKE ? ESCAPE '\\' {pinyin_case} THEN 3
+            ELSE 4
+        END""",
+        [keyword, keyword, keyword, prefix, prefix] + (pinyin[1] if pinyin is not None else [])
+    )
+
+
+def search_query(conn: sqlite3.Connection, keyword: str, columns: str, limit: int) -> Tuple[str, List]:
+    """
+    按相关度排序的搜索 SQL（fund_basic 别名 fb）
+
+    参数:
+        conn: SQLite 连接
+        keyword: 关键词
+        columns: SELECT 的列（如 "fb.ts_code, fb.name"）
+        limit: 返回条数
+
+    返回:
+        (SQL, 参数)
+    """
+    pinyin = pinyin_index.pinyin_condition(conn, keyword, "fb.ts_code")
+    order, order_params = relevance_order(keyword, pinyin=pinyin)
+
+    if use_fts(conn, keyword) and pinyin is None:
+        query = f"""
+        SELECT {columns}
+        FROM {FTS_TABLE} f
+        JOIN fund_basic fb ON fb.ts_code = f.ts_code
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY {order}, length(fb.name), fb.ts_code
+        LIMIT ?
+        """
+        return query, [match_expression(keyword)] + order_params + [limit]
+
+    condition, params = search_condition(conn, keyword)
+    query = f"""
+    SELECT {columns}
+    FROM fund_basic fb
+    WHERE {condition}
+    ORDER BY {order}, length(fb.name), fb.ts_code
+    LIMIT ?
+    """
+    return query, params + order_params + [limit]
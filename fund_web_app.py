@@ -10,6 +10,8 @@ import json
 import numpy as np
 import pandas as pd
 from fund_analyzer import FundAnalyzer
+from holdings_index import normalize_symbol
+from screen_index import MAX_PAGE_SIZE
 import threading
 import webbrowser
 import sys
@@ -24,7 +26,7 @@ import time
 from datetime import datetime, timedelta
 
 app = Flask(__name__)
-analyzer = FundAnalyzer()
+analyzer = FundAnalyzer(use_nav_store=True)
 
 # 配置
 SERVER_HOST = '0.0.0.0'
@@ -36,6 +38,9 @@ IDLE_TIMEOUT_MINUTES = 20  # 20分钟无活动自动退出
 last_activity_time = time.time()  # 最后活动时间戳
 idle_check_lock = threading.Lock()  # 线程锁
 
+# 🔥 预计算缓存刷新配置
+CACHE_REFRESH_HOURS = 6  # 每6小时增量刷新一次年度收益缓存
+
 # 股票代码名称对照表（延迟加载）
 _STOCK_NAMES = None
 
@@ -172,9 +177,17 @@ def search_funds():
 
 @app.route('/api/fund/<ts_code>', methods=['GET'])
 def get_fund_detail(ts_code):
-    """获取基金详情"""
+    """
+    获取基金详情
+    
+    查询参数:
+        parallel: 1 表示并行计算各部分（返回中包含各部分耗时）
+        timeout: 并行时每个部分的超时秒数，超时的部分不返回
+    """
     try:
-        report = analyzer.generate_report(ts_code)
+        parallel = request.args.get('parallel', '0') in ('1', 'true')
+        timeout = request.args.get('timeout', type=float)
+        report = analyzer.generate_report(ts_code, parallel=parallel, section_timeout=timeout)
         # 清理 NaN 值
         cleaned_report = clean_data_for_json(report)
         return jsonify({
@@ -215,7 +228,7 @@ def get_fund_risk(ts_code):
 def get_fund_score(ts_code):
     """获取基金评分"""
     try:
-        score = analyzer.calculate_fund_score(ts_code)
+        score = analyzer.get_fund_score(ts_code)
         return jsonify({
             "success": True,
             "data": score
@@ -224,6 +237,19 @@ def get_fund_score(ts_code):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/fund/<ts_code>/rating_history', methods=['GET'])
+def get_rating_history(ts_code):
+    """评级历史（每月末评分）"""
+    try:
+        history = analyzer.get_rating_history(ts_code)
+        return jsonify({
+            "success": True,
+            "data": history
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/fund/<ts_code>/holdings', methods=['GET'])
 def get_fund_holdings(ts_code):
     """获取基金持仓（含股票名称）"""
@@ -235,12 +261,8 @@ def get_fund_holdings(ts_code):
         for holding in holdings_list:
             symbol = holding.get('symbol', '')
             if symbol:
-                # 提取纯数字代码（去掉.SH/.SZ/.HK等后缀）
-                clean_code = symbol.split('.')[0]
-                
-                # 港股代码处理：如果是4位数，前面补0变成5位
-                if len(clean_code) == 4 and clean_code.isdigit():
-                    clean_code = '0' + clean_code
+                # 提取纯数字代码（去掉.SH/.SZ/.HK等后缀，港股4位补0）
+                clean_code = normalize_symbol(symbol)
                 
                 stock_names = get_stock_names()
                 stock_info = stock_names.get(clean_code, {})
@@ -257,6 +279,101 @@ def get_fund_holdings(ts_code):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/stock/<symbol>/holders', methods=['GET'])
+def get_stock_holders(symbol):
+    """
+    获取持有某只股票的基金（各基金最近一期持仓）
+    
+    查询参数:
+        limit: 最多返回基金数（默认50）
+    """
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        holders = analyzer.get_stock_holders(symbol, limit=limit)
+        
+        stock_info = get_stock_names().get(normalize_symbol(symbol), {})
+        cleaned_holders = clean_data_for_json(holders["基金列表"])
+        return jsonify({
+            "success": True,
+            "data": {
+                "symbol": normalize_symbol(symbol),
+                "stock_name": stock_info.get('name', '--'),
+                "industry": stock_info.get('industry', '--'),
+                "total": holders["基金数量"],
+                "holders": cleaned_holders
+            }
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/fund/<ts_code>/similar', methods=['GET'])
+def get_similar_funds(ts_code):
+    """
+    获取持仓最相似的基金
+    
+    查询参数:
+        k: 返回数量（默认10）
+    """
+    try:
+        top_k = request.args.get('k', 10, type=int)
+        similar = analyzer.get_similar_funds(ts_code, top_k=top_k)
+        return jsonify({
+            "success": True,
+            "data": clean_data_for_json(similar)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/fund/<ts_code>/industry_exposure', methods=['GET'])
+def get_industry_exposure(ts_code):
+    """
+    获取基金持仓行业穿透
+    
+    查询参数:
+        end_date: 报告期（默认最近一期）
+    """
+    try:
+        exposure = analyzer.get_industry_exposure(ts_code, end_date=request.args.get('end_date'))
+        return jsonify({
+            "success": True,
+            "data": clean_data_for_json(exposure)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/industry_screen', methods=['GET'])
+def industry_screen():
+    """
+    行业暴露筛选（如 半导体占比 > 40% 的基金）
+    
+    查询参数:
+        industry: 行业名称（必填）
+        min_weight: 最低占比%（默认0）
+        end_date: 报告期（默认各基金最近一期）
+        limit: 最多返回条数（默认100）
+    """
+    try:
+        industry = request.args.get('industry', '').strip()
+        if not industry:
+            return jsonify({"error": "industry不能为空"}), 400
+        
+        df = analyzer.screen_by_industry(
+            industry,
+            min_weight=request.args.get('min_weight', 0, type=float),
+            end_date=request.args.get('end_date'),
+            limit=request.args.get('limit', 100, type=int)
+        )
+        return jsonify({
+            "success": True,
+            "data": clean_data_for_json(df.to_dict('records'))
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/fund/<ts_code>/fund_flow', methods=['GET'])
 def get_fund_flow(ts_code):
     """获取基金份额变化（资金流向）"""
@@ -305,7 +422,7 @@ def batch_year_returns():
         
         # 🔥 同时从缓存获取评分
         if include_score:
-            scores = analyzer.batch_calculate_scores(ts_codes, results)
+            scores = analyzer.batch_get_scores(ts_codes, results)
             # 将评分添加到结果中
             for ts_code in ts_codes:
                 if ts_code in results and isinstance(results[ts_code], dict):
@@ -333,23 +450,9 @@ def check_gold_rating_api():
         if not funds:
             return jsonify({"error": "funds不能为空"}), 400
         
-        results = {}
-        for fund in funds:
-            ts_code = fund.get('ts_code')
-            rating = fund.get('rating', 0)
-            
-            if ts_code and rating >= 4:
-                try:
-                    is_gold = analyzer.check_gold_rating(ts_code, rating)
-                    # 🔥 转换为Python原生bool类型，避免numpy.bool_序列化错误
-                    results[ts_code] = bool(is_gold)
-                except Exception as e:
-                    print(f"[ERROR] check_gold_rating失败 {ts_code}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    results[ts_code] = False
-            else:
-                results[ts_code] = False
+        # 🔥 一次批量评估（一次分组查询 + 一次向量化比较）
+        ratings = {fund.get('ts_code'): fund.get('rating', 0) for fund in funds}
+        results = analyzer.batch_check_gold_rating(ratings)
         
         return jsonify({
             "success": True,
@@ -374,7 +477,7 @@ def batch_scores():
         
         # 🔥 使用批量评分方法（优化：自动复用年度收益数据）
         year_returns = data.get('year_returns', None)  # 前端可传递已获取的收益数据
-        results = analyzer.batch_calculate_scores(ts_codes, year_returns)
+        results = analyzer.batch_get_scores(ts_codes, year_returns)
         
         return jsonify({
             "success": True,
@@ -401,31 +504,24 @@ def get_year_end_nav(ts_code):
 def get_hs300_data():
     """获取沪深300指数数据用于对照"""
     try:
-        from lj_read import StockDataReaderV2
+        from benchmark import get_benchmark_series
         from config import DATA_DIR
-        import os
         
         # 读取A股数据库（使用 config 中的路径）
         db_path = DATA_DIR / 'astock.db.gz'
         if not db_path.exists():
             return jsonify({"error": "A股数据库不存在"}), 404
         
-        reader = StockDataReaderV2(str(db_path))
-        
-        # 获取沪深300指数数据（代码：000300，CN市场，index类型）
-        df = reader.get_stock_data('000300', market='CN')
+        # 获取沪深300指数数据（代码：000300，CN市场，进程内缓存）
+        series = get_benchmark_series('000300', market='CN', db_path=db_path)
         
-        if df.empty:
+        if series is None:
             return jsonify({"error": "未找到沪深300数据"}), 404
         
         # 转换为字典格式 {date: close}
-        data = {}
-        for _, row in df.iterrows():
-            data[row['date']] = float(row['close'])
-        
         return jsonify({
             "success": True,
-            "data": data
+            "data": series.to_dict()
         })
     except Exception as e:
         import traceback
@@ -447,6 +543,22 @@ def compare_funds(ts_code):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/fund/<ts_code>/peer_rank', methods=['GET'])
+def get_peer_rank(ts_code):
+    """同类排名与百分位"""
+    try:
+        metric = request.args.get('metric', '365')
+        metric = int(metric) if metric.isdigit() else metric
+        
+        result = analyzer.get_peer_rank(ts_code, metric)
+        return jsonify({
+            "success": True,
+            "data": result
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/top_performers', methods=['GET'])
 def get_top_performers():
     """获取年度收益最高的前20名基金"""
@@ -491,14 +603,68 @@ def filter_funds():
             'fund_type': request.args.get('fund_type', ''),
             'invest_type': request.args.get('invest_type', ''),
             'risk_level': request.args.get('risk_level', ''),
-            'status': request.args.get('status', 'L')
+            'status': request.args.get('status', 'L'),
+            'expr': request.args.get('expr', '')
         }
         
-        results = analyzer.filter_funds(filters)
+        try:
+            results, facets = analyzer.filter_funds_with_facets(filters)
+        except ValueError as e:
+            # 筛选表达式无效
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({
+            "success": True,
+            "data": clean_data_for_json(results.to_dict('records')) if not results.empty else [],
+            "facets": facets
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/screen', methods=['GET'])
+def screen_funds():
+    """服务端筛选 + 排序 + 分页（只返回当前一页和总数）"""
+    try:
+        filters = {
+            'search': request.args.get('search', ''),
+            'company': request.args.get('company', ''),
+            'fund_type': request.args.get('fund_type', ''),
+            'invest_type': request.args.get('invest_type', ''),
+            'risk_level': request.args.get('risk_level', ''),
+            'status': request.args.get('status', 'L'),
+            'expr': request.args.get('expr', '')
+        }
+        sort = request.args.get('sort') or None
+        descending = request.args.get('order', 'desc').lower() != 'asc'
+        
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            page_size = min(max(1, int(request.args.get('page_size', 50))), MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"error": "page 和 page_size 必须为整数"}), 400
+        
+        try:
+            results, total = analyzer.screen_funds(filters, sort, descending, page, page_size)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # 只返回前端展示的年度收益列（如 years=2025,2024,2023），默认全部年度
+        years = request.args.get('years')
+        if years:
+            keep = {f"return{year.strip()}" for year in years.split(',')}
+            results = results.drop(columns=[
+                column for column in results.columns
+                if column.startswith('return') and column not in keep
+            ])
         
         return jsonify({
             "success": True,
-            "data": results.to_dict('records') if not results.empty else []
+            "data": clean_data_for_json(results.to_dict('records')) if not results.empty else [],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "years": analyzer.screen_index.years
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -534,6 +700,36 @@ def get_period_return(ts_code):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/batch_period_returns', methods=['POST'])
+def batch_period_returns():
+    """批量计算多个回溯期间收益（一次调用返回 基金 × 期间 矩阵）"""
+    try:
+        data = request.get_json()
+        ts_codes = data.get('ts_codes', [])
+        periods = [int(p) for p in data.get('periods', [7, 30, 90, 180, 365])]
+        
+        if not ts_codes:
+            return jsonify({"error": "ts_codes不能为空"}), 400
+        if not periods:
+            return jsonify({"error": "periods不能为空"}), 400
+        
+        matrix = analyzer.batch_trailing_returns(ts_codes, periods)
+        results = {
+            ts_code: {str(period): (None if np.isnan(value) else float(value)) for period, value in row.items()}
+            for ts_code, row in matrix.iterrows()
+        }
+        
+        return jsonify({
+            "success": True,
+            "data": results
+        })
+    except Exception as e:
+        print(f"[ERROR] batch_period_returns失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/notify', methods=['POST'])
 def show_notification():
     """显示系统托盘气泡通知"""
@@ -710,6 +906,9 @@ class SystemTrayApp:
         # 🔥 启动空闲检查线程
         self.start_idle_checker()
         
+        # 🔥 启动预计算缓存刷新线程
+        self.start_cache_refresher()
+        
         # 自动打开浏览器
         if self.settings.auto_open_browser:
             # 延迟一下让服务器启动
@@ -788,6 +987,52 @@ class SystemTrayApp:
         self.idle_checker_thread.start()
         print(f"✓ 空闲检查线程已启动")
     
+    def start_cache_refresher(self):
+        """启动预计算缓存刷新线程（年度收益、评分、评级历史、风险指标；启动时刷新一次，之后定时刷新）"""
+        def refresh_loop():
+            while True:
+                try:
+                    stats = analyzer.refresh_returns_cache()
+                    print(f"✓ 年度收益缓存已刷新: {stats['funds']} 只基金, {stats['records']} 条记录")
+                except Exception as e:
+                    print(f"[WARN] 年度收益缓存刷新失败: {e}")
+                
+                try:
+                    stats = analyzer.refresh_fund_scores()
+                    print(f"✓ 评分表已刷新: {stats['funds']} 只基金")
+                except Exception as e:
+                    print(f"[WARN] 评分表刷新失败: {e}")
+                
+                try:
+                    stats = analyzer.refresh_rating_history()
+                    print(f"✓ 评级历史已刷新: {stats['months']} 个月末")
+                except Exception as e:
+                    print(f"[WARN] 评级历史刷新失败: {e}")
+                
+                try:
+                    stats = analyzer.refresh_industry_exposure()
+                    print(f"✓ 行业穿透已刷新: {stats['periods']} 个报告期")
+                except Exception as e:
+                    print(f"[WARN] 行业穿透刷新失败: {e}")
+                
+                try:
+                    stats = analyzer.refresh_pinyin_index()
+                    if stats['keys']:
+                        print(f"✓ 拼音索引已刷新: {stats['keys']} 个键")
+                except Exception as e:
+                    print(f"[WARN] 拼音索引刷新失败: {e}")
+                
+                try:
+                    stats = analyzer.refresh_risk_metrics()
+                    print(f"✓ 风险指标已刷新: {stats['funds']} 只基金")
+                except Exception as e:
+                    print(f"[WARN] 风险指标刷新失败: {e}")
+                
+                time.sleep(CACHE_REFRESH_HOURS * 3600)
+        
+        threading.Thread(target=refresh_loop, daemon=True).start()
+        print("✓ 缓存刷新线程已启动")
+    
     def open_browser(self, icon=None, item=None):
         """打开浏览器"""
         url = f'http://localhost:{SERVER_PORT}'
@@ -0,0 +1,293 @@
+"""
+持仓反向索引
+Holdings Index - 股票 → 持有该股票的基金
+
+fund_portfolio 按基金代码查询（某基金持有哪些股票）；本索引反过来按股票查询。
+每只基金只取最近一个报告期（end_date 最大）的持仓，一次读取后在内存中：
+- 按标准化股票代码分组，组内按 持股占比、持股市值 降序排列
+- 查询一只股票的持有基金：一次字典查找 + 数组切片
+
+按股票分组的持仓同时就是 基金 × 股票 权重（持股占比）稀疏矩阵的按列压缩存储：
+相似基金查询只取目标基金所持股票的列，向量化累加得到与全部基金的
+内积（余弦相似度）和重叠度，不需要逐只基金读取持仓。
+
+股票代码标准化与 /api/fund/<ts_code>/holdings 一致：
+去掉 .SH/.SZ/.HK 等后缀，4 位纯数字的港股代码前补 0 成 5 位。
+
+industry_exposure() 按 STOCK_NAME_DATA 的行业把持仓穿透汇总为
+基金 × 报告期 × 行业 的占比（预计算表 fund_industry_exposure 使用）。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 行业未知的股票归入此类
+UNKNOWN_INDUSTRY = "未分类"
+
+_STOCK_INDUSTRIES = None
+
+
+def normalize_symbol(symbol: str) -> str:
+    """
+    标准化股票代码（与 STOCK_NAME_DATA 的键一致）
+
+    例如 '600036.SH' -> '600036'，'0700.HK' -> '00700'
+    """
+    clean_code = str(symbol).strip().split('.')[0]
+
+    # 港股代码处理：如果是4位数，前面补0变成5位
+    if len(clean_code) == 4 and clean_code.isdigit():
+        clean_code = '0' + clean_code
+
+    return clean_code
+
+
+def stock_industries() -> Dict[str, str]:
+    """{标准化股票代码: 行业}（延迟加载 STOCK_NAME_DATA）"""
+    global _STOCK_INDUSTRIES
+    if _STOCK_INDUSTRIES is None:
+        from stockname_data import STOCK_NAME_DATA
+        _STOCK_INDUSTRIES = {
+            code: info.get('industry') or UNKNOWN_INDUSTRY
+            for code, info in STOCK_NAME_DATA.get('stocks', {}).items()
+        }
+    return _STOCK_INDUSTRIES
+
+
+def dedupe_holdings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    同一基金、同一报告期、同一股票多次披露（季报前十大 + 半年报全部持仓）时保留最新公告
+
+    按标准化代码判断同一股票（'0700.HK' 与 '00700.HK' 为同一持仓），
+    返回的 DataFrame 增加 stock_key 列（标准化代码），供分组和行业映射使用
+    """
+    df = df.assign(stock_key=[normalize_symbol(s) for s in df['symbol']])
+    df = df.sort_values(['ts_code', 'end_date', 'stock_key', 'ann_date'], ascending=[True, True, True, False])
+    return df.drop_duplicates(['ts_code', 'end_date', 'stock_key'], keep='first')
+
+
+def industry_exposure(holdings: pd.DataFrame, industries: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    行业穿透：持仓按行业汇总
+
+    参数:
+        holdings: DataFrame[ts_code, ann_date, end_date, symbol, mkv, stk_mkv_ratio]
+        industries: {标准化股票代码: 行业}，默认 stock_industries()
+
+    返回:
+        DataFrame[ts_code, end_date, industry, weight, mkv, holding_count]
+        weight 为该行业持股占基金净值比例之和（%），按 基金、报告期、占比降序排列
+    """
+    columns = ['ts_code', 'end_date', 'industry', 'weight', 'mkv', 'holding_count']
+    if holdings.empty:
+        return pd.DataFrame(columns=columns)
+
+    if industries is None:
+        industries = stock_industries()
+
+    df = dedupe_holdings(holdings)
+    df = df.assign(industry=df['stock_key'].map(industries).fillna(UNKNOWN_INDUSTRY))
+
+    exposure = df.groupby(['ts_code', 'end_date', 'industry'], sort=False).agg(
+        weight=('stk_mkv_ratio', 'sum'),
+        mkv=('mkv', 'sum'),
+        holding_count=('symbol', 'size')
+    ).reset_index()
+    exposure['weight'] = exposure['weight'].round(2)
+
+    exposure = exposure.sort_values(['ts_code', 'end_date', 'weight', 'industry'],
+                                    ascending=[True, True, False, True])
+    return exposure[columns].reset_index(drop=True)
+
+
+class HoldingsIndex:
+    """持仓反向索引（只读）"""
+
+    # 返回的持仓字段
+    COLUMNS = ['ts_code', 'name', 'fund_type', 'ann_date', 'end_date', 'symbol',
+               'mkv', 'stk_mkv_ratio', 'stk_float_ratio']
+
+    def __init__(self, holdings: pd.DataFrame, groups: Dict[str, Tuple[int, int]]):
+        """
+        参数:
+            holdings: 按 (标准化代码, 持股占比降序, 持股市值降序) 排列的持仓
+            groups: {标准化代码: (起始行, 结束行)}
+        """
+        self._holdings = holdings
+        self._records = holdings[self.COLUMNS].to_dict('records')
+        self._groups = groups
+
+        # 稀疏权重矩阵：行号 → 基金序号 / 股票键 / 权重（持股占比，缺失为 0）
+        codes = holdings['ts_code'].to_numpy().astype(str)
+        self._fund_codes, self._row_fund = np.unique(codes, return_inverse=True)
+        self._fund_index = {code: i for i, code in enumerate(self._fund_codes)}
+        self._row_key = np.empty(len(holdings), dtype=object)
+        for key, (start, end) in groups.items():
+            self._row_key[start:end] = key
+        self._weight = np.nan_to_num(holdings['stk_mkv_ratio'].to_numpy(dtype=np.float64), nan=0.0)
+        self._norm = np.sqrt(np.bincount(self._row_fund, weights=self._weight ** 2,
+                                         minlength=len(self._fund_codes)))
+
+        # 每只基金的持仓行号
+        order = np.argsort(self._row_fund, kind='stable')
+        bounds = np.searchsorted(self._row_fund[order], np.arange(len(self._fund_codes) + 1))
+        self._fund_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._fund_codes))]
+
+    @property
+    def fund_count(self) -> int:
+        """索引包含的基金数"""
+        return len(self._fund_codes)
+
+    @property
+    def stock_count(self) -> int:
+        """索引包含的股票数"""
+        return len(self._groups)
+
+    # ============================================================
+    # 构建
+    # ============================================================
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'HoldingsIndex':
+        """
+        从持仓 DataFrame 构建
+
+        参数:
+            df: DataFrame[ts_code, name, fund_type, ann_date, end_date, symbol,
+                          mkv, stk_mkv_ratio, stk_float_ratio]
+                （每只基金最近一个报告期的持仓）
+        """
+        df = df.reset_index(drop=True)
+
+        df = dedupe_holdings(df)
+
+        keys = df['stock_key'].to_numpy(dtype=object)
+        ratio = df['stk_mkv_ratio'].to_numpy(dtype=np.float64)
+        mkv = df['mkv'].to_numpy(dtype=np.float64)
+
+        # 组内按占比、市值降序（缺失值排最后），相同值按基金代码
+        order = np.lexsort((
+            df['ts_code'].to_numpy().astype(str),
+            -np.nan_to_num(mkv, nan=-np.inf),
+            -np.nan_to_num(ratio, nan=-np.inf),
+            keys.astype(str)
+        ))
+        holdings = df.iloc[order].reset_index(drop=True)
+        keys = keys[order]
+
+        groups = {}
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            ends = np.r_[starts[1:], len(keys)]
+            groups = {keys[s]: (int(s), int(e)) for s, e in zip(starts, ends)}
+
+        return cls(holdings, groups)
+
+    @classmethod
+    def load(cls, conn) -> 'HoldingsIndex':
+        """
+        从数据库读取每只基金最近一个报告期的持仓并构建（一次查询）
+
+        参数:
+            conn: SQLite 连接
+        """
+        df = pd.read_sql_query("""
+            SELECT p.ts_code, b.name, b.fund_type, p.ann_date, p.end_date, p.symbol,
+                   p.mkv, p.stk_mkv_ratio, p.stk_float_ratio
+            FROM fund_portfolio p
+            JOIN (
+                SELECT ts_code, MAX(end_date) AS end_date
+                FROM fund_portfolio
+                GROUP BY ts_code
+            ) latest ON p.ts_code = latest.ts_code AND p.end_date = latest.end_date
+            LEFT JOIN fund_basic b ON p.ts_code = b.ts_code
+        """, conn)
+        return cls.from_frame(df)
+
+    # ============================================================
+    # 查询
+    # ============================================================
+
+    def holder_count(self, symbol: str) -> int:
+        """持有该股票的基金数量"""
+        start, end = self._groups.get(normalize_symbol(symbol), (0, 0))
+        return end - start
+
+    def holders(self, symbol: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        持有该股票的基金
+
+        参数:
+            symbol: 股票代码（'600036'、'600036.SH'、'0700.HK'、'00700' 均可）
+            limit: 最多返回条数，None 返回全部
+
+        返回:
+            [{ts_code, name, fund_type, ann_date, end_date, symbol, mkv,
+              stk_mkv_ratio, stk_float_ratio}]，按持股占比、持股市值降序
+        """
+        start, end = self._groups.get(normalize_symbol(symbol), (0, 0))
+        if limit is not None:
+            end = min(end, start + max(0, int(limit)))
+        return [dict(r) for r in self._records[start:end]]
+
+    def similar(self, ts_code: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        持仓最相似的基金
+
+        以最近一期持股占比为权重：
+            similarity: 余弦相似度（0-1）
+            overlap   : 重叠度，共同持有股票取两者较小的占比之和（%）
+
+        参数:
+            ts_code: 基金代码
+            top_k: 返回数量
+
+        返回:
+            [{ts_code, name, fund_type, similarity, overlap, common_count}]，
+            按相似度降序；基金无持仓数据时返回空列表
+        """
+        fund = self._fund_index.get(ts_code)
+        if fund is None or self._norm[fund] == 0:
+            return []
+
+        # 目标基金所持股票对应的矩阵列
+        rows = self._fund_rows[fund]
+        spans = [self._groups[key] for key in self._row_key[rows]]
+        lengths = np.array([end - start for start, end in spans])
+        cols = np.concatenate([np.arange(start, end) for start, end in spans])
+        query_weight = np.repeat(self._weight[rows], lengths)
+
+        n = len(self._fund_codes)
+        funds = self._row_fund[cols]
+        weight = self._weight[cols]
+        dot = np.bincount(funds, weights=query_weight * weight, minlength=n)
+        overlap = np.bincount(funds, weights=np.minimum(query_weight, weight), minlength=n)
+        common = np.bincount(funds, minlength=n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = dot / (self._norm * self._norm[fund])
+        similarity = np.where(np.isfinite(similarity), similarity, 0.0)
+
+        candidates = np.flatnonzero((common > 0) & (np.arange(n) != fund))
+        if top_k is not None and 0 < top_k < len(candidates):
+            # 先按相似度取前 top_k 的范围，再稳定排序（相同相似度按代码）
+            cutoff = np.partition(similarity[candidates], -top_k)[-top_k]
+            candidates = candidates[similarity[candidates] >= cutoff]
+        candidates = candidates[np.lexsort((self._fund_codes[candidates], -similarity[candidates]))]
+        if top_k is not None:
+            candidates = candidates[:max(0, int(top_k))]
+
+        result = []
+        for i in candidates:
+            record = self._records[self._fund_rows[i][0]]
+            result.append({
+                "ts_code": str(self._fund_codes[i]),
+                "name": record['name'],
+                "fund_type": record['fund_type'],
+                "similarity": round(float(similarity[i]), 4),
+                "overlap": round(float(overlap[i]), 2),
+                "common_count": int(common[i])
+            })
+        return result
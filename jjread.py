@@ -5,7 +5,7 @@
 Fund Data Reader - 直接读取.gz压缩格式的数据库
 
 功能：
-1. 自动识别和解压.gz格式数据库
+1. 自动识别和解压.gz格式数据库（解压结果跨启动缓存，每个实例只打开一个只读连接）
 2. 提供多种便捷的查询方法
 3. 支持导出为DataFrame、字典、CSV等格式
 4. 可作为模块被其他软件调用
@@ -18,19 +18,18 @@ Fund Data Reader - 直接读取.gz压缩格式的数据库
     
     # 作为模块使用
     from read import FundDataReader
-    reader = FundDataReader()
-    df = reader.get_fund_basic(market='E')
+    with FundDataReader() as reader:
+        df = reader.get_fund_basic(market='E')
 """
 
-import gzip
 import sqlite3
-import tempfile
-import shutil
 import argparse
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Union
 import pandas as pd
 from contextlib import contextmanager
+from db_cache import extract_cached
+import fund_search
 
 
 class FundDataReader:
@@ -66,47 +65,38 @@ class FundDataReader:
             raise FileNotFoundError(f"数据库文件不存在: {self.db_path}")
         
         self.is_compressed = self.db_path.suffix == '.gz'
-        self._temp_db = None
+        self._conn = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def __del__(self):
+        self.close()
+    
+    def close(self):
+        """关闭数据库连接"""
+        if getattr(self, '_conn', None) is not None:
+            self._conn.close()
+            self._conn = None
     
     @contextmanager
     def _get_connection(self):
         """
         获取数据库连接（上下文管理器）
         
-        如果是.gz格式，自动解压到临时文件
+        首次调用时打开只读连接并在实例生命周期内复用；
+        如果是.gz格式，使用解压缓存（不会重复解压）
         """
-        if self.is_compressed:
-            # 创建临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
-            temp_path = Path(temp_file.name)
-            temp_file.close()
-            
-            try:
-                # 解压数据库到临时文件
-                with gzip.open(self.db_path, 'rb') as f_in:
-                    with open(temp_path, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                
-                # 连接临时数据库
-                conn = sqlite3.connect(str(temp_path))
-                conn.row_factory = sqlite3.Row
-                
-                yield conn
-                
-            finally:
-                # 关闭连接并删除临时文件
-                if conn:
-                    conn.close()
-                if temp_path.exists():
-                    temp_path.unlink()
-        else:
-            # 直接连接数据库
-            conn = sqlite3.connect(str(self.db_path))
-            conn.row_factory = sqlite3.Row
-            try:
-                yield conn
-            finally:
-                conn.close()
+        if self._conn is None:
+            sqlite_path = extract_cached(self.db_path) if self.is_compressed else self.db_path
+            uri = f"{Path(sqlite_path).resolve().as_uri()}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True)
+            self._conn.row_factory = sqlite3.Row
+        
+        yield self._conn
     
     def execute_query(self, query: str, params: tuple = None) -> pd.DataFrame:
         """
@@ -224,14 +214,33 @@ class FundDataReader:
         """
         按名称搜索基金（模糊匹配）
         
+        数据库已建立全文索引（fund_basic_fts，且与 fund_basic 一致）且关键词 >= 3 个字符时走索引，
+        否则 LIKE；名称完全匹配、前缀匹配的排在前面
+        
         Args:
             name: 基金名称关键词
             
         Returns:
             匹配的基金列表
         """
-        query = "SELECT * FROM fund_basic WHERE name LIKE ?"
-        return self.execute_query(query, (f'%{name}%',))
+        with self._get_connection() as conn:
+            if fund_search.use_fts(conn, name):
+                query = f"""
+                SELECT fb.* FROM fund_basic fb
+                WHERE fb.ts_code IN (
+                    SELECT ts_code FROM {fund_search.FTS_TABLE}
+                    WHERE {fund_search.FTS_TABLE} MATCH ?
+                )
+                """
+                # 只匹配名称列
+                params = ["name : " + fund_search.match_expression(name)]
+            else:
+                query = "SELECT * FROM fund_basic fb WHERE fb.name LIKE ? ESCAPE '\\'"
+                params = [fund_search.like_pattern(name)]
+        
+        order, order_params = fund_search.relevance_order(name)
+        query += f" ORDER BY {order}, length(fb.name), fb.ts_code"
+        return self.execute_query(query, tuple(params + order_params))
     
     # ==================== 基金净值相关查询 ====================
     
@@ -17,6 +17,8 @@ import tempfile
 import shutil
 import json
 
+import pinyin_index
+
 class StockDataReaderV2:
     """股票数据读取器 V2 - 支持SQLite、压缩SQLite和JSON格式"""
     
@@ -71,13 +73,9 @@ class StockDataReaderV2:
             self._check_database()
             
         elif self.data_format == 'sqlite_gz':
-            # 解压缩SQLite文件到临时目录
-            self.temp_dir = tempfile.mkdtemp()
-            self.db_path = os.path.join(self.temp_dir, 'temp_db.dat')
-            
-            with gzip.open(self.original_path, 'rb') as f_in:
-                with open(self.db_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+            # 使用解压缓存（同一压缩文件跨启动只解压一次，无需清理）
+            from db_cache import extract_cached
+            self.db_path = str(extract_cached(self.original_path))
             
             self._check_database()
             
@@ -598,7 +596,7 @@ class StockDataReaderV2:
         搜索股票/指数（按名称或代码）
         
         Args:
-            keyword: 搜索关键词
+            keyword: 搜索关键词（名称、代码，或拼音首字母/全拼如 "zsyh"）
             market: 市场代码，None表示所有市场
             data_type: 数据类型，None表示所有类型
             
@@ -610,6 +608,13 @@ class StockDataReaderV2:
         conditions = ["(symbol LIKE ? OR name LIKE ?)"]
         params = [f"%{keyword}%", f"%{keyword}%"]
         
+        # 拼音首字母/全拼前缀（数据文件中建有 search_pinyin 索引时；
+        # 索引由 precompute.py pinyin 离线建立，按代码 + 数据类型匹配）
+        pinyin = pinyin_index.pinyin_condition(conn, keyword, "symbol", "data_type")
+        if pinyin is not None:
+            conditions[0] = f"(symbol LIKE ? OR name LIKE ? OR {pinyin[0]})"
+            params.extend(pinyin[1])
+        
         if market:
             conditions.append("market = ?")
             params.append(market)
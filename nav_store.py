@@ -0,0 +1,452 @@
+"""
+净值列存
+NAV Store - 将 fund_nav 一次性载入 NumPy 数组，供 FundAnalyzer 各项分析共用
+
+存储布局（CSR 风格）：
+    codes    : 基金代码（升序）
+    offsets  : 每只基金在数组中的区间 [offsets[i], offsets[i+1])
+    dates    : 净值日期（距 1970-01-01 的天数，int32），每只基金内部升序
+    unit_nav : 单位净值（float64）
+    accum_nav: 累计净值（float64，缺失为 NaN）
+
+单只基金的读取是 O(1) 的数组切片（视图），全市场计算是一次向量化扫描。
+"""
+
+from datetime import date
+from typing import List, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+def to_day(value: Union[str, date, pd.Timestamp]) -> int:
+    """日期转换为天数序号（距 1970-01-01）"""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def to_days(values) -> np.ndarray:
+    """批量日期转换为天数序号"""
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int32)
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype('datetime64[D]').astype(np.int32)
+
+
+def day_to_str(day: int) -> str:
+    """天数序号转换为日期字符串（YYYY-MM-DD）"""
+    return str(np.datetime64(int(day), 'D'))
+
+
+def segmented_cummax(values: np.ndarray, seg_ids: np.ndarray) -> np.ndarray:
+    """
+    分段累计最大值（每段从头重新累计）
+
+    在名次空间里给每段加上 段号 × n 的偏移，段与段之间互不影响，
+    一次 np.maximum.accumulate 即可得到全部段的结果（无浮点误差）。
+
+    参数:
+        values: 数值数组（不含 NaN）
+        seg_ids: 段号数组（非递减）
+    """
+    n = len(values)
+    if n == 0:
+        return values.copy()
+
+    order = np.argsort(values, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n, dtype=np.int64)
+
+    offset = seg_ids.astype(np.int64) * n
+    peak_rank = np.maximum.accumulate(rank + offset) - offset
+    return values[order[peak_rank]]
+
+
+class NavStore:
+    """基金净值列存（只读）"""
+
+    def __init__(self, codes: List[str], offsets: np.ndarray, dates: np.ndarray,
+                 unit_nav: np.ndarray, accum_nav: np.ndarray):
+        self.codes = list(codes)
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.offsets = offsets
+        self.dates = dates
+        self.unit_nav = unit_nav
+        self.accum_nav = accum_nav
+        self._keys = None
+
+    # ============================================================
+    # 构建
+    # ============================================================
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'NavStore':
+        """
+        从 DataFrame 构建
+
+        参数:
+            df: 包含 ts_code, nav_date, unit_nav（可选 accum_nav）的净值数据，
+                须已按 ts_code, nav_date 升序排列
+        """
+        n = len(df)
+        if n == 0:
+            return cls([], np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                       np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64))
+
+        code_arr = df['ts_code'].to_numpy()
+        starts = np.flatnonzero(code_arr[1:] != code_arr[:-1]) + 1
+        offsets = np.concatenate(([0], starts, [n])).astype(np.int64)
+        codes = code_arr[offsets[:-1]].tolist()
+
+        unit_nav = df['unit_nav'].to_numpy(dtype=np.float64)
+        if 'accum_nav' in df.columns:
+            accum_nav = pd.to_numeric(df['accum_nav'], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            accum_nav = np.full(n, np.nan)
+
+        return cls(codes, offsets, to_days(df['nav_date'].to_numpy()), unit_nav, accum_nav)
+
+    @classmethod
+    def load(cls, conn, ts_codes: Optional[List[str]] = None, start_date: Optional[str] = None,
+             tail: Optional[int] = None) -> 'NavStore':
+        """
+        从数据库载入 fund_nav
+
+        参数:
+            conn: SQLite 连接
+            ts_codes: 只载入指定基金（None 表示全部）
+            start_date: 只载入该日期及之后的净值（YYYY-MM-DD）
+            tail: 每只基金只载入最近 N 条净值
+        """
+        conditions = ["unit_nav IS NOT NULL"]
+        params = []
+
+        if ts_codes is not None:
+            conditions.append(f"ts_code IN ({','.join(['?' for _ in ts_codes])})")
+            params.extend(ts_codes)
+
+        if start_date:
+            conditions.append("nav_date >= ?")
+            params.append(start_date)
+
+        query = f"""
+            SELECT ts_code, nav_date, unit_nav, accum_nav
+            FROM fund_nav
+            WHERE {' AND '.join(conditions)}
+            ORDER BY ts_code, nav_date
+        """
+
+        if tail is not None:
+            # 每只基金先按索引倒序定位第 N 条的日期，再取该日期之后的净值
+            query = f"""
+                WITH cut AS (
+                    SELECT c.ts_code,
+                           (SELECT m.nav_date FROM fund_nav m
+                            WHERE m.ts_code = c.ts_code AND m.unit_nav IS NOT NULL
+                            ORDER BY m.nav_date DESC
+                            LIMIT 1 OFFSET ?) AS cutoff
+                    FROM (SELECT DISTINCT ts_code FROM fund_nav WHERE {' AND '.join(conditions)}) c
+                )
+                SELECT n.ts_code, n.nav_date, n.unit_nav, n.accum_nav
+                FROM cut
+                JOIN fund_nav n ON n.ts_code = cut.ts_code AND n.nav_date >= IFNULL(cut.cutoff, '')
+                WHERE n.unit_nav IS NOT NULL {'AND n.nav_date >= ?' if start_date else ''}
+                ORDER BY n.ts_code, n.nav_date
+            """
+            params = [int(tail) - 1] + params + ([start_date] if start_date else [])
+
+        df = pd.read_sql_query(query, conn, params=params)
+        return cls.from_frame(df)
+
+    # ============================================================
+    # 单只基金访问
+    # ============================================================
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, ts_code: str) -> bool:
+        return ts_code in self.code_index
+
+    def segment(self, ts_code: str) -> Optional[Tuple[int, int]]:
+        """基金在数组中的区间 (start, end)，不存在返回 None"""
+        i = self.code_index.get(ts_code)
+        if i is None:
+            return None
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def series(self, ts_code: str, limit: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        获取单只基金的净值序列（视图，按日期升序）
+
+        参数:
+            ts_code: 基金代码
+            limit: 只取最近 N 条
+
+        返回:
+            (dates, unit_nav, accum_nav)，不存在返回 None
+        """
+        seg = self.segment(ts_code)
+        if seg is None:
+            return None
+
+        start, end = seg
+        if limit is not None:
+            start = max(start, end - limit)
+
+        return self.dates[start:end], self.unit_nav[start:end], self.accum_nav[start:end]
+
+    # ============================================================
+    # 全市场向量化计算
+    # ============================================================
+
+    def _row_keys(self) -> np.ndarray:
+        """
+        分组查找键：(基金序号 << 32) | 日期序号
+
+        整个数组按 (基金, 日期) 升序，因此一次 np.searchsorted 即可同时
+        定位任意多只基金在任意日期上的位置。
+        """
+        if self._keys is None:
+            fund_idx = np.repeat(np.arange(len(self.codes), dtype=np.int64), np.diff(self.offsets))
+            self._keys = (fund_idx << 32) | (self.dates.astype(np.int64) + (1 << 31))
+        return self._keys
+
+    def locate(self, fund_idx: np.ndarray, days: np.ndarray, side: str = 'left') -> np.ndarray:
+        """
+        批量二分查找：基金 fund_idx[k] 的净值序列中日期 days[k] 的插入位置（全局下标）
+
+        side='left'  返回第一条日期 >= days[k] 的位置
+        side='right' 返回第一条日期 >  days[k] 的位置
+        """
+        fund_idx = np.asarray(fund_idx, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        return np.searchsorted(self._row_keys(), (fund_idx << 32) | (days + (1 << 31)), side=side)
+
+    def fund_indices(self, ts_codes: Optional[List[str]]) -> Tuple[np.ndarray, List[str]]:
+        """基金序号（忽略不存在的基金），ts_codes 为 None 表示全部"""
+        if ts_codes is None:
+            return np.arange(len(self.codes), dtype=np.int64), list(self.codes)
+
+        found = [(self.code_index[c], c) for c in ts_codes if c in self.code_index]
+        return np.array([i for i, _ in found], dtype=np.int64), [c for _, c in found]
+
+    def trailing_returns(self, ts_codes: List[str], periods: List[int]) -> np.ndarray:
+        """
+        批量计算回溯期收益率（口径同 FundAnalyzer.calculate_period_return）
+
+        以每只基金的最新净值日为基准，回溯 period 天，取该日期及之前最近的净值。
+
+        返回:
+            收益率矩阵（百分比，未取整），形状 (len(ts_codes), len(periods))，无数据为 NaN
+        """
+        result = np.full((len(ts_codes), len(periods)), np.nan)
+        if not ts_codes or not periods or len(self.codes) == 0:
+            return result
+
+        fund_idx = np.array([self.code_index.get(c, -1) for c in ts_codes], dtype=np.int64)
+        present = np.flatnonzero(fund_idx >= 0)
+        if len(present) == 0:
+            return result
+
+        idx = fund_idx[present]
+        seg_start = self.offsets[idx]
+        latest_pos = self.offsets[idx + 1] - 1
+        latest_day = self.dates[latest_pos].astype(np.int64)
+
+        # (基金, 期间) 网格上一次二分查找
+        n_funds, n_periods = len(idx), len(periods)
+        targets = latest_day[:, None] - np.asarray(periods, dtype=np.int64)[None, :]
+        past_pos = self.locate(np.repeat(idx, n_periods), targets.ravel(), side='right').reshape(n_funds, n_periods) - 1
+
+        valid = past_pos >= seg_start[:, None]
+        past_nav = self.unit_nav[np.where(valid, past_pos, 0)]
+        latest_nav = self.unit_nav[latest_pos][:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = (latest_nav - past_nav) / past_nav * 100
+
+        result[present] = np.where(valid, returns, np.nan)
+        return result
+
+    def risk_metrics(self, ts_codes: Optional[List[str]] = None, days: int = 365) -> pd.DataFrame:
+        """
+        批量计算风险指标（口径同 FundAnalyzer.calculate_risk_metrics）
+
+        每只基金取最近 days + 30 条净值：
+        - volatility  : 日收益率标准差 × √252 × 100
+        - max_drawdown: 相对历史最高点的最大回撤（%）
+        - sharpe_ratio: (日均收益 × 252 × 100 - 3) / volatility
+        净值少于30条的基金各项为 NaN。
+
+        返回:
+            DataFrame[ts_code, nav_count, volatility, max_drawdown, sharpe_ratio]（未取整）
+        """
+        idx, codes = self.fund_indices(ts_codes)
+        n_funds = len(idx)
+
+        # 每只基金的窗口 [start, end)
+        end = self.offsets[idx + 1]
+        start = np.maximum(self.offsets[idx], end - (days + 30))
+        lengths = end - start
+
+        volatility = np.full(n_funds, np.nan)
+        max_drawdown = np.full(n_funds, np.nan)
+        sharpe = np.full(n_funds, np.nan)
+
+        if lengths.sum() > 0:
+            # 拼接所有窗口：rows 为全局下标，seg 为窗口所属基金（局部序号）
+            seg = np.repeat(np.arange(n_funds, dtype=np.int64), lengths)
+            seg_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+            rows = np.repeat(start, lengths) + (np.arange(lengths.sum(), dtype=np.int64) - seg_start)
+            navs = self.unit_nav[rows]
+
+            # 日收益率（每段第一条没有收益率）
+            has_prev = np.ones(len(rows), dtype=bool)
+            has_prev[np.cumsum(lengths)[lengths > 0] - lengths[lengths > 0]] = False
+            prev = navs[np.flatnonzero(has_prev) - 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = navs[has_prev] / prev - 1
+            ret_seg = seg[has_prev]
+
+            n_returns = np.bincount(ret_seg, minlength=n_funds)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.bincount(ret_seg, weights=returns, minlength=n_funds) / n_returns
+                sq_dev = np.bincount(ret_seg, weights=(returns - mean[ret_seg]) ** 2, minlength=n_funds)
+                std = np.sqrt(sq_dev / (n_returns - 1))
+
+                volatility = std * np.sqrt(252) * 100
+                annual_return = mean * 252 * 100
+                sharpe = np.where(volatility != 0, (annual_return - 3.0) / volatility, np.nan)
+
+                # 最大回撤（分段累计最大值）
+                peak = segmented_cummax(navs, seg)
+                drawdown = (navs - peak) / peak * 100
+            max_drawdown = np.full(n_funds, np.inf)
+            np.minimum.at(max_drawdown, seg, drawdown)
+
+        enough = lengths >= 30
+        return pd.DataFrame({
+            'ts_code': codes,
+            'nav_count': lengths,
+            'volatility': np.where(enough, volatility, np.nan),
+            'max_drawdown': np.where(enough, max_drawdown, np.nan),
+            'sharpe_ratio': np.where(enough, sharpe, np.nan)
+        })
+
+    def year_drawdowns(self, ts_codes: Optional[List[str]] = None,
+                       years: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        批量计算每只基金每个自然年度的最大回撤（口径同 _calculate_year_max_drawdown）
+
+        年内净值少于2条的 (基金, 年度) 不输出；回撤不为正（无回撤为 0）。
+
+        返回:
+            DataFrame[ts_code, year, max_drawdown]
+        """
+        idx, codes = self.fund_indices(ts_codes)
+        empty = pd.DataFrame({'ts_code': [], 'year': [], 'max_drawdown': []})
+
+        lengths = self.offsets[idx + 1] - self.offsets[idx]
+        if lengths.sum() == 0:
+            return empty
+
+        seg_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        rows = np.repeat(self.offsets[idx], lengths) + (np.arange(lengths.sum(), dtype=np.int64) - seg_start)
+        fund = np.repeat(np.arange(len(idx), dtype=np.int64), lengths)
+        year = self.dates[rows].astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+        if years is not None:
+            keep = np.isin(year, np.array([int(y) for y in years]))
+            rows, fund, year = rows[keep], fund[keep], year[keep]
+            if len(rows) == 0:
+                return empty
+
+        # 段 = (基金, 年度)
+        new_seg = np.ones(len(rows), dtype=bool)
+        new_seg[1:] = (fund[1:] != fund[:-1]) | (year[1:] != year[:-1])
+        seg = np.cumsum(new_seg) - 1
+        heads = np.flatnonzero(new_seg)
+
+        navs = self.unit_nav[rows]
+        peak = segmented_cummax(navs, seg)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = (navs - peak) / peak * 100
+
+        seg_min = np.minimum.reduceat(drawdown, heads)
+        counts = np.diff(np.append(heads, len(rows)))
+        valid = counts >= 2
+
+        return pd.DataFrame({
+            'ts_code': np.array(codes, dtype=object)[fund[heads][valid]],
+            'year': year[heads][valid].astype(str),
+            'max_drawdown': np.minimum(0.0, seg_min[valid])
+        })
+
+    def year_return_matrix(self, fund_idx: np.ndarray, years: List[str], current_year: int,
+                           as_of: Optional[int] = None) -> np.ndarray:
+        """
+        多只基金、多个年度的收益率矩阵（百分比，未取整）
+
+        年初净值 = 该年1月1日或之后的第一个净值；
+        年末净值 = 历史年份取12月31日或之前的最后一个净值，当前年份取最新净值。
+        指定 as_of（天数序号）时只使用该日及之前的净值（"截至当日"的口径）。
+
+        参数:
+            fund_idx: 基金序号数组（须存在）
+            years: 年份列表
+            current_year: 当前年份（该年及以后取最新净值）
+            as_of: 截止日期（天数序号），None 表示使用全部净值
+
+        返回:
+            形状 (len(fund_idx), len(years)) 的矩阵，年内无净值为 NaN
+        """
+        idx = np.asarray(fund_idx, dtype=np.int64)
+        seg_end = self.offsets[idx + 1]
+        if as_of is not None:
+            seg_end = np.minimum(seg_end, self.locate(idx, np.full(len(idx), as_of), side='right'))
+
+        # (基金, 年度) 网格：行 = 基金，列 = 年度
+        n_funds, n_years = len(idx), len(years)
+        grid_idx = np.repeat(idx, n_years)
+        year_nums = np.array([int(y) for y in years])
+        jan1 = np.array([to_day(f"{y}-01-01") for y in years], dtype=np.int64)
+        dec31 = np.array([to_day(f"{y}-12-31") for y in years], dtype=np.int64)
+
+        start_pos = self.locate(grid_idx, np.tile(jan1, n_funds), side='left').reshape(n_funds, n_years)
+        end_pos = (self.locate(grid_idx, np.tile(dec31, n_funds), side='right') - 1).reshape(n_funds, n_years)
+
+        # 当前年份（及以后）取最新净值
+        is_current = year_nums >= current_year
+        end_pos[:, is_current] = (seg_end - 1)[:, None]
+
+        # 年末位置落到前一只基金时必然小于年初位置
+        valid = (start_pos < seg_end[:, None]) & (end_pos >= start_pos)
+
+        start_nav = self.unit_nav[np.where(valid, start_pos, 0)]
+        end_nav = self.unit_nav[np.where(valid, end_pos, 0)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = (end_nav - start_nav) / start_nav * 100
+
+        return np.where(valid & np.isfinite(returns), returns, np.nan)
+
+    def year_returns(self, ts_codes: List[str], years: List[str], current_year: int,
+                     as_of: Optional[int] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        批量计算多只基金、多个年度的收益率（口径见 year_return_matrix）
+
+        返回:
+            {ts_code: {year: return_rate}}，年内无净值的为 None
+        """
+        result = {ts_code: {year: None for year in years} for ts_code in ts_codes}
+        if not ts_codes or not years or len(self.codes) == 0:
+            return result
+
+        fund_idx = np.array([self.code_index.get(c, -1) for c in ts_codes], dtype=np.int64)
+        present = np.flatnonzero(fund_idx >= 0)
+        if len(present) == 0:
+            return result
+
+        returns = self.year_return_matrix(fund_idx[present], years, current_year, as_of=as_of)
+
+        for row, col in zip(*np.nonzero(~np.isnan(returns))):
+            result[ts_codes[present[row]]][years[col]] = round(float(returns[row, col]), 2)
+
+        return result
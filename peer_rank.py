@@ -0,0 +1,173 @@
+"""
+同类排名索引
+Peer Rank Index - 按基金类型（fund_type）预先排序的收益/风险指标
+
+每个 (基金类型, 指标) 保存一条按"优劣"升序排列的数组：
+- 排名 / 百分位：一次二分查找，O(log n)
+- 前 N 名：直接取数组末尾，覆盖全部同类基金（而不是抽样）
+
+指标：
+    回溯收益率：以天数表示（如 365 = 近一年），越高越好
+    volatility  : 波动率，越低越好
+    max_drawdown: 最大回撤（负数），越高越好
+    sharpe_ratio: 夏普比率，越高越好
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# 默认回溯期间（天）
+DEFAULT_PERIODS = [30, 90, 180, 365, 365 * 2, 365 * 3]
+
+# 风险指标：是否越高越好
+RISK_METRICS = {
+    'volatility': False,
+    'max_drawdown': True,
+    'sharpe_ratio': True,
+}
+
+Metric = Union[int, str]
+
+
+class PeerRankIndex:
+    """同类排名索引（只读）"""
+
+    def __init__(self, fund_types: Dict[str, str], names: Dict[str, str],
+                 ladders: Dict[Tuple[str, Metric], Tuple[np.ndarray, np.ndarray]],
+                 values: Dict[Metric, Dict[str, float]]):
+        """
+        参数:
+            fund_types: {ts_code: fund_type}（不含 fund_type 缺失的基金）
+            names: {ts_code: name}
+            ladders: {(fund_type, metric): (按优劣升序的取向值, 对应基金代码)}
+            values: {metric: {ts_code: 原始值}}
+        """
+        self.fund_types = fund_types
+        self.names = names
+        self._ladders = ladders
+        self._values = values
+
+    @staticmethod
+    def _orient(metric: Metric, values: np.ndarray) -> np.ndarray:
+        """转换为越大越好的取向值"""
+        if metric in RISK_METRICS and not RISK_METRICS[metric]:
+            return -values
+        return values
+
+    @property
+    def metrics(self) -> List[Metric]:
+        return list(self._values.keys())
+
+    # ============================================================
+    # 构建
+    # ============================================================
+
+    @classmethod
+    def build(cls, funds: pd.DataFrame, store, periods: List[int] = None,
+              risk_days: int = 365) -> 'PeerRankIndex':
+        """
+        从净值列存构建
+
+        参数:
+            funds: 参与排名的基金 DataFrame[ts_code, name, fund_type]
+                   （fund_type 缺失的基金没有同类，不参与排名，只保留指标取值）
+            store: NavStore（至少包含每只基金最近 max(periods, risk_days) + 30 条净值）
+            periods: 回溯期间（天），默认 DEFAULT_PERIODS
+            risk_days: 风险指标统计窗口
+        """
+        periods = periods or DEFAULT_PERIODS
+        codes = funds['ts_code'].tolist()
+        code_arr = np.array(codes, dtype=object)
+
+        # 指标矩阵：每个指标一列（与 codes 对齐）
+        columns = {}
+        returns = np.round(store.trailing_returns(codes, periods), 2)
+        for j, period in enumerate(periods):
+            columns[period] = returns[:, j]
+
+        risk = store.risk_metrics(codes, days=risk_days).set_index('ts_code').reindex(codes)
+        for metric in RISK_METRICS:
+            columns[metric] = np.round(risk[metric].to_numpy(dtype=np.float64), 2)
+
+        ladders = {}
+        groups = funds.reset_index(drop=True).groupby('fund_type').indices
+        for metric, column in columns.items():
+            oriented = cls._orient(metric, column)
+            for fund_type, positions in groups.items():
+                positions = positions[np.isfinite(column[positions])]
+                # 取向值升序，相同值按代码排列（结果稳定）
+                order = np.lexsort((code_arr[positions].astype(str), oriented[positions]))
+                ladders[(fund_type, metric)] = (oriented[positions][order], code_arr[positions][order])
+
+        values = {
+            metric: {code: float(v) for code, v in zip(codes, column) if np.isfinite(v)}
+            for metric, column in columns.items()
+        }
+
+        return cls(
+            {code: fund_type for code, fund_type in zip(codes, funds['fund_type']) if pd.notna(fund_type)},
+            dict(zip(codes, funds['name'])),
+            ladders,
+            values
+        )
+
+    # ============================================================
+    # 查询
+    # ============================================================
+
+    def values(self, metric: Metric) -> Dict[str, float]:
+        """指标的全部取值 {ts_code: 原始值}（无数据的基金不包含）"""
+        return self._values.get(metric, {})
+
+    def rank(self, ts_code: str, metric: Metric = 365) -> Optional[Dict[str, Any]]:
+        """
+        基金在同类中的排名
+
+        返回:
+            {"fund_type", "metric", "value", "rank", "total", "percentile"}，
+            基金不在索引中、没有基金类型或该指标无数据时返回 None。
+            percentile 为超过的同类比例（0-100，第一名为100）
+        """
+        fund_type = self.fund_types.get(ts_code)
+        value = self._values.get(metric, {}).get(ts_code)
+        ladder = self._ladders.get((fund_type, metric))
+        if ladder is None or value is None:
+            return None
+
+        ladder, _ = ladder
+        total = len(ladder)
+        oriented = self._orient(metric, np.float64(value))
+
+        # 严格优于该基金的数量
+        better = total - int(np.searchsorted(ladder, oriented, side='right'))
+        rank = better + 1
+        percentile = round((total - rank) / (total - 1) * 100, 1) if total > 1 else 100.0
+
+        return {
+            "fund_type": fund_type,
+            "metric": metric,
+            "value": value,
+            "rank": rank,
+            "total": total,
+            "percentile": percentile
+        }
+
+    def top(self, fund_type: str, metric: Metric = 365, n: int = 10) -> List[Dict[str, Any]]:
+        """
+        同类前 N 名
+
+        返回:
+            [{"ts_code", "name", "value"}]，按优劣降序
+        """
+        ladder = self._ladders.get((fund_type, metric))
+        if ladder is None:
+            return []
+
+        _, codes = ladder
+        values = self._values[metric]
+        return [
+            {"ts_code": code, "name": self.names.get(code), "value": values[code]}
+            for code in codes[::-1][:n]
+        ]
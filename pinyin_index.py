@@ -0,0 +1,219 @@
+"""
+拼音搜索索引
+Pinyin Index - 名称拼音全拼/首字母 → 代码 的有序前缀表
+
+用户在搜索框输入 "yfd"、"yifangda" 查找 易方达 的基金。索引离线构建，保存为
+    search_pinyin(key, code, data_type)  PRIMARY KEY (key, code, data_type) WITHOUT ROWID
+data_type 为 stock_info 的数据类型（同一代码的指数和股票分别收录，如 000001 上证指数 / 平安银行），
+基金为空字符串。表本身按 key 有序（B 树），前缀查询为一次区间查找：
+    key >= 'yfd' AND key < 'yfe'   → O(log n)
+查询时不需要做任何拼音转换。
+
+每个名称生成两个键（均为小写，只保留字母数字，非汉字部分原样保留）：
+    易方达沪深300ETF联接A → 'yfdhs300etflja'（首字母）、'yifangdahushen300etflianjiea'（全拼）
+
+构建依赖 pypinyin（可选依赖，只在构建时需要）：
+    pip install pypinyin
+    python precompute.py pinyin                      # 基金数据库（fund_basic）
+    python precompute.py --db data-lj.dat pinyin     # 股票数据库（stock_info）
+    python precompute.py --db cn-lj.dat.gz pinyin    # 压缩的股票数据库（写入读取器使用的解压缓存）
+安装了 pypinyin 时，Web 应用的后台缓存刷新线程也会在 fund_basic 变化后重建基金的拼音索引。
+查询时不会构建索引：未安装 pypinyin 或索引不存在时，搜索只按原始字符匹配。
+"""
+
+import hashlib
+import re
+import sqlite3
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+PINYIN_TABLE = "search_pinyin"
+
+# 建立索引时数据源的内容指纹
+STATE_TABLE = "search_pinyin_state"
+
+# 可建立拼音索引的数据源：表名 → 读取 (代码, 数据类型, 名称) 的 SQL
+SOURCES = {
+    "fund_basic": "SELECT ts_code, '', name FROM fund_basic",
+    "stock_info": "SELECT symbol, data_type, name FROM stock_info",
+}
+
+# 拼音输入：字母数字（可含空格分隔），至少一个字母
+_QUERY_PATTERN = re.compile(r'[a-z0-9 ]*[a-z][a-z0-9 ]*')
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、转小写，只保留字母数字"""
+    text = unicodedata.normalize('NFKC', str(text)).lower()
+    return ''.join(ch for ch in text if ch.isascii() and ch.isalnum())
+
+
+def pinyin_keys(name: str) -> List[str]:
+    """
+    名称的拼音键（首字母、全拼，去重）
+
+    需要 pypinyin；未安装时抛出 ImportError
+    """
+    from pypinyin import lazy_pinyin, Style
+
+    if not name:
+        return []
+
+    initials = normalize_text(''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)))
+    full = normalize_text(''.join(lazy_pinyin(name)))
+    return [key for key in dict.fromkeys([initials, full]) if key]
+
+
+def pinyin_available() -> bool:
+    """是否安装了 pypinyin（构建索引需要）"""
+    try:
+        import pypinyin  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ============================================================
+# 构建
+# ============================================================
+
+def content_fingerprint(rows: Iterable[Tuple[str, str, str]]) -> str:
+    """数据源 (代码, 数据类型, 名称) 的内容指纹（与行顺序无关）"""
+    digest = hashlib.sha1()
+    for row in sorted((str(code), str(data_type or ''), str(name or '')) for code, data_type, name in rows):
+        digest.update('\x1f'.join(row).encode('utf-8') + b'\x1e')
+    return digest.hexdigest()
+
+
+def build_pinyin_index(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str]]) -> int:
+    """
+    重建拼音索引
+
+    参数:
+        conn: 可写的 SQLite 连接
+        rows: (代码, 数据类型, 名称)，基金的数据类型为空字符串
+
+    返回:
+        写入的键数量
+    """
+    rows = list(rows)
+    entries = sorted({
+        (key, code, data_type or '')
+        for code, data_type, name in rows
+        if code
+        for key in pinyin_keys(name)
+    })
+
+    conn.execute(f"DROP TABLE IF EXISTS {PINYIN_TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {PINYIN_TABLE} (
+            key TEXT NOT NULL,
+            code TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            PRIMARY KEY (key, code, data_type)
+        ) WITHOUT ROWID
+    """)
+    conn.executemany(f"INSERT INTO {PINYIN_TABLE} VALUES (?, ?, ?)", entries)
+
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (fingerprint TEXT NOT NULL)")
+    conn.execute(f"DELETE FROM {STATE_TABLE}")
+    conn.execute(f"INSERT INTO {STATE_TABLE} VALUES (?)", (content_fingerprint(rows),))
+    conn.commit()
+    return len(entries)
+
+
+def source_tables(conn: sqlite3.Connection) -> List[str]:
+    """数据库中可建立拼音索引的表"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    return [table for table in SOURCES if table in existing]
+
+
+def ensure_pinyin_index(conn: sqlite3.Connection, rebuild: bool = False) -> int:
+    """
+    构建拼音索引（已存在且与数据源内容指纹一致时跳过）
+
+    在预计算命令（precompute.py pinyin）或后台缓存刷新中调用，不在查询路径上
+
+    参数:
+        conn: 可写的 SQLite 连接
+        rebuild: 强制重建
+
+    返回:
+        写入的键数量（跳过或未安装 pypinyin 时为 0）
+    """
+    tables = source_tables(conn)
+    if not tables or not pinyin_available():
+        return 0
+
+    rows = [row for table in tables for row in conn.execute(SOURCES[table])]
+
+    if not rebuild and has_pinyin_index(conn):
+        stored = conn.execute(f"SELECT fingerprint FROM {STATE_TABLE}").fetchone() \
+            if _has_table(conn, STATE_TABLE) else None
+        if stored is not None and stored[0] == content_fingerprint(rows):
+            return 0
+
+    return build_pinyin_index(conn, rows)
+
+
+# ============================================================
+# 查询
+# ============================================================
+
+def _has_table(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def has_pinyin_index(conn: sqlite3.Connection) -> bool:
+    """拼音索引是否存在（旧版只按代码建立的索引不算，需要重建）"""
+    return conn.execute(
+        "SELECT 1 FROM pragma_table_info(?) WHERE name = 'data_type'", (PINYIN_TABLE,)
+    ).fetchone() is not None
+
+
+def pinyin_query(keyword: str) -> Optional[str]:
+    """
+    关键词是否像拼音输入（字母数字且至少含一个字母），是则返回标准化后的前缀
+    """
+    text = unicodedata.normalize('NFKC', str(keyword)).lower().strip()
+    if _QUERY_PATTERN.fullmatch(text):
+        return normalize_text(text)
+    return None
+
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """前缀对应的键区间 [lo, hi)"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def pinyin_condition(conn: sqlite3.Connection, keyword: str, code_column: str,
+                     type_column: Optional[str] = None) -> Optional[Tuple[str, List]]:
+    """
+    拼音前缀匹配条件，用于与原始字符匹配 OR 组合
+
+    参数:
+        conn: SQLite 连接
+        keyword: 关键词
+        code_column: 代码列（如 "fb.ts_code"、"symbol"）
+        type_column: 数据类型列（stock_info 的 "data_type"；基金为 None）
+
+    返回:
+        (条件 SQL, 参数)；关键词不像拼音或索引不存在时返回 None
+    """
+    prefix = pinyin_query(keyword)
+    if prefix is None or not has_pinyin_index(conn):
+        return None
+
+    lo, hi = prefix_range(prefix)
+    if type_column:
+        return (
+            f"({code_column}, {type_column}) IN "
+            f"(SELECT code, data_type FROM {PINYIN_TABLE} WHERE key >= ? AND key < ?)",
+            [lo, hi]
+        )
+    return (
+        f"{code_column} IN (SELECT code FROM {PINYIN_TABLE} WHERE key >= ? AND key < ?)",
+        [lo, hi]
+    )
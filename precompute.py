@@ -0,0 +1,819 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+预计算任务
+Precompute jobs - 为 FundAnalyzer 物化缓存表
+
+功能：
+1. fund_returns_cache：所有基金、所有自然年度的年度收益率
+   - 全量重建：一次集合查询算出全部 (基金, 年度)
+   - 增量刷新：只重算最新净值日期与缓存记录的 source_nav_date 不同的基金，并刷新 computed_date 标记
+2. fund_risk_metrics / fund_year_drawdown：波动率、最大回撤、夏普比率及年度最大回撤
+   - 基于净值列存一次向量化计算全部基金，每次全量重建
+3. fund_scores：综合评分、星级、红星标记（评分明细以 JSON 保存）
+   - 全量重建：全部基金
+   - 增量刷新：只重算最新净值日期与评分记录的 source_nav_date 不同的基金（跨年时自动全量）
+4. fund_rating_history：历史各月末的评分和星级（评级历史追踪）
+   - 全量回填：最近 N 年的全部月末
+   - 增量刷新：只计算最近一次记录的月末及之后的月末
+5. fund_industry_exposure：基金持仓按行业穿透汇总（每个报告期一份）
+   - 全量重建：全部报告期
+   - 增量刷新：只重算新增报告期，以及持仓内容（按报告期的内容指纹）有变化的报告期
+6. search_pinyin：基金/股票名称的拼音首字母、全拼前缀表（需要 pypinyin）
+   - 基金数据库按 fund_basic 构建，股票数据库按 stock_info 构建
+
+使用示例：
+    # 命令行使用
+    python precompute.py returns            # 增量刷新年度收益缓存
+    python precompute.py returns --full     # 全量重建
+    python precompute.py returns --db data/aifm.db.gz
+    python precompute.py risk               # 重建风险指标表
+    python precompute.py scores             # 增量刷新评分表
+    python precompute.py scores --full      # 全量重建评分表
+    python precompute.py history --full     # 回填最近10年的评级历史
+    python precompute.py exposure           # 增量刷新行业穿透表
+    python precompute.py pinyin             # 构建拼音搜索索引
+    python precompute.py --db data-lj.dat pinyin   # 股票数据库的拼音搜索索引
+    python precompute.py --db cn-lj.dat.gz pinyin  # 压缩的股票数据库：写入读取器使用的解压缓存
+
+    # 作为模块使用
+    from precompute import ReturnsCacheBuilder
+    stats = ReturnsCacheBuilder("data/aifm.db").build()
+"""
+
+import hashlib
+import json
+import sqlite3
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from db_cache import extract_cached
+from nav_store import NavStore, day_to_str
+from holdings_index import industry_exposure
+import pinyin_index
+import scoring
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """为旧版本创建的表补充新增列（已存在则跳过）"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def delete_missing_funds(conn: sqlite3.Connection, table: str, source_table: str) -> int:
+    """
+    删除数据源中已不存在的基金的缓存行（增量刷新只覆盖写入仍存在的基金）
+
+    参数:
+        table: 缓存表（含 ts_code 列）
+        source_table: 数据源表（fund_nav、fund_basic）
+
+    返回:
+        删除的行数
+    """
+    cursor = conn.execute(f"""
+        DELETE FROM {table}
+        WHERE ts_code IN (
+            SELECT c.ts_code
+            FROM (SELECT DISTINCT ts_code FROM {table}) c
+            WHERE NOT EXISTS (SELECT 1 FROM {source_table} s WHERE s.ts_code = c.ts_code)
+        )
+    """)
+    return cursor.rowcount
+
+
+class ReturnsCacheBuilder:
+    """年度收益缓存构建器 - 写入 fund_returns_cache 表"""
+
+    TABLE = "fund_returns_cache"
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（需要可写）
+        """
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
+
+    def ensure_table(self, conn: sqlite3.Connection):
+        """创建缓存表（已存在则跳过）"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                ts_code TEXT NOT NULL,
+                year TEXT NOT NULL,
+                return_rate REAL,
+                computed_date TEXT NOT NULL,
+                source_nav_date TEXT,
+                PRIMARY KEY (ts_code, year)
+            )
+        """)
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_computed_date
+            ON {self.TABLE}(computed_date)
+        """)
+        add_column_if_missing(conn, self.TABLE, "source_nav_date", "TEXT")
+
+    def _stale_codes_sql(self) -> str:
+        """
+        需要重算的基金：未缓存，或当前最新净值日期与计算时记录的 source_nav_date 不同
+
+        不能与 computed_date 比较：计算之后才入库、但日期早于计算日的净值（如次日补入的 T-1 净值）
+        不会晚于 computed_date，会被误判为已是最新
+        """
+        return f"""
+            SELECT n.ts_code
+            FROM (
+                SELECT ts_code, MAX(nav_date) AS last_nav_date
+                FROM fund_nav
+                WHERE unit_nav IS NOT NULL
+                GROUP BY ts_code
+            ) n
+            LEFT JOIN (
+                SELECT ts_code, MAX(source_nav_date) AS source_nav_date,
+                       SUM(source_nav_date IS NULL) AS legacy_rows
+                FROM {self.TABLE}
+                GROUP BY ts_code
+            ) c ON n.ts_code = c.ts_code
+            WHERE c.ts_code IS NULL
+               OR c.legacy_rows > 0
+               OR n.last_nav_date != c.source_nav_date
+        """
+
+    def _compute_year_returns(self, conn: sqlite3.Connection, incremental: bool) -> pd.DataFrame:
+        """
+        一次集合查询计算 (基金, 年度) 的首尾净值
+
+        口径与 batch_calculate_year_returns 一致：
+        年初净值 = 该年第一个交易日净值，年末净值 = 该年最后一个交易日净值
+        （当前年份即为最新净值）
+
+        返回:
+            DataFrame[ts_code, year, start_nav, end_nav, source_nav_date]
+            source_nav_date 为该基金参与计算的最新净值日期
+        """
+        code_filter = "AND ts_code IN (SELECT ts_code FROM temp._stale_codes)" if incremental else ""
+
+        query = f"""
+            WITH bounds AS (
+                SELECT ts_code, substr(nav_date, 1, 4) AS year,
+                       MIN(nav_date) AS first_date, MAX(nav_date) AS last_date
+                FROM fund_nav
+                WHERE unit_nav IS NOT NULL {code_filter}
+                GROUP BY ts_code, year
+            ),
+            latest AS (
+                SELECT ts_code, MAX(last_date) AS source_nav_date
+                FROM bounds
+                GROUP BY ts_code
+            )
+            SELECT b.ts_code, b.year, s.unit_nav AS start_nav, e.unit_nav AS end_nav,
+                   l.source_nav_date
+            FROM bounds b
+            JOIN latest l ON l.ts_code = b.ts_code
+            JOIN fund_nav s ON s.ts_code = b.ts_code AND s.nav_date = b.first_date
+            JOIN fund_nav e ON e.ts_code = b.ts_code AND e.nav_date = b.last_date
+            WHERE s.unit_nav IS NOT NULL AND s.unit_nav != 0
+              AND e.unit_nav IS NOT NULL
+        """
+
+        df = pd.read_sql_query(query, conn)
+        # 同一日期可能有重复净值记录，保留一条
+        return df.drop_duplicates(subset=['ts_code', 'year'], keep='last')
+
+    def build(self, full: bool = False) -> Dict[str, Any]:
+        """
+        构建/刷新年度收益缓存
+
+        参数:
+            full: True 全量重建；False 仅重算净值有更新的基金
+
+        返回:
+            统计信息 {"mode", "funds", "records", "computed_date"}
+        """
+        today = date.today().isoformat()
+        conn = self._connect()
+
+        try:
+            self.ensure_table(conn)
+
+            incremental = not full
+            if incremental:
+                conn.execute("DROP TABLE IF EXISTS temp._stale_codes")
+                conn.execute(f"CREATE TEMP TABLE _stale_codes AS {self._stale_codes_sql()}")
+
+            df = self._compute_year_returns(conn, incremental)
+
+            rows = [
+                (ts_code, year, round((end_nav - start_nav) / start_nav * 100, 2), today, source_nav_date)
+                for ts_code, year, start_nav, end_nav, source_nav_date in df.itertuples(index=False, name=None)
+            ]
+
+            if incremental:
+                conn.execute(f"DELETE FROM {self.TABLE} WHERE ts_code IN (SELECT ts_code FROM temp._stale_codes)")
+                delete_missing_funds(conn, self.TABLE, "fund_nav")
+            else:
+                conn.execute(f"DELETE FROM {self.TABLE}")
+
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE} (ts_code, year, return_rate, computed_date, source_nav_date) "
+                f"VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+            # 未变化的基金同样已确认为最新，统一刷新计算日期
+            conn.execute(f"UPDATE {self.TABLE} SET computed_date = ? WHERE computed_date != ?", (today, today))
+
+            conn.commit()
+
+            return {
+                "mode": "full" if full else "incremental",
+                "funds": int(df['ts_code'].nunique()) if not df.empty else 0,
+                "records": len(rows),
+                "computed_date": today
+            }
+        finally:
+            conn.close()
+
+
+class RiskMetricsBuilder:
+    """风险指标构建器 - 写入 fund_risk_metrics 和 fund_year_drawdown 表"""
+
+    TABLE = "fund_risk_metrics"
+    YEAR_TABLE = "fund_year_drawdown"
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（需要可写）
+        """
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
+
+    def ensure_table(self, conn: sqlite3.Connection):
+        """创建风险指标表（已存在则跳过）"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                ts_code TEXT PRIMARY KEY,
+                window_days INTEGER NOT NULL,
+                nav_count INTEGER NOT NULL,
+                last_nav_date TEXT,
+                volatility REAL,
+                max_drawdown REAL,
+                sharpe_ratio REAL,
+                computed_date TEXT NOT NULL
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.YEAR_TABLE} (
+                ts_code TEXT NOT NULL,
+                year TEXT NOT NULL,
+                max_drawdown REAL,
+                computed_date TEXT NOT NULL,
+                PRIMARY KEY (ts_code, year)
+            )
+        """)
+
+    @staticmethod
+    def _round(value: float, allow_zero: bool = True) -> Optional[float]:
+        """取两位小数，NaN（及不允许的 0）存为 NULL"""
+        if np.isnan(value) or (not allow_zero and value == 0):
+            return None
+        return round(float(value), 2)
+
+    def build(self, days: int = 365, store: Optional[NavStore] = None) -> Dict[str, Any]:
+        """
+        全量重建风险指标
+
+        参数:
+            days: 统计窗口（最近 days + 30 条净值，口径同 calculate_risk_metrics）
+            store: 已载入的净值列存（None 时从数据库载入）
+
+        返回:
+            统计信息 {"funds", "year_records", "computed_date"}
+        """
+        today = date.today().isoformat()
+        conn = self._connect()
+
+        try:
+            self.ensure_table(conn)
+
+            if store is None:
+                store = NavStore.load(conn)
+
+            metrics = store.risk_metrics(days=days)
+            year_dd = store.year_drawdowns()
+
+            last_dates = [day_to_str(store.dates[end - 1]) for end in store.offsets[1:]]
+
+            rows = [
+                (ts_code, days, int(nav_count), last_date,
+                 self._round(volatility), self._round(max_drawdown), self._round(sharpe, allow_zero=False), today)
+                for (ts_code, nav_count, volatility, max_drawdown, sharpe), last_date in zip(
+                    metrics[['ts_code', 'nav_count', 'volatility', 'max_drawdown', 'sharpe_ratio']].itertuples(index=False, name=None),
+                    last_dates
+                )
+            ]
+            year_rows = [
+                (ts_code, year, self._round(max_drawdown), today)
+                for ts_code, year, max_drawdown in year_dd.itertuples(index=False, name=None)
+            ]
+
+            conn.execute(f"DELETE FROM {self.TABLE}")
+            conn.execute(f"DELETE FROM {self.YEAR_TABLE}")
+            conn.executemany(f"INSERT INTO {self.TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany(f"INSERT INTO {self.YEAR_TABLE} VALUES (?, ?, ?, ?)", year_rows)
+            conn.commit()
+
+            return {
+                "funds": len(rows),
+                "year_records": len(year_rows),
+                "computed_date": today
+            }
+        finally:
+            conn.close()
+
+
+class ScoresBuilder:
+    """评分构建器 - 写入 fund_scores 表"""
+
+    TABLE = "fund_scores"
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（需要可写）
+        """
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
+
+    def ensure_table(self, conn: sqlite3.Connection):
+        """创建评分表（已存在则跳过）"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                ts_code TEXT PRIMARY KEY,
+                score_year INTEGER NOT NULL,
+                total_score REAL,
+                return_score REAL,
+                risk_score REAL,
+                rating TEXT,
+                stars INTEGER,
+                red_star INTEGER NOT NULL DEFAULT 0,
+                data_years INTEGER NOT NULL,
+                detail TEXT NOT NULL,
+                computed_date TEXT NOT NULL,
+                source_nav_date TEXT
+            )
+        """)
+        add_column_if_missing(conn, self.TABLE, "source_nav_date", "TEXT")
+
+    def _source_nav_dates(self, conn: sqlite3.Connection, score_year: int,
+                          stale_only: bool) -> Dict[str, Optional[str]]:
+        """
+        需要计算的基金及其当前最新净值日期
+
+        参数:
+            stale_only: True 只返回需要重算的基金：未评分、评分年份已过期，
+                        或最新净值日期与评分时记录的 source_nav_date 不同
+                        （不与 computed_date 比较，原因见 ReturnsCacheBuilder._stale_codes_sql）
+
+        返回:
+            {ts_code: 最新净值日期（无净值为 None）}
+        """
+        stale_filter = """
+            WHERE s.ts_code IS NULL
+               OR s.score_year != ?
+               OR s.source_nav_date IS NOT n.last_nav_date
+        """ if stale_only else ""
+
+        query = f"""
+            SELECT fb.ts_code, n.last_nav_date
+            FROM fund_basic fb
+            LEFT JOIN {self.TABLE} s ON fb.ts_code = s.ts_code
+            LEFT JOIN (
+                SELECT ts_code, MAX(nav_date) AS last_nav_date
+                FROM fund_nav
+                WHERE unit_nav IS NOT NULL
+                GROUP BY ts_code
+            ) n ON fb.ts_code = n.ts_code
+            {stale_filter}
+        """
+        return dict(conn.execute(query, (score_year,) if stale_only else ()).fetchall())
+
+    def build(self, full: bool = False, analyzer=None) -> Dict[str, Any]:
+        """
+        构建/刷新评分表
+
+        参数:
+            full: True 全量重建；False 仅重算净值有更新的基金
+            analyzer: 用于计算年度收益和红星评级的 FundAnalyzer（None 时新建）
+
+        返回:
+            统计信息 {"mode", "funds", "computed_date"}
+        """
+        today = date.today().isoformat()
+        score_year = date.today().year
+        years = scoring.score_years(score_year)
+        conn = self._connect()
+
+        try:
+            self.ensure_table(conn)
+
+            source_dates = self._source_nav_dates(conn, score_year, stale_only=not full)
+            ts_codes = list(source_dates)
+
+            if analyzer is None:
+                from fund_analyzer import FundAnalyzer
+                analyzer = FundAnalyzer(self.db_path, use_nav_store=full)
+
+            rows = []
+            if ts_codes:
+                year_returns = analyzer.batch_calculate_year_returns(ts_codes, years)
+                returns = scoring.returns_matrix(year_returns, ts_codes, years)
+                scores = scoring.score_matrix(returns)
+                stars = scoring.star_counts(scores["total"])
+                has_data = scores["years"] > 0
+
+                red_stars = analyzer.batch_check_gold_rating({
+                    ts_code: int(star) for ts_code, star, ok in zip(ts_codes, stars, has_data) if ok
+                })
+
+                for i, ts_code in enumerate(ts_codes):
+                    detail = scoring.score_detail(scores, i, returns, years)
+                    ok = bool(has_data[i])
+                    rows.append((
+                        ts_code, score_year,
+                        detail["总分"] if ok else None,
+                        detail["收益得分"] if ok else None,
+                        detail["风险得分"] if ok else None,
+                        detail["评级"] if ok else None,
+                        int(stars[i]) if ok else None,
+                        int(red_stars.get(ts_code, False)),
+                        detail["数据年限"],
+                        json.dumps(detail, ensure_ascii=False),
+                        today,
+                        source_dates[ts_code]
+                    ))
+
+            if full:
+                conn.execute(f"DELETE FROM {self.TABLE}")
+            else:
+                delete_missing_funds(conn, self.TABLE, "fund_basic")
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {self.TABLE}
+                    (ts_code, score_year, total_score, return_score, risk_score, rating, stars,
+                     red_star, data_years, detail, computed_date, source_nav_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+
+            # 未变化的基金同样已确认为最新，统一刷新计算日期
+            conn.execute(f"UPDATE {self.TABLE} SET computed_date = ? WHERE computed_date != ?", (today, today))
+
+            conn.commit()
+
+            return {
+                "mode": "full" if full else "incremental",
+                "funds": len(rows),
+                "computed_date": today
+            }
+        finally:
+            conn.close()
+
+
+class RatingHistoryBuilder:
+    """评级历史构建器 - 写入 fund_rating_history 表"""
+
+    TABLE = "fund_rating_history"
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（需要可写）
+        """
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
+
+    def ensure_table(self, conn: sqlite3.Connection):
+        """创建评级历史表（已存在则跳过）"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                ts_code TEXT NOT NULL,
+                as_of_date TEXT NOT NULL,
+                total_score REAL NOT NULL,
+                stars INTEGER NOT NULL,
+                data_years INTEGER NOT NULL,
+                PRIMARY KEY (ts_code, as_of_date)
+            ) WITHOUT ROWID
+        """)
+
+    def build(self, full: bool = False, years: int = 10, store: Optional[NavStore] = None) -> Dict[str, Any]:
+        """
+        构建/刷新评级历史
+
+        参数:
+            full: True 回填最近 years 年的全部月末；False 只补算新的月末
+                  （最近一次记录的月末也会重算，以纳入补录的净值）
+            years: 回填年数
+            store: 已载入的净值列存（None 时从数据库载入）
+
+        返回:
+            统计信息 {"mode", "months", "records"}
+        """
+        conn = self._connect()
+
+        try:
+            self.ensure_table(conn)
+
+            if store is None:
+                store = NavStore.load(conn)
+            if len(store.dates) == 0:
+                return {"mode": "full" if full else "incremental", "months": 0, "records": 0}
+
+            last_nav_date = day_to_str(store.dates.max())
+            start_date = f"{int(last_nav_date[:4]) - years}-01-01"
+
+            if not full:
+                row = conn.execute(f"SELECT MAX(as_of_date) FROM {self.TABLE}").fetchone()
+                if row[0]:
+                    start_date = max(start_date, row[0])
+
+            as_of_dates = scoring.month_ends(start_date, last_nav_date)
+            history = scoring.rating_history(store, None, as_of_dates)
+
+            if full:
+                conn.execute(f"DELETE FROM {self.TABLE}")
+            else:
+                delete_missing_funds(conn, self.TABLE, "fund_nav")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?, ?)",
+                (
+                    (ts_code, as_of_date, float(total_score), int(stars), int(data_years))
+                    for ts_code, as_of_date, total_score, stars, data_years in history.itertuples(index=False, name=None)
+                )
+            )
+            conn.commit()
+
+            return {
+                "mode": "full" if full else "incremental",
+                "months": len(as_of_dates),
+                "records": len(history)
+            }
+        finally:
+            conn.close()
+
+
+class IndustryExposureBuilder:
+    """行业穿透构建器 - 写入 fund_industry_exposure 表"""
+
+    TABLE = "fund_industry_exposure"
+
+    # 每个报告期计算时 fund_portfolio 的内容指纹
+    STATE_TABLE = "fund_industry_exposure_state"
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        参数:
+            db_path: 未压缩的 SQLite 数据库路径（需要可写）
+        """
+        self.db_path = Path(db_path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
+
+    def ensure_table(self, conn: sqlite3.Connection):
+        """创建行业穿透表（已存在则跳过）"""
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                ts_code TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                industry TEXT NOT NULL,
+                weight REAL,
+                mkv REAL,
+                holding_count INTEGER NOT NULL,
+                PRIMARY KEY (ts_code, end_date, industry)
+            ) WITHOUT ROWID
+        """)
+        # 行业筛选（某行业占比超过 X% 的基金）
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_industry
+            ON {self.TABLE}(industry, end_date, weight)
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.STATE_TABLE} (
+                end_date TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def _period_fingerprints(conn: sqlite3.Connection) -> Dict[str, str]:
+        """fund_portfolio 每个报告期的内容指纹（穿透计算用到的列，按固定顺序拼接后取 SHA1）"""
+        rows = conn.execute("""
+            SELECT end_date,
+                   group_concat(ts_code || char(31) || COALESCE(ann_date, '') || char(31) ||
+                                COALESCE(symbol, '') || char(31) || COALESCE(mkv, '') || char(31) ||
+                                COALESCE(stk_mkv_ratio, ''), char(30))
+            FROM (
+                SELECT ts_code, ann_date, end_date, symbol, mkv, stk_mkv_ratio
+                FROM fund_portfolio
+                ORDER BY end_date, ts_code, symbol, ann_date, mkv, stk_mkv_ratio
+            )
+            GROUP BY end_date
+        """).fetchall()
+        return {end_date: hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+                for end_date, content in rows}
+
+    def _stale_periods(self, conn: sqlite3.Connection, fingerprints: Dict[str, str]) -> list:
+        """需要重算的报告期：没有计算过的，或持仓内容指纹与计算时不一致的"""
+        cached = dict(conn.execute(f"SELECT end_date, fingerprint FROM {self.STATE_TABLE}").fetchall())
+        return sorted(end_date for end_date, fingerprint in fingerprints.items()
+                      if cached.get(end_date) != fingerprint)
+
+    def build(self, full: bool = False) -> Dict[str, Any]:
+        """
+        构建/刷新行业穿透表
+
+        参数:
+            full: True 重算全部报告期（股票行业数据更新后使用）；False 只重算有变化的报告期
+
+        返回:
+            统计信息 {"mode", "periods", "records"}
+        """
+        conn = self._connect()
+
+        try:
+            self.ensure_table(conn)
+
+            fingerprints = self._period_fingerprints(conn)
+            if full:
+                periods = sorted(fingerprints)
+            else:
+                periods = self._stale_periods(conn, fingerprints)
+
+            records = 0
+            for end_date in periods:
+                holdings = pd.read_sql_query("""
+                    SELECT ts_code, ann_date, end_date, symbol, mkv, stk_mkv_ratio
+                    FROM fund_portfolio
+                    WHERE end_date = ?
+                """, conn, params=(end_date,))
+                exposure = industry_exposure(holdings)
+
+                conn.execute(f"DELETE FROM {self.TABLE} WHERE end_date = ?", (end_date,))
+                conn.executemany(
+                    f"INSERT INTO {self.TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (ts_code, end_date, industry,
+                         None if pd.isna(weight) else float(weight),
+                         None if pd.isna(mkv) else float(mkv),
+                         int(holding_count))
+                        for ts_code, end_date, industry, weight, mkv, holding_count
+                        in exposure.itertuples(index=False, name=None)
+                    )
+                )
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.STATE_TABLE} VALUES (?, ?)",
+                    (end_date, fingerprints[end_date])
+                )
+                records += len(exposure)
+
+            if full:
+                # 清理 fund_portfolio 中已不存在的报告期
+                for table in (self.TABLE, self.STATE_TABLE):
+                    conn.execute(f"""
+                        DELETE FROM {table}
+                        WHERE end_date NOT IN (SELECT DISTINCT end_date FROM fund_portfolio)
+                    """)
+            conn.commit()
+
+            return {
+                "mode": "full" if full else "incremental",
+                "periods": len(periods),
+                "records": records
+            }
+        finally:
+            conn.close()
+
+
+def resolve_writable_db(db_path: Union[str, Path]) -> Path:
+    """
+    获取可写的数据库路径
+
+    如果是 .gz 压缩文件，返回其解压缓存（db_cache.extract_cached，FundAnalyzer / 股票读取器
+    打开的正是这个文件）。不在同目录生成 .db：config 会优先使用同目录的 .db，
+    之后更新的 .gz 将被忽略。缓存表随解压缓存绑定该版本的 .gz，.gz 更新后需重新计算。
+    """
+    db_path = Path(db_path)
+    if db_path.suffix != '.gz':
+        return db_path
+
+    sibling = db_path.with_suffix('')
+    if sibling.exists() and sibling.stat().st_mtime < db_path.stat().st_mtime:
+        print(f"[WARN] {sibling} 比 {db_path.name} 旧，但 config 会优先使用它；确认不再需要后请删除")
+
+    return extract_cached(db_path)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='预计算任务 - 物化 FundAnalyzer 缓存表')
+    parser.add_argument('--db', type=str, help='数据库文件路径（.db或.db.gz），默认使用 config.DB_PATH')
+
+    subparsers = parser.add_subparsers(dest='command', help='可用命令')
+
+    returns_parser = subparsers.add_parser('returns', help='刷新年度收益缓存 fund_returns_cache')
+    returns_parser.add_argument('--full', action='store_true', help='全量重建（默认增量刷新）')
+
+    scores_parser = subparsers.add_parser('scores', help='刷新评分表 fund_scores')
+    scores_parser.add_argument('--full', action='store_true', help='全量重建（默认增量刷新）')
+
+    history_parser = subparsers.add_parser('history', help='刷新评级历史 fund_rating_history')
+    history_parser.add_argument('--full', action='store_true', help='全量回填（默认只补算新的月末）')
+    history_parser.add_argument('--years', type=int, default=10, help='回填年数（默认10）')
+
+    exposure_parser = subparsers.add_parser('exposure', help='刷新行业穿透表 fund_industry_exposure')
+    exposure_parser.add_argument('--full', action='store_true', help='重算全部报告期（默认只重算有变化的报告期）')
+
+    pinyin_parser = subparsers.add_parser('pinyin', help='构建拼音搜索索引 search_pinyin（需要 pypinyin）')
+    pinyin_parser.add_argument('--full', action='store_true', help='强制重建（默认数据未变化时跳过）')
+
+    risk_parser = subparsers.add_parser('risk', help='重建风险指标表 fund_risk_metrics / fund_year_drawdown')
+    risk_parser.add_argument('--days', type=int, default=365, help='统计窗口天数（默认365）')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        return 1
+
+    try:
+        if args.db:
+            db_path = Path(args.db)
+        else:
+            from config import DB_PATH
+            db_path = DB_PATH
+
+        db_path = resolve_writable_db(db_path)
+        print(f"数据库路径: {db_path}")
+
+        if args.command == 'returns':
+            stats = ReturnsCacheBuilder(db_path).build(full=args.full)
+            print(f"✓ 年度收益缓存已更新（{stats['mode']}）：{stats['funds']} 只基金，"
+                  f"{stats['records']} 条记录，计算日期 {stats['computed_date']}")
+
+        elif args.command == 'scores':
+            stats = ScoresBuilder(db_path).build(full=args.full)
+            print(f"✓ 评分表已更新（{stats['mode']}）：{stats['funds']} 只基金，计算日期 {stats['computed_date']}")
+
+        elif args.command == 'history':
+            stats = RatingHistoryBuilder(db_path).build(full=args.full, years=args.years)
+            print(f"✓ 评级历史已更新（{stats['mode']}）：{stats['months']} 个月末，{stats['records']} 条记录")
+
+        elif args.command == 'exposure':
+            stats = IndustryExposureBuilder(db_path).build(full=args.full)
+            print(f"✓ 行业穿透表已更新（{stats['mode']}）：{stats['periods']} 个报告期，{stats['records']} 条记录")
+
+        elif args.command == 'pinyin':
+            if not pinyin_index.pinyin_available():
+                print("错误: 构建拼音索引需要 pypinyin，请先运行 pip install pypinyin")
+                return 1
+            conn = sqlite3.connect(str(db_path))
+            tables = pinyin_index.source_tables(conn)
+            try:
+                keys = pinyin_index.ensure_pinyin_index(conn, rebuild=args.full)
+            finally:
+                conn.close()
+            if not tables:
+                print("错误: 数据库中没有 fund_basic 或 stock_info 表")
+                return 1
+            print(f"✓ 拼音索引（{', '.join(tables)}）：" + (f"{keys} 个键" if keys else "已是最新"))
+
+        elif args.command == 'risk':
+            stats = RiskMetricsBuilder(db_path).build(days=args.days)
+            print(f"✓ 风险指标已重建：{stats['funds']} 只基金，"
+                  f"{stats['year_records']} 条年度回撤，计算日期 {stats['computed_date']}")
+
+    except Exception as e:
+        print(f"错误: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+报告数据上下文
+Report Context - 生成单只基金分析报告时，每张表只读取一次
+
+generate_report 的各项分析（收益、风险、规模、基金经理、持仓集中度、评分）
+原本各自连接数据库、重复读取 fund_nav；ReportContext 为该基金的每张表
+在首次使用时读取一次，之后复用：
+    fund_basic    : 基本信息
+    fund_nav      : 全部净值（已载入净值列存时直接复用，不再查询）
+    fund_share    : 最近份额记录
+    fund_manager  : 该基金的基金经理，以及这些经理的全部任职记录
+    fund_portfolio: 最近披露的持仓
+读取发生在使用该表的分析部分中：报告并行生成时，各表的查询分别在各部分的
+线程内执行，受该部分的超时控制（较慢的基金经理任职查询不会拖住整份报告）。
+多个部分同时用到同一张表（如净值）时只读取一次，其余部分等待该次读取完成。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from nav_store import NavStore
+
+_MISSING = object()
+
+
+class ReportContext:
+    """单只基金报告的数据上下文（延迟读取，线程安全）"""
+
+    # 持仓读取条数（与 analyze_portfolio_concentration 一致）
+    PORTFOLIO_LIMIT = 50
+
+    # 份额读取条数（与 get_fund_scale_trend 默认值一致）
+    SHARE_LIMIT = 12
+
+    def __init__(self, ts_code: str, connect: Callable[[], Any], nav_store: Optional[NavStore] = None):
+        """
+        参数:
+            ts_code: 基金代码
+            connect: 返回可用的 SQLite 连接（如 FundAnalyzer._connect，用完 close()）
+            nav_store: 已载入的全市场净值列存（None 时只读取该基金的净值）
+        """
+        self.ts_code = ts_code
+        self._connect = connect
+        self._nav_store = nav_store
+        self._values = {}
+        self._locks = {name: threading.Lock() for name in ('info', 'nav', 'shares', 'managers', 'portfolio')}
+
+    def _load(self, name: str, loader: Callable[[Any], Any]) -> Any:
+        """读取一张表（每张表只读取一次；并发使用时其余线程等待）"""
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            with self._locks[name]:
+                value = self._values.get(name, _MISSING)
+                if value is _MISSING:
+                    conn = self._connect()
+                    try:
+                        value = loader(conn)
+                    finally:
+                        conn.close()
+                    self._values[name] = value
+        return value
+
+    # ============================================================
+    # 各表数据
+    # ============================================================
+
+    @property
+    def info(self) -> Optional[Dict[str, Any]]:
+        """基本信息（fund_basic 一行），基金不存在时为 None"""
+        def load(conn):
+            basic = pd.read_sql_query("SELECT * FROM fund_basic WHERE ts_code = ?", conn, params=(self.ts_code,))
+            return basic.iloc[0].to_dict() if not basic.empty else None
+
+        return self._load('info', load)
+
+    @property
+    def nav(self) -> NavStore:
+        """净值列存（全市场列存或只含该基金的列存）"""
+        if self._nav_store is not None:
+            return self._nav_store
+        return self._load('nav', lambda conn: NavStore.load(conn, [self.ts_code]))
+
+    @property
+    def shares(self) -> pd.DataFrame:
+        """最近份额记录（按日期降序）"""
+        return self._load('shares', lambda conn: pd.read_sql_query("""
+            SELECT trade_date, fd_share
+            FROM fund_share
+            WHERE ts_code = ?
+            ORDER BY trade_date DESC
+            LIMIT ?
+        """, conn, params=(self.ts_code, self.SHARE_LIMIT)))
+
+    @property
+    def portfolio(self) -> pd.DataFrame:
+        """最近披露的持仓"""
+        return self._load('portfolio', lambda conn: pd.read_sql_query("""
+            SELECT ann_date, end_date, symbol, mkv,
+                   stk_mkv_ratio, stk_float_ratio
+            FROM fund_portfolio
+            WHERE ts_code = ?
+            ORDER BY ann_date DESC, stk_mkv_ratio DESC
+            LIMIT ?
+        """, conn, params=(self.ts_code, self.PORTFOLIO_LIMIT)))
+
+    @property
+    def _manager_records(self) -> pd.DataFrame:
+        """该基金的经理 + 这些经理在所有基金的任职记录（一次查询）"""
+        return self._load('managers', lambda conn: pd.read_sql_query("""
+            SELECT ts_code, name, gender, begin_date, end_date, resume
+            FROM fund_manager
+            WHERE name IN (SELECT name FROM fund_manager WHERE ts_code = ?)
+            ORDER BY begin_date DESC
+        """, conn, params=(self.ts_code,)))
+
+    def nav_series(self, limit: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """该基金的净值序列（最近 limit 条），无数据返回 None"""
+        return self.nav.series(self.ts_code, limit=limit)
+
+    @property
+    def managers(self) -> pd.DataFrame:
+        """该基金的基金经理（按任职日期降序，列同 get_fund_managers）"""
+        records = self._manager_records
+        df = records[records['ts_code'] == self.ts_code]
+        return df[['name', 'gender', 'begin_date', 'end_date', 'resume']].reset_index(drop=True)
+
+    def manager_tenures(self, manager_name: str) -> pd.DataFrame:
+        """基金经理在所有基金的任职记录（列同 get_manager_experience 的查询）"""
+        records = self._manager_records
+        df = records[records['name'] == manager_name]
+        return df[['ts_code', 'begin_date', 'end_date']].reset_index(drop=True)
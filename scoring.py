@@ -0,0 +1,265 @@
+"""
+评分引擎
+Scoring Engine - 基金综合评分（v2.1）的向量化实现
+
+输入为 基金 × 年度 的年度收益率矩阵（百分比，缺失为 NaN，列按年份从近到远），
+一次数组运算得出全部基金的收益得分、风险得分、总分和星级。
+calculate_fund_score（详情页）与 batch_calculate_scores（列表页）共用本模块。
+
+rating_history() 在净值列存上按"截至某日"的口径批量计算历史各月末的评分。
+
+评分规则（v2.1）：
+1. 收益得分（80分）：最近5年收益累加，>100%得满分80分，按比例计算，负值0分；
+                    每缺1年扣减15%
+2. 风险得分（20分）：每年收益 >20%得4分，>0%得3分，>-10%得2分，其余0分，累加；
+                    每缺1年扣减20%
+3. 星级：>80分=5星，>70分=4星，>60分=3星，>50分=2星，其余=1星
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from nav_store import to_day
+
+# 评分使用的年数
+SCORE_YEARS = 5
+
+# 缺失年份扣减比例
+RETURN_PENALTY_PER_YEAR = 0.15
+RISK_PENALTY_PER_YEAR = 0.20
+
+# 星级阈值（总分 > 阈值）
+STAR_LEVELS = [
+    (80, 5, "五星 ★★★★★"),
+    (70, 4, "四星 ★★★★"),
+    (60, 3, "三星 ★★★"),
+    (50, 2, "二星 ★★"),
+]
+LOWEST_STAR = "一星 ★"
+
+
+def score_years(current_year: Optional[int] = None) -> List[str]:
+    """评分年度（从今年起向前5年，如 ['2025', '2024', '2023', '2022', '2021']）"""
+    if current_year is None:
+        current_year = datetime.now().year
+    return [str(year) for year in range(current_year, current_year - SCORE_YEARS, -1)]
+
+
+def py_round(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    与 Python round() 结果一致的向量化取整
+
+    np.round 先乘 10^n 再取整，在 x.x5 一类的边界值上可能与 round() 相差一位；
+    这类边界值（极少）逐个交给 round() 处理。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.round(values, ndigits)
+
+    scaled = values * 10.0 ** ndigits
+    frac = np.abs(scaled - np.floor(scaled))
+    near_tie = np.flatnonzero(np.isfinite(values) & (np.abs(frac - 0.5) < 1e-6))
+    for i in near_tie:
+        result.flat[i] = round(float(values.flat[i]), ndigits)
+
+    return result
+
+
+def returns_matrix(year_returns: Dict[str, Dict[str, Any]], ts_codes: List[str],
+                   years: List[str]) -> np.ndarray:
+    """
+    {ts_code: {year: return}} 转换为 基金 × 年度 矩阵（缺失或无法解析为 NaN）
+    """
+    matrix = np.full((len(ts_codes), len(years)), np.nan)
+    for i, ts_code in enumerate(ts_codes):
+        returns_data = year_returns.get(ts_code) or {}
+        for j, year in enumerate(years):
+            value = returns_data.get(year)
+            if value is not None:
+                try:
+                    matrix[i, j] = float(value)
+                except (TypeError, ValueError):
+                    pass
+    return matrix
+
+
+def score_matrix(returns: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算评分
+
+    参数:
+        returns: 年度收益率矩阵（基金 × 年度，列数为 SCORE_YEARS，缺失为 NaN）
+
+    返回:
+        {
+            "years": 有效年数,
+            "total_return": 累计收益（未取整）,
+            "risk_points": 每年风险分矩阵（缺失年份为 0）,
+            "risk_total": 累计风险分,
+            "return_score": 收益得分,
+            "risk_score": 风险得分,
+            "total": 总分
+        }
+        无有效年份的基金各项得分为 0
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = ~np.isnan(returns)
+    years = valid.sum(axis=1)
+    missing = SCORE_YEARS - years
+
+    # 逐年顺序累加（与逐只基金的 sum() 结果完全一致）
+    filled = np.where(valid, returns, 0.0)
+    total_return = np.zeros(len(returns))
+    for j in range(returns.shape[1]):
+        total_return = total_return + filled[:, j]
+
+    # 1. 收益得分（80分）
+    return_score = np.where(total_return <= 0, 0.0, np.minimum(80, (total_return / 100) * 80))
+    return_score = return_score * np.where(missing > 0, 1 - missing * RETURN_PENALTY_PER_YEAR, 1.0)
+    return_score = np.maximum(0, py_round(return_score, 1))
+
+    # 2. 风险得分（20分）
+    risk_points = np.select(
+        [filled > 20, filled > 0, filled > -10],
+        [4, 3, 2],
+        default=0
+    )
+    risk_points = np.where(valid, risk_points, 0)
+    risk_total = risk_points.sum(axis=1)
+
+    risk_score = risk_total * np.where(missing > 0, 1 - missing * RISK_PENALTY_PER_YEAR, 1.0)
+    risk_score = np.maximum(0, py_round(risk_score, 1))
+
+    has_data = years > 0
+    return_score = np.where(has_data, return_score, 0.0)
+    risk_score = np.where(has_data, risk_score, 0.0)
+
+    # 3. 总分
+    total = py_round(return_score + risk_score, 1)
+
+    return {
+        "years": years,
+        "total_return": total_return,
+        "risk_points": risk_points,
+        "risk_total": risk_total,
+        "return_score": return_score,
+        "risk_score": risk_score,
+        "total": total
+    }
+
+
+def star_rating(total: float) -> str:
+    """总分对应的星级"""
+    for threshold, _, label in STAR_LEVELS:
+        if total > threshold:
+            return label
+    return LOWEST_STAR
+
+
+def star_counts(totals: np.ndarray) -> np.ndarray:
+    """总分对应的星数（1-5）"""
+    totals = np.asarray(totals, dtype=np.float64)
+    return np.select(
+        [totals > threshold for threshold, _, _ in STAR_LEVELS],
+        [stars for _, stars, _ in STAR_LEVELS],
+        default=1
+    )
+
+
+def score_detail(scores: Dict[str, np.ndarray], row: int, returns: np.ndarray,
+                 years: List[str]) -> Dict[str, Any]:
+    """
+    单只基金的评分明细（calculate_fund_score 的返回格式）
+
+    参数:
+        scores: score_matrix() 的结果
+        row: 基金所在行
+        returns: 传给 score_matrix() 的年度收益率矩阵
+        years: 年度列表（与矩阵列对应）
+    """
+    detail = {
+        "总分": 0,
+        "收益得分": 0,
+        "风险得分": 0,
+        "评级": LOWEST_STAR,
+        "数据年限": int(scores["years"][row]),
+        "收益详情": {},
+        "风险详情": {}
+    }
+
+    if detail["数据年限"] == 0:
+        return detail
+
+    for j, year in enumerate(years):
+        if not np.isnan(returns[row, j]):
+            detail["收益详情"][year] = float(returns[row, j])
+    detail["收益详情"]["累计收益"] = round(float(scores["total_return"][row]), 2)
+
+    for j, year in enumerate(years):
+        if not np.isnan(returns[row, j]):
+            detail["风险详情"][year + "风险分"] = int(scores["risk_points"][row, j])
+    detail["风险详情"]["累计风险分"] = int(scores["risk_total"][row])
+
+    detail["收益得分"] = float(scores["return_score"][row])
+    detail["风险得分"] = float(scores["risk_score"][row])
+    detail["总分"] = float(scores["total"][row])
+    detail["评级"] = star_rating(detail["总分"])
+
+    return detail
+
+
+def month_ends(start_date: str, end_date: str) -> List[str]:
+    """[start_date, end_date] 区间内的所有月末日期（YYYY-MM-DD）"""
+    first = np.datetime64(start_date, 'M')
+    last = np.datetime64(end_date, 'M')
+    if last < first:
+        return []
+
+    months = np.arange(first, last + 1)
+    ends = (months + 1).astype('datetime64[D]') - 1
+    ends = ends[(ends >= np.datetime64(start_date, 'D')) & (ends <= np.datetime64(end_date, 'D'))]
+    return [str(d) for d in ends]
+
+
+def rating_history(store, ts_codes: Optional[List[str]], as_of_dates: List[str]) -> pd.DataFrame:
+    """
+    批量计算截至各日期的评分（每个日期对全部基金一次向量化计算）
+
+    截至日期 D 的评分：评分年度为 D 所在年份起向前5年，
+    年度收益只使用 D 及之前的净值（D 所在年份取 D 之前的最新净值）。
+
+    参数:
+        store: NavStore
+        ts_codes: 基金代码列表（None 表示全部）
+        as_of_dates: 截至日期列表（YYYY-MM-DD）
+
+    返回:
+        DataFrame[ts_code, as_of_date, total_score, stars, data_years]，
+        只包含截至当日有年度数据的记录
+    """
+    columns = ['ts_code', 'as_of_date', 'total_score', 'stars', 'data_years']
+    idx, codes = store.fund_indices(ts_codes)
+    if len(idx) == 0 or not as_of_dates:
+        return pd.DataFrame(columns=columns)
+
+    codes = np.array(codes, dtype=object)
+    frames = []
+    for as_of in as_of_dates:
+        year = int(as_of[:4])
+        years = score_years(year)
+
+        returns = py_round(store.year_return_matrix(idx, years, year, as_of=to_day(as_of)), 2)
+        scores = score_matrix(returns)
+        keep = scores["years"] > 0
+
+        frames.append(pd.DataFrame({
+            'ts_code': codes[keep],
+            'as_of_date': as_of,
+            'total_score': scores["total"][keep],
+            'stars': star_counts(scores["total"][keep]),
+            'data_years': scores["years"][keep]
+        }))
+
+    return pd.concat(frames, ignore_index=True)[columns]
@@ -0,0 +1,287 @@
+"""
+筛选表达式
+Screen Expression - 自定义多指标筛选条件，编译为对全部基金的 NumPy 向量运算
+
+示例:
+    ret_1y > 20 and max_dd > -15 and score >= 70 and fund_type == '股票型'
+    (ret_2024 > 10 or ret_2023 > 10) and company in ('易方达基金', '广发基金')
+    '医药' in name and found_date < '2018-01-01'
+
+语法（Python 表达式子集，用 ast 解析，不执行任何代码）：
+    比较    > >= < <= == !=，可连写（如 10 < vol < 20）
+    包含    字段 in ('A', 'B') / 字段 not in (...)；'子串' in 文本字段
+    逻辑    and / or / not，括号
+    算术    + - * /（如 ret_2024 - ret_2023 > 10）
+
+字段：
+    score                       综合评分
+    ret_1m ret_3m ret_6m        近 1/3/6 个月收益率（%）
+    ret_1y ret_2y ret_3y        近 1/2/3 年收益率（%）
+    ret_2025 / return2025      自然年度收益率（%，fund_returns_cache）
+    vol / volatility            波动率（%）
+    max_dd / max_drawdown       最大回撤（%，负数）
+    sharpe / sharpe_ratio       夏普比率
+    fund_type company/management invest_type status name ts_code
+    found_date list_date        成立/上市日期，与 'YYYY-MM-DD' 或 'YYYYMMDD' 字符串比较（按日期比较）
+
+缺失值（无数据的基金）参与的比较一律不成立，not 只对比较结果取反。
+"""
+
+import ast
+import operator
+import re
+import sys
+from typing import Any, Callable, Set
+
+import numpy as np
+
+from nav_store import to_day
+
+# 表达式最大长度
+MAX_LENGTH = 1000
+
+# 字段别名 → ScreenIndex 字段
+FIELD_ALIASES = {
+    'company': 'management',
+    'vol': 'volatility',
+    'max_dd': 'max_drawdown',
+    'sharpe': 'sharpe_ratio',
+}
+
+# 回溯收益字段 → 天数（同类排名索引的指标）
+TRAILING_FIELDS = {
+    'ret_1m': 30,
+    'ret_3m': 90,
+    'ret_6m': 180,
+    'ret_1y': 365,
+    'ret_2y': 365 * 2,
+    'ret_3y': 365 * 3,
+}
+
+# 日期字段（ScreenIndex.field 返回天数序号，比较时日期字符串转为天数序号）
+DATE_FIELDS = {'found_date', 'list_date'}
+
+_YEAR_FIELD = re.compile(r'ret_(\d{4})')
+
+_COMPARE = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+_ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+
+def canonical_field(name: str) -> str:
+    """字段别名转为 ScreenIndex 字段名（ret_2025 → return2025，max_dd → max_drawdown）"""
+    match = _YEAR_FIELD.fullmatch(name)
+    if match:
+        return f"return{match.group(1)}"
+    return FIELD_ALIASES.get(name, name)
+
+
+def _is_text(value: Any) -> bool:
+    return isinstance(value, str) or (isinstance(value, np.ndarray) and value.dtype.kind == 'U')
+
+
+def _is_date_field(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and canonical_field(node.id) in DATE_FIELDS
+
+
+def _date_literal(value: Any, node: ast.AST):
+    """与日期字段比较的字符串转为天数序号（无法解析时 ValueError）"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return float(to_day(value))
+    except (ValueError, OverflowError):
+        raise ValueError(f"无效的日期: '{value}'（{ast.unparse(node)}）")
+
+
+def _valid(value: Any):
+    """非缺失值的布尔数组（标量返回 True）"""
+    if not isinstance(value, np.ndarray):
+        return True
+    if value.dtype.kind == 'U':
+        return value != ''
+    return ~np.isnan(value)
+
+
+class ScreenExpression:
+    """编译后的筛选表达式"""
+
+    def __init__(self, text: str):
+        """
+        参数:
+            text: 筛选表达式
+
+        表达式为空、过长、语法错误、数值超出范围或包含不支持的写法时抛出 ValueError
+        """
+        text = (text or '').strip()
+        if not text:
+            raise ValueError("筛选表达式为空")
+        if len(text) > MAX_LENGTH:
+            raise ValueError(f"筛选表达式过长（最多 {MAX_LENGTH} 个字符）")
+
+        try:
+            tree = ast.parse(text, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"筛选表达式语法错误: {e.msg}")
+
+        self.text = text
+        self.fields: Set[str] = set()
+        self._body = tree.body
+        self._check_condition(self._body)
+
+    # ============================================================
+    # 校验
+    # ============================================================
+
+    @staticmethod
+    def _unsupported(node: ast.AST) -> ValueError:
+        return ValueError(f"筛选表达式不支持: {ast.unparse(node)}")
+
+    def _check_condition(self, node: ast.AST):
+        """条件：比较、and/or/not"""
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check_condition(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            self._check_condition(node.operand)
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) > 1 and any(isinstance(op, (ast.In, ast.NotIn)) for op in node.ops):
+                raise self._unsupported(node)
+            self._check_value(node.left)
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, (ast.Tuple, ast.List, ast.Set)):
+                    for item in right.elts:
+                        self._check_constant(item)
+                elif type(op) in _COMPARE or isinstance(op, (ast.In, ast.NotIn)):
+                    self._check_value(right)
+                else:
+                    raise self._unsupported(node)
+        else:
+            raise ValueError(f"筛选表达式需要比较条件: {ast.unparse(node)}")
+
+    def _check_value(self, node: ast.AST):
+        """取值：字段、常量、算术"""
+        if isinstance(node, ast.Name):
+            self.fields.add(canonical_field(node.id))
+        elif isinstance(node, ast.Constant):
+            self._check_constant(node)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._check_value(node.operand)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            self._check_value(node.left)
+            self._check_value(node.right)
+        else:
+            raise self._unsupported(node)
+
+    def _check_constant(self, node: ast.AST):
+        """常量：数字、字符串（可带负号）"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            node = node.operand
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                raise self._unsupported(node)
+        if not (isinstance(node, ast.Constant)
+                and isinstance(node.value, (int, float, str))
+                and not isinstance(node.value, bool)):
+            raise self._unsupported(node)
+        # 超出 float 范围的整数无法与数值列比较
+        if isinstance(node.value, int) and abs(node.value) > sys.float_info.max:
+            raise ValueError("筛选表达式数值超出范围")
+
+    # ============================================================
+    # 计算
+    # ============================================================
+
+    def mask(self, resolve: Callable[[str], np.ndarray], size: int) -> np.ndarray:
+        """
+        计算表达式
+
+        参数:
+            resolve: 字段名 → 数组（ScreenIndex.field）
+            size: 基金数量
+
+        返回:
+            布尔数组（True = 符合条件）
+        """
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            result = self._condition(self._body, resolve)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (size,))
+
+    def _condition(self, node: ast.AST, resolve):
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._condition(node.values[0], resolve)
+            for value in node.values[1:]:
+                result = combine(result, self._condition(value, resolve))
+            return result
+
+        if isinstance(node, ast.UnaryOp):
+            return np.logical_not(self._condition(node.operand, resolve))
+
+        # 比较（可连写：a < b < c 即 a < b and b < c）
+        result = True
+        left_node = node.left
+        left = self._value(left_node, resolve)
+        for op, right_node in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                # in / not in 不参与连写（校验时已排除）
+                return self._contains(node, left, right_node, resolve, isinstance(op, ast.NotIn))
+
+            right = self._value(right_node, resolve)
+            a, b = left, right
+            if _is_date_field(left_node):
+                b = _date_literal(b, node)
+            if _is_date_field(right_node):
+                a = _date_literal(a, node)
+            if _is_text(a) != _is_text(b):
+                raise ValueError(f"文本与数值不能比较: {ast.unparse(node)}")
+            matched = _COMPARE[type(op)](a, b) & _valid(a) & _valid(b)
+            result = np.logical_and(result, matched)
+            left_node, left = right_node, right
+        return result
+
+    def _contains(self, node, left, right_node, resolve, negate: bool):
+        """in / not in：取值列表，或文本字段包含子串"""
+        if isinstance(right_node, (ast.Tuple, ast.List, ast.Set)):
+            items = [ast.literal_eval(item) for item in right_node.elts]
+            if _is_date_field(node.left):
+                items = [_date_literal(item, node) for item in items]
+            if any(_is_text(item) != _is_text(left) for item in items):
+                raise ValueError(f"文本与数值不能比较: {ast.unparse(node)}")
+            matched = np.isin(left, items)
+            valid = _valid(left)
+        else:
+            right = self._value(right_node, resolve)
+            if not (isinstance(left, str) and _is_text(right)):
+                raise ValueError(f"in 需要取值列表或 '子串' in 文本字段: {ast.unparse(node)}")
+            matched = np.char.find(right, left) >= 0
+            valid = _valid(right)
+        return (~matched if negate else matched) & valid
+
+    def _value(self, node: ast.AST, resolve):
+        if isinstance(node, ast.Name):
+            return resolve(canonical_field(node.id))
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.UnaryOp):
+            value = self._value(node.operand, resolve)
+            if _is_text(value):
+                raise ValueError(f"文本不能取负: {ast.unparse(node)}")
+            return -value if isinstance(node.op, ast.USub) else value
+
+        left = self._value(node.left, resolve)
+        right = self._value(node.right, resolve)
+        if _is_text(left) or _is_text(right):
+            raise ValueError(f"文本不能参与算术运算: {ast.unparse(node)}")
+        return _ARITHMETIC[type(node.op)](np.asarray(left, dtype=np.float64), right)
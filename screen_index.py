@@ -0,0 +1,241 @@
+"""
+基金筛选排序索引
+Screen Index - 分面索引 + 年度收益/评分/风险指标，服务端排序分页（/api/screen）
+
+基金列表页原先取回全部符合条件的基金，再批量请求年度收益和评分，在浏览器中排序。
+本索引与 FacetIndex 行对齐，为每只基金保存各排序指标的数组：
+    return{年度}: fund_returns_cache 中的年度收益率（如 return2025）
+    score       : 综合评分（评分表 fund_scores 优先，未评分的基金按缓存收益向量化计算）
+    volatility / max_drawdown / sharpe_ratio: 风险指标预计算表（存在时）
+以及 fund_basic 的各列（代码、名称、公司、成立日期等）。
+近 N 月/年回溯收益等需要净值计算的指标按需附加（add_metrics，来自同类排名索引）。
+
+每个 (指标, 方向) 的排序结果（行号数组，缺失值在后，相同值保持分面索引顺序）首次使用时
+计算一次并缓存；一次筛选 = 分面位图 → 布尔数组，按排序数组取出选中行，切出一页。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from facet_index import FacetIndex, mask_from_bits
+from nav_store import to_day, to_days
+from screen_expr import DATE_FIELDS
+
+# 排序键别名（评级由评分决定）
+SORT_ALIASES = {
+    'rating': 'score',
+}
+
+# 每页最多返回条数
+MAX_PAGE_SIZE = 500
+
+
+def _date_days(column: pd.Series) -> np.ndarray:
+    """日期列（YYYYMMDD / YYYY-MM-DD）转为天数序号（float64，缺失或无法解析为 NaN）"""
+    values = column.fillna('').astype(str).str.strip().to_numpy(dtype=object)
+    days = np.full(len(values), np.nan)
+    present = np.flatnonzero(values != '')
+    try:
+        days[present] = to_days(values[present])
+    except (ValueError, OverflowError):
+        for i in present:
+            try:
+                days[i] = to_day(values[i])
+            except (ValueError, OverflowError):
+                pass
+    return days
+
+
+class ScreenIndex:
+    """基金筛选排序索引（只读）"""
+
+    def __init__(self, facets: FacetIndex, metrics: Dict[str, np.ndarray]):
+        """
+        参数:
+            facets: 分面索引（行顺序即默认排序）
+            metrics: {指标名: 与 facets.frame 行对齐的数值数组（缺失为 NaN）}
+        """
+        self.facets = facets
+        self.metrics = metrics
+        self._extra = {}
+        self._text = {}
+        self._dates = {}
+        self._orders = {}
+
+    def __len__(self) -> int:
+        return len(self.facets)
+
+    @property
+    def years(self) -> List[str]:
+        """有缓存收益的年度（降序）"""
+        return [name[len('return'):] for name in self.metrics if name.startswith('return')]
+
+    # ============================================================
+    # 构建
+    # ============================================================
+
+    @classmethod
+    def build(cls, facets: FacetIndex, returns: pd.DataFrame,
+              stored_scores: Optional[pd.Series] = None) -> 'ScreenIndex':
+        """
+        构建
+
+        参数:
+            facets: 分面索引
+            returns: DataFrame[ts_code, year, return_rate]（fund_returns_cache）
+            stored_scores: 评分表的当年总分 Series(index=ts_code)，None 表示无评分表
+        """
+        codes = facets.frame['ts_code']
+
+        if returns.empty:
+            table = pd.DataFrame(index=pd.Index([], name='ts_code'))
+        else:
+            table = returns.pivot_table(index='ts_code', columns='year',
+                                        values='return_rate', aggfunc='last')
+        table.columns = [str(year) for year in table.columns]
+        table = table.reindex(index=codes)
+
+        metrics = {}
+        for year in sorted(table.columns, reverse=True):
+            metrics[f'return{year}'] = table[year].to_numpy(dtype=np.float64)
+
+        # 与 batch_get_scores 一致：评分表优先，其余按缓存收益计算（无有效年度为空）
+        matrix = table.reindex(columns=scoring.score_years()).to_numpy(dtype=np.float64)
+        scores = scoring.score_matrix(matrix)
+        score = np.where(scores['years'] > 0, scores['total'], np.nan)
+        if stored_scores is not None and not stored_scores.empty:
+            stored = stored_scores.reindex(codes).to_numpy(dtype=np.float64)
+            score = np.where(np.isnan(stored), score, stored)
+        metrics['score'] = score
+
+        return cls(facets, metrics)
+
+    # ============================================================
+    # 查询
+    # ============================================================
+
+    def add_metrics(self, values: Dict[str, Dict[str, float]]):
+        """
+        附加指标（不在列表页返回，可用于排序和筛选表达式）
+
+        参数:
+            values: {指标名: {ts_code: 值}}，缺失的基金为 NaN
+        """
+        codes = self.facets.frame['ts_code']
+        extra = dict(self._extra)
+        for name, by_code in values.items():
+            extra[name] = codes.map(by_code).to_numpy(dtype=np.float64, na_value=np.nan)
+        self._extra = extra
+
+    def has_field(self, name: str) -> bool:
+        """是否存在该指标或 fund_basic 列"""
+        return name in self.metrics or name in self._extra or name in self.facets.frame.columns
+
+    def field(self, name: str) -> np.ndarray:
+        """
+        字段的数组（与分面索引行对齐）
+
+        返回:
+            数值字段为 float64（缺失为 NaN），文本字段为字符串数组（缺失为 ''），
+            日期字段（found_date / list_date）为天数序号 float64（缺失或无法解析为 NaN）
+        """
+        if name in self.metrics:
+            return self.metrics[name]
+        if name in self._extra:
+            return self._extra[name]
+
+        frame = self.facets.frame
+        if name not in frame.columns:
+            raise ValueError(f"未知字段: {name}")
+
+        column = frame[name]
+        if name in DATE_FIELDS:
+            days = self._dates.get(name)
+            if days is None:
+                days = _date_days(column)
+                self._dates[name] = days
+            return days
+        if pd.api.types.is_numeric_dtype(column):
+            return column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+        text = self._text.get(name)
+        if text is None:
+            text = np.array(column.fillna('').astype(str).tolist(), dtype=str)
+            self._text[name] = text
+        return text
+
+    def _sort_values(self, sort: str) -> np.ndarray:
+        """排序键的数值数组（文本列转为有序排名，缺失为 NaN）"""
+        if sort in self.metrics:
+            return self.metrics[sort]
+        if sort in self._extra:
+            return self._extra[sort]
+
+        frame = self.facets.frame
+        if sort not in frame.columns:
+            raise ValueError(f"不支持的排序字段: {sort}")
+
+        column = frame[sort]
+        if pd.api.types.is_numeric_dtype(column):
+            return column.to_numpy(dtype=np.float64)
+        return column.rank(method='dense').to_numpy(dtype=np.float64)
+
+    def order(self, sort: str, descending: bool = True) -> np.ndarray:
+        """
+        按指标排序的行号数组（缺失值在后，相同值保持分面索引顺序；首次使用时计算并缓存）
+        """
+        sort = SORT_ALIASES.get(sort, sort)
+        key = (sort, descending)
+
+        order = self._orders.get(key)
+        if order is None:
+            values = self._sort_values(sort)
+            order = np.argsort(-values if descending else values, kind='stable')
+            self._orders[key] = order
+        return order
+
+    def page(self, bits: int, sort: Optional[str] = None, descending: bool = True,
+             page: int = 1, page_size: int = 50) -> Tuple[pd.DataFrame, int]:
+        """
+        筛选结果的一页
+
+        参数:
+            bits: 筛选位图（FacetIndex.mask()）
+            sort: 排序字段（指标名或 fund_basic 列名），None 为分面索引默认顺序
+            descending: 是否降序
+            page: 页码（从 1 开始）
+            page_size: 每页条数（最多 MAX_PAGE_SIZE）
+
+        返回:
+            (该页基金 DataFrame（fund_basic 列 + 各指标 + rating，按附加指标排序时含该指标）,
+             符合条件的总数)
+        """
+        selected = mask_from_bits(bits, len(self.facets))
+        if sort:
+            order = self.order(sort, descending)
+            rows = order[selected[order]]
+        else:
+            rows = np.flatnonzero(selected)
+
+        total = len(rows)
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        start = (max(1, int(page)) - 1) * page_size
+        rows = rows[start:start + page_size]
+
+        metrics = {name: values[rows] for name, values in self.metrics.items()}
+        sort = SORT_ALIASES.get(sort, sort)
+        if sort in self._extra:
+            metrics[sort] = self._extra[sort][rows]
+        metrics['rating'] = [
+            None if np.isnan(score) else scoring.star_rating(score)
+            for score in metrics['score']
+        ]
+        frame = pd.concat([
+            self.facets.frame.iloc[rows].reset_index(drop=True),
+            pd.DataFrame(metrics)
+        ], axis=1)
+
+        return frame, total
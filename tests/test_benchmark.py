@@ -0,0 +1,31 @@
+import numpy as np
+
+from benchmark import BenchmarkSeries
+from nav_store import to_day
+
+
+def make_series():
+    dates = np.array(['2019-01-02', '2019-01-08', '2020-01-02', '2025-07-21'])
+    closes = np.array([100.0, 110.0, 120.0, 150.0])
+    return BenchmarkSeries('000300', dates, closes)
+
+
+def test_growth_same_window_for_both_date_formats():
+    series = make_series()
+    expected = (150.0 - 110.0) / 110.0 * 100
+    assert series.growth('20190108', '20250721') == expected
+    assert series.growth('2019-01-08', '2025-07-21') == expected
+    assert series.growth(to_day('20190108'), to_day('20250721')) == expected
+
+
+def test_growth_many_matches_growth():
+    series = make_series()
+    starts = ['20190102', '20190108', '20200102']
+    ends = ['20200102', '20250721', '20200102']
+    result = series.growth_many(starts, ends)
+    iso = series.growth_many([f'{d[:4]}-{d[4:6]}-{d[6:]}' for d in starts],
+                             [f'{d[:4]}-{d[4:6]}-{d[6:]}' for d in ends])
+    np.testing.assert_array_equal(result, iso)
+    assert result[0] == series.growth('20190102', '20200102')
+    assert result[1] == series.growth('20190108', '20250721')
+    assert np.isnan(result[2])
@@ -0,0 +1,54 @@
+import gc
+import sqlite3
+
+import pytest
+
+from db_pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = tmp_path / 'pool.db'
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(path)
+    yield pool
+    pool.close_all()
+
+
+def test_connection_returned_to_pool(pool):
+    conn = pool.connection()
+    conn.close()
+    assert pool.connection() is conn
+
+
+def test_unreturned_connection_is_not_kept_open(pool):
+    def failing_query():
+        conn = pool.connection()
+        conn.execute("SELECT x FROM t").fetchall()
+        raise ValueError
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            failing_query()
+    gc.collect()
+    assert len(pool._connections) == 0
+
+
+def test_close_idle_keeps_connections_in_use(pool):
+    idle = pool.connection()
+    busy = pool.connection()
+    idle.close()
+
+    pool.close_idle()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        idle.execute("SELECT 1")
+    assert busy.execute("SELECT 1").fetchone() == (1,)
+
+    busy.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        busy.execute("SELECT 1")
+    assert pool._idle.empty()
@@ -0,0 +1,61 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+from benchmark import BenchmarkSeries
+from fund_analyzer import FundAnalyzer
+
+
+@pytest.fixture
+def hs300(monkeypatch):
+    dates = pd.bdate_range('2018-01-02', '2025-07-21')
+    closes = 3000 * np.exp(np.linspace(0, 0.4, len(dates)))
+    series = BenchmarkSeries('000300', dates.strftime('%Y-%m-%d').to_numpy(), closes)
+    monkeypatch.setattr(benchmark, 'get_benchmark_series', lambda *args, **kwargs: series)
+    return series
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """40 只四星基金，首尾净值日期为 YYYYMMDD 写法，涨幅分布在沪深300同期涨幅附近"""
+    path = tmp_path / 'fund.db'
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE fund_basic (ts_code TEXT, name TEXT, fund_type TEXT, found_date TEXT, status TEXT)")
+    conn.execute("CREATE TABLE fund_nav (ts_code TEXT, nav_date TEXT, unit_nav REAL, accum_nav REAL)")
+    rng = np.random.default_rng(7)
+    for i in range(40):
+        ts_code = f'{i:06d}.OF'
+        start = pd.Timestamp('2019-01-02') + pd.Timedelta(days=int(rng.integers(0, 30)))
+        conn.execute("INSERT INTO fund_basic VALUES (?, ?, '股票型', ?, 'L')",
+                     (ts_code, f'基金{i}', start.strftime('%Y%m%d')))
+        first_nav = 1.0
+        last_nav = first_nav * (1 + rng.uniform(0.15, 0.45))
+        for nav_date, nav in ((start, first_nav), (pd.Timestamp('2025-07-21'), last_nav)):
+            conn.execute("INSERT INTO fund_nav VALUES (?, ?, ?, ?)",
+                         (ts_code, nav_date.strftime('%Y%m%d'), nav, nav))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_gold_rating_same_with_and_without_nav_store(db_path, hs300):
+    ratings = {f'{i:06d}.OF': 4 for i in range(40)}
+
+    sql_analyzer = FundAnalyzer(db_path)
+    store_analyzer = FundAnalyzer(db_path, use_nav_store=True)
+    try:
+        sql_result = sql_analyzer.batch_check_gold_rating(ratings)
+        store_result = store_analyzer.batch_check_gold_rating(ratings)
+        single_sql = {c: sql_analyzer.check_gold_rating(c, r) for c, r in ratings.items()}
+        single_store = {c: store_analyzer.check_gold_rating(c, r) for c, r in ratings.items()}
+    finally:
+        sql_analyzer.close()
+        store_analyzer.close()
+
+    assert 0 < sum(sql_result.values()) < len(ratings)
+    assert store_result == sql_result
+    assert single_sql == sql_result
+    assert single_store == sql_result
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from precompute import IndustryExposureBuilder
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'fund.db'
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE fund_portfolio (ts_code TEXT, ann_date TEXT, end_date TEXT, symbol TEXT,
+                                     mkv REAL, amount REAL, stk_mkv_ratio REAL, stk_float_ratio REAL)
+    """)
+    conn.executemany("INSERT INTO fund_portfolio VALUES (?, ?, ?, ?, ?, NULL, ?, NULL)", [
+        ('000001.OF', '20260720', '20260630', '600519.SH', 100.0, 8.0),
+        ('000001.OF', '20260720', '20260630', '000001.SZ', 50.0, 4.0),
+        ('000002.OF', '20260720', '20260630', '600519.SH', 80.0, 6.0),
+        ('000001.OF', '20260420', '20260331', '600519.SH', 90.0, 7.0),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def weights(path, end_date):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("""
+        SELECT ts_code, industry, weight FROM fund_industry_exposure
+        WHERE end_date = ? ORDER BY ts_code, industry
+    """, (end_date,)).fetchall()
+    conn.close()
+    return rows
+
+
+def test_incremental_build_recomputes_only_changed_periods(db_path):
+    builder = IndustryExposureBuilder(db_path)
+    assert builder.build()['periods'] == 2
+    assert builder.build()['periods'] == 0
+
+    # 已计算报告期内修改一条持仓（披露基金数不变）
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        UPDATE fund_portfolio SET stk_mkv_ratio = 9.0
+        WHERE ts_code = '000002.OF' AND end_date = '20260630'
+    """)
+    conn.commit()
+    conn.close()
+
+    stats = builder.build()
+    assert stats['periods'] == 1
+    assert [w for code, _, w in weights(db_path, '20260630') if code == '000002.OF'] == [9.0]
+    assert builder.build()['periods'] == 0
+
+
+def test_full_build_matches_incremental(db_path):
+    builder = IndustryExposureBuilder(db_path)
+    builder.build()
+    incremental = weights(db_path, '20260630')
+    assert builder.build(full=True)['periods'] == 2
+    assert weights(db_path, '20260630') == incremental
+    assert builder.build()['periods'] == 0
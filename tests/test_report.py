@@ -0,0 +1,40 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from fund_analyzer import FundAnalyzer
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    path = tmp_path / 'fund.db'
+    sqlite3.connect(path).close()
+    analyzer = FundAnalyzer(path)
+    yield analyzer
+    analyzer.close()
+
+
+def test_timed_out_sections_still_queued_are_cancelled(analyzer, monkeypatch):
+    release = threading.Event()
+    ran = []
+
+    def slow():
+        release.wait(5)
+        return {"慢": 1}
+
+    def queued():
+        ran.append("排队")
+        return {"排队": 1}
+
+    analyzer.REPORT_WORKERS = 1
+    monkeypatch.setattr(analyzer, '_report_sections', lambda ctx: [("慢", slow), ("排队", queued)])
+
+    report = analyzer.generate_report('000001.OF', parallel=True, section_timeout=0.1)
+    release.set()
+    analyzer.report_executor.submit(time.sleep, 0).result()
+
+    assert set(report["未完成"]) == {"慢", "排队"}
+    assert "慢" not in report and "排队" not in report
+    assert ran == []
@@ -0,0 +1,164 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import scoring
+from fund_analyzer import FundAnalyzer
+
+YEARS = scoring.score_years(2025)
+
+
+def legacy_score(returns_data, years):
+    """逐只基金的 v2.1 评分（向量化之前 calculate_fund_score 的写法）"""
+    detail = {"总分": 0, "收益得分": 0, "风险得分": 0, "数据年限": 0, "收益详情": {}}
+
+    valid_returns = []
+    for year in years:
+        if returns_data.get(year) is not None:
+            valid_returns.append(returns_data[year])
+            detail["收益详情"][year] = returns_data[year]
+
+    actual_years = len(valid_returns)
+    detail["数据年限"] = actual_years
+
+    if actual_years > 0:
+        total_return = sum(valid_returns)
+        return_score = 0 if total_return <= 0 else min(80, (total_return / 100) * 80)
+        missing_years = 5 - actual_years
+        if missing_years > 0:
+            return_score = return_score * (1 - missing_years * 0.15)
+        detail["收益得分"] = max(0, round(return_score, 1))
+
+    risk_points = []
+    for year_return in detail["收益详情"].values():
+        if year_return > 20:
+            risk_points.append(4)
+        elif year_return > 0:
+            risk_points.append(3)
+        elif year_return > -10:
+            risk_points.append(2)
+        else:
+            risk_points.append(0)
+
+    if risk_points:
+        risk_score = sum(risk_points)
+        missing_years = 5 - len(risk_points)
+        if missing_years > 0:
+            risk_score = risk_score * (1 - missing_years * 0.20)
+        detail["风险得分"] = max(0, round(risk_score, 1))
+
+    detail["总分"] = round(detail["收益得分"] + detail["风险得分"], 1)
+
+    total = detail["总分"]
+    if total > 80:
+        detail["评级"] = "五星 ★★★★★"
+    elif total > 70:
+        detail["评级"] = "四星 ★★★★"
+    elif total > 60:
+        detail["评级"] = "三星 ★★★"
+    elif total > 50:
+        detail["评级"] = "二星 ★★"
+    else:
+        detail["评级"] = "一星 ★"
+    return detail
+
+
+def sample_returns(n=3000, seed=13):
+    """两位小数的年度收益（与缓存表一致），随机缺失年份，外加规则边界值"""
+    rng = np.random.default_rng(seed)
+    matrix = np.round(rng.uniform(-40, 60, size=(n, len(YEARS))), 2)
+    matrix[rng.random(matrix.shape) < 0.2] = np.nan
+    edges = np.array([
+        [20.0, 0.0, -10.0, 20.01, -9.99],            # 风险分边界
+        [np.nan] * 5,                                 # 无数据
+        [-5.0, -5.0, -5.0, -5.0, -5.0],               # 累计收益为负
+        [100.0, 20.0, np.nan, np.nan, np.nan],        # 收益得分封顶后扣减
+        [15.4375, 0.0, 0.0, 0.0, 0.0],                # 收益得分 12.35（.x5 边界）
+        [0.0625, np.nan, np.nan, np.nan, np.nan],     # 收益得分 0.05 × 0.4
+    ])
+    return np.vstack([edges, matrix])
+
+
+def as_dicts(matrix):
+    return {
+        f'{i:06d}.OF': {year: float(v) for year, v in zip(YEARS, row) if not np.isnan(v)}
+        for i, row in enumerate(matrix)
+    }
+
+
+def test_py_round_matches_builtin_round():
+    values = np.array([0.05, 0.15, 0.25, 2.675, 12.35, 0.45 * 3, 1.0 - 0.95, -0.05, np.nan, 7.0])
+    expected = [round(float(v), 1) if not np.isnan(v) else np.nan for v in values]
+    np.testing.assert_array_equal(scoring.py_round(values, 1), expected)
+    assert scoring.py_round(np.array([2.675]), 2)[0] == round(2.675, 2) == 2.67
+
+
+def test_score_matrix_matches_legacy_rules():
+    matrix = sample_returns()
+    year_returns = as_dicts(matrix)
+    scores = scoring.score_matrix(matrix)
+
+    for row, (ts_code, returns_data) in enumerate(year_returns.items()):
+        legacy = legacy_score(returns_data, YEARS)
+        detail = scoring.score_detail(scores, row, matrix, YEARS)
+        assert detail["数据年限"] == legacy["数据年限"], ts_code
+        assert detail["收益得分"] == legacy["收益得分"], ts_code
+        assert detail["风险得分"] == legacy["风险得分"], ts_code
+        assert detail["总分"] == legacy["总分"], ts_code
+        assert detail["评级"] == legacy["评级"], ts_code
+
+    # 样本中确实含有 np.round 与 round() 结果不同的边界值
+    raw = np.where(np.isnan(matrix), 0.0, matrix).sum(axis=1) / 100 * 80
+    assert (np.round(raw, 1) != scoring.py_round(raw, 1)).any()
+
+
+@pytest.mark.parametrize("total, stars, label", [
+    (80.1, 5, "五星 ★★★★★"),
+    (80.0, 4, "四星 ★★★★"),
+    (70.0, 3, "三星 ★★★"),
+    (60.0, 2, "二星 ★★"),
+    (50.1, 2, "二星 ★★"),
+    (50.0, 1, "一星 ★"),
+    (0.0, 1, "一星 ★"),
+])
+def test_star_cutoffs(total, stars, label):
+    assert scoring.star_rating(total) == label
+    assert scoring.star_counts(np.array([total]))[0] == stars
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    """每年两条净值（年初、年末）的小型数据库"""
+    monkeypatch.setattr(scoring, 'score_years', lambda current_year=None: YEARS)
+
+    path = tmp_path / 'fund.db'
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE fund_nav (ts_code TEXT, nav_date TEXT, unit_nav REAL, accum_nav REAL)")
+    matrix = sample_returns(n=200)
+    for ts_code, returns_data in as_dicts(matrix).items():
+        for year, value in returns_data.items():
+            conn.execute("INSERT INTO fund_nav VALUES (?, ?, 1.0, 1.0)", (ts_code, f'{year}-01-02'))
+            conn.execute("INSERT INTO fund_nav VALUES (?, ?, ?, ?)",
+                         (ts_code, f'{year}-12-31', 1 + value / 100, 1 + value / 100))
+    conn.commit()
+    conn.close()
+
+    analyzer = FundAnalyzer(path)
+    yield analyzer
+    analyzer.close()
+
+
+def test_fund_scores_match_legacy_rules(analyzer):
+    ts_codes = [f'{i:06d}.OF' for i in range(len(sample_returns(n=200)))]
+    year_returns = analyzer.batch_calculate_year_returns(ts_codes, YEARS, as_of='2025-12-31')
+    batch = analyzer.batch_calculate_scores(ts_codes, year_returns)
+
+    for ts_code in ts_codes:
+        legacy = legacy_score(year_returns.get(ts_code, {}), YEARS)
+        expected = legacy["总分"] if legacy["数据年限"] else None
+        assert batch[ts_code] == expected, ts_code
+
+        detail = analyzer.calculate_fund_score(ts_code, as_of='2025-12-31')
+        assert detail["总分"] == legacy["总分"], ts_code
+        assert detail["评级"] == legacy["评级"], ts_code
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from facet_index import FacetIndex
+from screen_expr import ScreenExpression
+from screen_index import ScreenIndex
+
+
+@pytest.fixture
+def screen():
+    frame = pd.DataFrame({
+        'ts_code': ['000001.OF', '000002.OF', '000003.OF', '000004.OF'],
+        'name': ['基金A', '基金B', '基金C', '基金D'],
+        'fund_type': '股票型',
+        'management': '易方达基金',
+        'invest_type': '',
+        'found_date': ['20180101', '20170615', '20180630', None],
+        'list_date': ['20180301', '20170801', '', None],
+        'status': 'L',
+        'cache_date': None,
+    })
+    return ScreenIndex(FacetIndex.build(frame), {})
+
+
+def matched(screen, text):
+    mask = ScreenExpression(text).mask(screen.field, len(screen))
+    return set(screen.facets.frame['ts_code'][mask])
+
+
+@pytest.mark.parametrize("fmt", ['%Y-%m-%d', '%Y%m%d'])
+def test_date_comparisons_in_both_formats(screen, fmt):
+    def day(text):
+        return pd.Timestamp(text).strftime(fmt)
+
+    assert matched(screen, f"found_date <= '{day('2018-01-01')}'") == {'000001.OF', '000002.OF'}
+    assert matched(screen, f"found_date < '{day('2018-01-01')}'") == {'000002.OF'}
+    assert matched(screen, f"found_date == '{day('2018-06-30')}'") == {'000003.OF'}
+    assert matched(screen, f"found_date >= '{day('2018-01-01')}' and found_date <= '{day('2018-06-30')}'") \
+        == {'000001.OF', '000003.OF'}
+    assert matched(screen, f"'{day('2018-01-01')}' <= found_date <= '{day('2018-06-30')}'") \
+        == {'000001.OF', '000003.OF'}
+    assert matched(screen, f"found_date in ('{day('2017-06-15')}', '{day('2018-06-30')}')") \
+        == {'000002.OF', '000003.OF'}
+
+
+def test_missing_dates_never_match(screen):
+    assert matched(screen, "list_date != '2018-03-01'") == {'000002.OF'}
+    assert matched(screen, "list_date - found_date > 50") == {'000001.OF'}
+
+
+def test_date_fields_are_day_ordinals(screen):
+    days = screen.field('found_date')
+    assert days.dtype == np.float64
+    assert np.isnan(days[screen.facets.frame['ts_code'] == '000004.OF']).all()
+
+
+@pytest.mark.parametrize("text", [
+    "found_date < '2018-13-01'",
+    "found_date == 'abc'",
+    "found_date in ('2018-01-01', 'x')",
+])
+def test_invalid_date_literal_raises(screen, text):
+    with pytest.raises(ValueError):
+        ScreenExpression(text).mask(screen.field, len(screen))